@@ -5,10 +5,27 @@ from datetime import datetime, timedelta
 import requests
 import logging
 from pathlib import Path
-import yaml
+from utils.config import load_config
+
+try:
+    # 安装了requests-cache时缓存HTTP响应，过期后用ETag/Last-Modified发条件请求
+    import requests_cache
+except ImportError:
+    requests_cache = None
 
 logger = logging.getLogger(__name__)
 
+# HTTP响应缓存文件(不含.sqlite后缀)，与采集数据放在同一目录
+HTTP_CACHE_NAME = 'data/http_cache'
+
+# 按URL匹配的缓存有效期(秒)，未匹配的URL不缓存
+HTTP_CACHE_EXPIRE_AFTER = {
+    '*coingecko.com*': 60,
+    '*alphavantage.co*': 3600,
+    '*imf.org*': 3600,
+    '*worldbank.org*': 86400,
+}
+
 class BaseAPI(ABC):
     """API基础类，定义通用的API接口方法"""
     
@@ -19,9 +36,27 @@ class BaseAPI(ABC):
             config_path: API配置文件路径
         """
         self.config = self._load_config(config_path)
-        self.session = requests.Session()
+        self.session = self._create_session()
         self.session.headers.update(self._get_headers())
         
+    def _create_session(self) -> requests.Session:
+        """创建HTTP会话，安装了requests-cache时使用带缓存的会话
+        
+        Returns:
+            requests.Session: HTTP会话
+        """
+        if requests_cache is None:
+            return requests.Session()
+            
+        Path(HTTP_CACHE_NAME).parent.mkdir(parents=True, exist_ok=True)
+        return requests_cache.CachedSession(
+            HTTP_CACHE_NAME,
+            backend='sqlite',
+            expire_after=requests_cache.DO_NOT_CACHE,
+            urls_expire_after=HTTP_CACHE_EXPIRE_AFTER,
+            cache_control=True
+        )
+        
     def _load_config(self, config_path: str) -> dict:
         """加载配置文件
         
@@ -32,8 +67,7 @@ class BaseAPI(ABC):
             dict: 配置信息
         """
         try:
-            with open(config_path, 'r', encoding='utf-8') as f:
-                return yaml.safe_load(f)
+            return load_config(config_path)
         except Exception as e:
             logger.error(f"加载配置文件失败: {str(e)}")
             return {}
@@ -21,6 +21,8 @@ from sqlalchemy.orm import sessionmaker
 from sqlalchemy import create_engine
 from sqlalchemy import Column, Integer, String, Float, DateTime, Text, Boolean, ForeignKey, JSON
 from sqlalchemy import text
+from sqlalchemy import insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from apscheduler.schedulers.background import BackgroundScheduler
 from apscheduler.triggers.interval import IntervalTrigger
 
@@ -99,6 +101,8 @@ def update_all_prices():
     try:
         with Session() as session:
             items = session.query(Item).all()
+            # 同一批更新的价格使用同一时间戳
+            now = datetime.utcnow()
             for item in items:
                 try:
                     is_valid, item_data, item_errors = validate_and_fetch_data(item.symbol, item.type)
@@ -106,7 +110,7 @@ def update_all_prices():
                         price = Price(
                             item_id=item.id,
                             price=float(item_data['price']),
-                            timestamp=datetime.utcnow(),
+                            timestamp=now,
                             source=item_data.get('source', 'API'),
                             confidence=1.0,
                             price_metadata=item_data
@@ -257,10 +261,38 @@ def generate_historical_prices(base_price, reference_price, days=365, volatility
     
     return data_points
 
+def insert_historical_prices(session, item_id: int, historical_prices: List[Dict]):
+    """以Core批量INSERT写入历史价格，跳过ORM对象构造和工作单元
+    
+    Args:
+        session: 数据库会话
+        item_id: 物品ID
+        historical_prices: generate_historical_prices生成的数据点列表
+    """
+    if not historical_prices:
+        return
+        
+    session.execute(insert(Price), [{
+        'item_id': item_id,
+        'price': float(price_data['price']),
+        'timestamp': price_data['timestamp'],
+        'volume': float(price_data['volume']),
+        'open_price': float(price_data['open_price']),
+        'high_price': float(price_data['high_price']),
+        'low_price': float(price_data['low_price']),
+        'close_price': float(price_data['close_price']),
+        'source': price_data['source'],
+        'confidence': price_data['confidence'],
+        'price_metadata': {'relative_price': float(price_data['relative_price'])}
+    } for price_data in historical_prices])
+
 def init_initial_data():
     """初始化基础数据"""
     session = Session()
     try:
+        # 所有初始价格使用同一时间戳
+        now = datetime.utcnow()
+        
         # 首先添加基准计价物（USD）
         base_currency = INITIAL_DATA['currencies'][0]  # USD
         
@@ -280,7 +312,7 @@ def init_initial_data():
             base_price = Price(
                 item_id=base_item.id,
                 price=base_currency['price'],
-                timestamp=datetime.utcnow(),
+                timestamp=now,
                 source='BASE',
                 confidence=1.0
             )
@@ -304,7 +336,7 @@ def init_initial_data():
                 price = Price(
                     item_id=item.id,
                     price=currency['price'],
-                    timestamp=datetime.utcnow(),
+                    timestamp=now,
                     source='BASE',
                     confidence=1.0
                 )
@@ -319,21 +351,7 @@ def init_initial_data():
                 )
                 
                 # 添加历史价格数据
-                for price_data in historical_prices:
-                    price = Price(
-                        item_id=item.id,
-                        price=price_data['price'],
-                        timestamp=price_data['timestamp'],
-                        volume=price_data['volume'],
-                        open_price=price_data['open_price'],
-                        high_price=price_data['high_price'],
-                        low_price=price_data['low_price'],
-                        close_price=price_data['close_price'],
-                        source=price_data['source'],
-                        confidence=price_data['confidence'],
-                        price_metadata={'relative_price': price_data['relative_price']}
-                    )
-                    session.add(price)
+                insert_historical_prices(session, item.id, historical_prices)
         
         # 添加加密货币
         for crypto in INITIAL_DATA['cryptos']:
@@ -353,7 +371,7 @@ def init_initial_data():
                 price = Price(
                     item_id=item.id,
                     price=crypto['price'],
-                    timestamp=datetime.utcnow(),
+                    timestamp=now,
                     source='BASE',
                     confidence=1.0
                 )
@@ -368,21 +386,7 @@ def init_initial_data():
                 )
                 
                 # 添加历史价格数据
-                for price_data in historical_prices:
-                    price = Price(
-                        item_id=item.id,
-                        price=price_data['price'],
-                        timestamp=price_data['timestamp'],
-                        volume=price_data['volume'],
-                        open_price=price_data['open_price'],
-                        high_price=price_data['high_price'],
-                        low_price=price_data['low_price'],
-                        close_price=price_data['close_price'],
-                        source=price_data['source'],
-                        confidence=price_data['confidence'],
-                        price_metadata={'relative_price': price_data['relative_price']}
-                    )
-                    session.add(price)
+                insert_historical_prices(session, item.id, historical_prices)
                 
                 # 添加市场数据
                 market_data = MarketData(
@@ -393,7 +397,7 @@ def init_initial_data():
                     circulating_supply=random.uniform(1000000, 100000000),
                     total_supply=random.uniform(1000000, 100000000),
                     max_supply=random.uniform(1000000, 100000000),
-                    timestamp=datetime.utcnow(),
+                    timestamp=now,
                     source='SIMULATED',
                     confidence=0.95
                 )
@@ -417,7 +421,7 @@ def init_initial_data():
                 price = Price(
                     item_id=item.id,
                     price=commodity['price'],
-                    timestamp=datetime.utcnow(),
+                    timestamp=now,
                     source='BASE',
                     confidence=1.0
                 )
@@ -432,21 +436,7 @@ def init_initial_data():
                 )
                 
                 # 添加历史价格数据
-                for price_data in historical_prices:
-                    price = Price(
-                        item_id=item.id,
-                        price=price_data['price'],
-                        timestamp=price_data['timestamp'],
-                        volume=price_data['volume'],
-                        open_price=price_data['open_price'],
-                        high_price=price_data['high_price'],
-                        low_price=price_data['low_price'],
-                        close_price=price_data['close_price'],
-                        source=price_data['source'],
-                        confidence=price_data['confidence'],
-                        price_metadata={'relative_price': price_data['relative_price']}
-                    )
-                    session.add(price)
+                insert_historical_prices(session, item.id, historical_prices)
         
         session.commit()
         logger.info("基础数据初始化完成")
@@ -510,14 +500,14 @@ def validate_and_fetch_data(symbol: str, item_type: str) -> Tuple[bool, Dict, Li
                 params={'api_key': API_KEYS['EXCHANGE_RATE']}
             )
             if response.status_code == 200:
-                rates = response.json()['rates']
-                if symbol in rates:
+                rate = response.json()['rates'].get(symbol)
+                if rate is not None:
                     data = {
                         'name': get_currency_name(symbol),
                         'symbol': symbol,
                         'type': ItemType.CURRENCY.value,
                         'market_type': MarketType.FOREX.value,
-                        'price': rates[symbol]
+                        'price': rate
                     }
                 else:
                     errors.append('无法获取该货币的汇率数据')
@@ -538,9 +528,9 @@ def validate_and_fetch_data(symbol: str, item_type: str) -> Tuple[bool, Dict, Li
                 }
             )
             if response.status_code == 200:
-                data = response.json()
-                if symbol.lower() in data:
-                    data = data[symbol.lower()]
+                coin_data = response.json().get(symbol.lower())
+                if coin_data is not None:
+                    data = coin_data
                     data['name'] = get_crypto_name(symbol)
                     data['symbol'] = symbol
                     data['type'] = ItemType.CRYPTO.value
@@ -722,26 +712,24 @@ def add_item():
         
     try:
         with Session() as session:
-            # 检查是否已存在
-            existing = session.query(Item).filter_by(symbol=symbol).first()
-            if existing:
+            # 依赖symbol唯一索引一条语句完成检查和插入，代码已存在时不返回行
+            item_id = session.execute(
+                sqlite_insert(Item).values(
+                    name=item_data.get('name', symbol),
+                    symbol=symbol,
+                    type=item_type,
+                    market_type=item_data.get('market_type'),
+                    description=data.get('description'),
+                    item_metadata=item_data
+                ).on_conflict_do_nothing(index_elements=['symbol']).returning(Item.id)
+            ).scalar()
+            if item_id is None:
                 return jsonify({'error': ['该物品已存在']}), 400
                 
-            # 创建新物品
-            item = Item(
-                name=item_data.get('name', symbol),
-                symbol=symbol,
-                type=item_type,
-                market_type=item_data.get('market_type'),
-                description=data.get('description'),
-                item_metadata=item_data
-            )
-            session.add(item)
-            
             # 添加价格数据
             if 'price' in item_data:
                 price = Price(
-                    item_id=item.id,
+                    item_id=item_id,
                     price=float(item_data['price']),
                     timestamp=datetime.utcnow(),
                     source=item_data.get('source', 'API'),
@@ -753,10 +741,10 @@ def add_item():
             session.commit()
             
             return jsonify({
-                'id': item.id,
-                'name': item.name,
-                'symbol': item.symbol,
-                'type': item.type
+                'id': item_id,
+                'name': item_data.get('name', symbol),
+                'symbol': symbol,
+                'type': item_type
             })
     except Exception as e:
         return jsonify({'error': [str(e)]}), 500
@@ -913,6 +901,7 @@ def batch_update_prices():
             items = session.query(Item).all()
             updated_count = 0
             errors = []
+            now = datetime.utcnow()
             
             for item in items:
                 try:
@@ -922,7 +911,7 @@ def batch_update_prices():
                         price = Price(
                             item_id=item.id,
                             price=float(item_data['price']),
-                            timestamp=datetime.utcnow(),
+                            timestamp=now,
                             source=item_data.get('source', 'API'),
                             confidence=1.0,
                             price_metadata=item_data
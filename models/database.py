@@ -1,8 +1,16 @@
-from sqlalchemy import create_engine, Column, Integer, String, Float, DateTime, ForeignKey, Table, Boolean, Text, Index, JSON
+from sqlalchemy import create_engine, event, text, Column, Integer, String, Float, DateTime, ForeignKey, Table, Boolean, Text, Index, JSON
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship
+from sqlalchemy.schema import CreateIndex
 from datetime import datetime
 import enum
+import json
+
+try:
+    # orjson序列化dict比标准库json快数倍
+    import orjson
+except ImportError:
+    orjson = None
 
 Base = declarative_base()
 
@@ -124,8 +132,10 @@ class Price(Base):
     
     # 索引
     __table_args__ = (
-        Index('idx_prices_item_timestamp', 'item_id', 'timestamp'),
+        # 按物品取最新若干条价格时沿索引顺序扫描
+        Index('idx_prices_item_timestamp_desc', item_id, timestamp.desc()),
         Index('idx_prices_timestamp', 'timestamp'),
+        Index('idx_prices_timestamp_confidence', 'timestamp', 'confidence'),
     )
 
 class ExchangeRate(Base):
@@ -146,6 +156,7 @@ class ExchangeRate(Base):
     __table_args__ = (
         Index('idx_exchange_rates_timestamp', 'timestamp'),
         Index('idx_exchange_rates_pair', 'source_item_id', 'target_item_id'),
+        Index('idx_exchange_rates_timestamp_confidence', 'timestamp', 'confidence'),
     )
 
 class MarketData(Base):
@@ -168,7 +179,7 @@ class MarketData(Base):
     
     # 索引
     __table_args__ = (
-        Index('idx_market_data_item_timestamp', 'item_id', 'timestamp'),
+        Index('idx_market_data_item_timestamp_desc', item_id, timestamp.desc()),
         Index('idx_market_data_market_type', 'market_type'),
     )
 
@@ -212,12 +223,112 @@ class SVUValue(Base):
         Index('idx_svu_values_item', 'item_id'),
     )
 
-def init_db(db_url: str = 'sqlite:///svu_data.db'):
+def json_serializer(value) -> str:
+    """JSON列的序列化函数，安装了orjson时使用orjson，无法编码的值退回标准库json
+    
+    Args:
+        value: 要序列化的值
+    """
+    if orjson is not None:
+        try:
+            return orjson.dumps(value, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY).decode()
+        except TypeError:
+            pass
+    return json.dumps(value)
+
+def json_deserializer(value: str):
+    """JSON列的反序列化函数，orjson不接受的NaN等非标准写法退回标准库json
+    
+    Args:
+        value: JSON字符串
+    """
+    if orjson is not None:
+        try:
+            return orjson.loads(value)
+        except ValueError:
+            pass
+    return json.loads(value)
+
+def configure_sqlite(engine, bulk_load: bool = False):
+    """为SQLite引擎的每个新连接设置PRAGMA，其他数据库不做处理
+    
+    Args:
+        engine: 数据库引擎
+        bulk_load: 是否为一次性批量导入，是则关闭fsync并使用内存日志
+    """
+    if engine.dialect.name != 'sqlite':
+        return engine
+        
+    @event.listens_for(engine, 'connect')
+    def set_sqlite_pragma(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        if bulk_load:
+            cursor.execute("PRAGMA journal_mode=MEMORY")
+            cursor.execute("PRAGMA synchronous=OFF")
+        else:
+            # WAL模式会持久化到数据库文件，已经是WAL时不再切换
+            journal_mode = cursor.execute("PRAGMA journal_mode").fetchone()[0]
+            if journal_mode.lower() != 'wal':
+                cursor.execute("PRAGMA journal_mode=WAL")
+            cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.execute("PRAGMA cache_size=-1048576")
+        cursor.execute("PRAGMA temp_store=MEMORY")
+        cursor.execute("PRAGMA mmap_size=268435456")
+        cursor.close()
+        
+    return engine
+
+def use_explicit_begin(engine):
+    """让SQLite事务从第一条语句开始，DDL和SAVEPOINT都处于同一个事务中
+    
+    pysqlite默认只在DML之前隐式发出BEGIN：之前执行的DROP INDEX会被自动提交，
+    事务中第一条SAVEPOINT语句在RELEASE时直接提交，外层回滚不再生效。
+    
+    Args:
+        engine: 数据库引擎
+    """
+    if engine.dialect.name != 'sqlite':
+        return engine
+        
+    @event.listens_for(engine, 'connect')
+    def disable_pysqlite_begin(dbapi_connection, connection_record):
+        dbapi_connection.isolation_level = None
+        
+    @event.listens_for(engine, 'begin')
+    def emit_begin(conn):
+        conn.exec_driver_sql('BEGIN')
+        
+    # 丢弃注册监听器之前建立的连接
+    engine.dispose()
+    return engine
+
+# 已被降序版本取代的旧索引，已有数据库中需要删除
+SUPERSEDED_INDEXES = ('idx_prices_item_timestamp', 'idx_market_data_item_timestamp')
+
+def ensure_indexes(engine):
+    """补建模型中声明但数据库中还不存在的索引，并删除已被取代的旧索引
+    
+    create_all只为新建的表创建索引，已有数据库不会得到之后新增的索引。
+    
+    Args:
+        engine: 数据库引擎
+    """
+    with engine.begin() as conn:
+        for name in SUPERSEDED_INDEXES:
+            conn.execute(text(f"DROP INDEX IF EXISTS {name}"))
+        for table in Base.metadata.sorted_tables:
+            for index in table.indexes:
+                conn.execute(CreateIndex(index, if_not_exists=True))
+
+def init_db(db_url: str = 'sqlite:///svu_data.db', bulk_load: bool = False):
     """初始化数据库
     
     Args:
         db_url: 数据库URL
+        bulk_load: 是否为一次性批量导入
     """
-    engine = create_engine(db_url)
+    engine = create_engine(db_url, json_serializer=json_serializer, json_deserializer=json_deserializer)
+    engine = configure_sqlite(engine, bulk_load)
     Base.metadata.create_all(engine)
+    ensure_indexes(engine)
     return engine 
\ No newline at end of file
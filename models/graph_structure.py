@@ -1,13 +1,121 @@
 from typing import Dict, List, Optional, Tuple
+import heapq
+from operator import itemgetter
+import numpy as np
 import pandas as pd
 import networkx as nx
+import scipy.sparse as sp
+from scipy.sparse.csgraph import dijkstra
 from datetime import datetime, timedelta
 import logging
+from sqlalchemy import and_
 from sqlalchemy.orm import Session
 from .database import Item, Price, ExchangeRate
+from utils.jit import njit, prange, NUMBA_AVAILABLE
 
 logger = logging.getLogger(__name__)
 
+@njit(parallel=True, cache=True)
+def _group_volatility_kernel(sorted_weights: np.ndarray,
+                             offsets: np.ndarray) -> np.ndarray:
+    """按预排序分组计算波动性（样本标准差/均值）
+
+    Args:
+        sorted_weights: 按节点排序后的边权重
+        offsets: 各节点在sorted_weights中的起止偏移，长度为节点数+1
+
+    Returns:
+        np.ndarray: 各节点的波动性
+    """
+    n_groups = offsets.shape[0] - 1
+    volatility = np.zeros(n_groups)
+    for g in prange(n_groups):
+        start = offsets[g]
+        end = offsets[g + 1]
+        count = end - start
+        if count == 0:
+            continue
+        if count == 1:
+            # 与pandas样本标准差(ddof=1)保持一致
+            volatility[g] = np.nan
+            continue
+        total = 0.0
+        for k in range(start, end):
+            total += sorted_weights[k]
+        mean = total / count
+        m2 = 0.0
+        for k in range(start, end):
+            diff = sorted_weights[k] - mean
+            m2 += diff * diff
+        # 均值为0时波动性无意义，记为0
+        if mean != 0.0:
+            volatility[g] = np.sqrt(m2 / (count - 1)) / mean
+    return volatility
+
+def _node_volatility(node_idx: np.ndarray,
+                     weights: np.ndarray,
+                     n_nodes: int) -> np.ndarray:
+    """计算每个节点关联边权重的波动性
+
+    Args:
+        node_idx: 每条边端点对应的节点下标
+        weights: 与node_idx对齐的边权重
+        n_nodes: 节点数量
+
+    Returns:
+        np.ndarray: 按节点下标排列的波动性
+    """
+    weights = np.asarray(weights, dtype=np.float64)
+    if NUMBA_AVAILABLE:
+        order = np.argsort(node_idx, kind='stable')
+        offsets = np.searchsorted(node_idx[order], np.arange(n_nodes + 1))
+        return _group_volatility_kernel(weights[order], offsets)
+
+    # 未安装numba时使用bincount完成同样的分组归约
+    counts = np.bincount(node_idx, minlength=n_nodes)
+    sums = np.bincount(node_idx, weights=weights, minlength=n_nodes)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        means = sums / counts
+        deviations = weights - means[node_idx]
+        m2 = np.bincount(node_idx, weights=deviations * deviations, minlength=n_nodes)
+        volatility = np.where(means != 0.0, np.sqrt(m2 / (counts - 1)) / means, 0.0)
+    volatility[counts == 1] = np.nan
+    volatility[counts == 0] = 0.0
+    return volatility
+
+def _pagerank(adjacency: sp.csr_matrix,
+              alpha: float = 0.85,
+              max_iter: int = 100,
+              tol: float = 1.0e-6) -> np.ndarray:
+    """在CSR邻接矩阵上以幂迭代计算PageRank，语义与nx.pagerank一致
+    
+    Args:
+        adjacency: 带权邻接矩阵
+        alpha: 阻尼系数
+        max_iter: 最大迭代次数
+        tol: 收敛容差
+        
+    Returns:
+        np.ndarray: 按节点下标排列的PageRank得分
+    """
+    n = adjacency.shape[0]
+    if n == 0:
+        return np.zeros(0)
+        
+    # 行归一化为转移矩阵，出度为0的悬挂节点均匀分配
+    out_weight = np.asarray(adjacency.sum(axis=1)).ravel()
+    dangling = out_weight == 0
+    inv_weight = np.divide(1.0, out_weight, out=np.zeros(n), where=~dangling)
+    transition_t = (sp.diags(inv_weight) @ adjacency).T.tocsr()
+    
+    x = np.full(n, 1.0 / n)
+    for _ in range(max_iter):
+        x_last = x
+        x = alpha * (transition_t @ x_last + x_last[dangling].sum() / n) + (1.0 - alpha) / n
+        if np.abs(x - x_last).sum() < n * tol:
+            return x
+    raise nx.PowerIterationFailedConvergence(max_iter)
+
 class ValueGraph:
     """价值图结构类，用于构建和管理价值关系图"""
     
@@ -21,6 +129,11 @@ class ValueGraph:
         self.graph = nx.DiGraph()
         self.timestamp = None
         
+        # 只读查询使用的CSR快照，在build_graph之后重建
+        self._nodes: List = []
+        self._node_index: Dict = {}
+        self._csr_by_weight: Dict[str, sp.csr_matrix] = {}
+        
     def build_graph(self,
                    start_date: datetime,
                    end_date: datetime,
@@ -36,41 +149,43 @@ class ValueGraph:
             # 清空现有图
             self.graph.clear()
             
-            # 获取所有物品
-            items = self.db.query(Item).all()
-            
-            # 添加节点
-            for item in items:
-                self.graph.add_node(
-                    item.id,
-                    name=item.name,
-                    symbol=item.symbol,
-                    type=item.type
+            # 一次连接查询获取物品及其区间内的价格，外连接保留没有价格的物品
+            rows = self.db.query(Item, Price).outerjoin(
+                Price,
+                and_(
+                    Price.item_id == Item.id,
+                    Price.timestamp.between(start_date, end_date),
+                    Price.confidence >= min_confidence
                 )
+            ).order_by(Item.id).yield_per(1000)
             
-            # 获取价格数据
-            prices = self.db.query(Price).filter(
-                Price.timestamp.between(start_date, end_date),
-                Price.confidence >= min_confidence
-            ).all()
+            for item, price in rows:
+                # 添加节点
+                if item.id not in self.graph:
+                    self.graph.add_node(
+                        item.id,
+                        name=item.name,
+                        symbol=item.symbol,
+                        type=item.type
+                    )
+                
+                # 添加价格边
+                if price is not None:
+                    self.graph.add_edge(
+                        'SVU',  # 假设SVU是基准节点
+                        price.item_id,
+                        weight=price.price,
+                        timestamp=price.timestamp,
+                        source=price.source,
+                        confidence=price.confidence,
+                        type='price'
+                    )
             
             # 获取汇率数据
             rates = self.db.query(ExchangeRate).filter(
                 ExchangeRate.timestamp.between(start_date, end_date),
                 ExchangeRate.confidence >= min_confidence
-            ).all()
-            
-            # 添加价格边
-            for price in prices:
-                self.graph.add_edge(
-                    'SVU',  # 假设SVU是基准节点
-                    price.item_id,
-                    weight=price.price,
-                    timestamp=price.timestamp,
-                    source=price.source,
-                    confidence=price.confidence,
-                    type='price'
-                )
+            ).yield_per(1000)
             
             # 添加汇率边
             for rate in rates:
@@ -87,6 +202,9 @@ class ValueGraph:
             # 计算节点属性
             self._compute_node_attributes()
             
+            # 重建CSR快照
+            self._build_csr_snapshot()
+            
             # 更新图的时间戳
             self.timestamp = end_date
             
@@ -99,30 +217,69 @@ class ValueGraph:
     def _compute_node_attributes(self) -> None:
         """计算节点属性"""
         try:
-            # 计算每个节点的波动性得分
-            for node in self.graph.nodes:
-                # 获取节点的所有入边和出边
-                in_edges = list(self.graph.in_edges(node, data=True))
-                out_edges = list(self.graph.out_edges(node, data=True))
-                
-                # 计算价格/汇率的波动性
-                prices = [edge['weight'] for edge in in_edges + out_edges]
-                if prices:
-                    volatility = pd.Series(prices).std() / pd.Series(prices).mean()
-                else:
-                    volatility = 0.0
-                
-                # 更新节点属性
-                self.graph.nodes[node]['volatility'] = volatility
-                
-                # 计算节点的中心性
-                self.graph.nodes[node]['in_degree'] = len(in_edges)
-                self.graph.nodes[node]['out_degree'] = len(out_edges)
+            nodes = list(self.graph.nodes)
+            node_index = {node: i for i, node in enumerate(nodes)}
+            n_edges = self.graph.number_of_edges()
+            
+            # 将边展开为(源下标, 目标下标, 权重)数组
+            src_idx = np.empty(n_edges, dtype=np.int64)
+            dst_idx = np.empty(n_edges, dtype=np.int64)
+            edge_weights = np.empty(n_edges, dtype=np.float64)
+            for k, (source, target, weight) in enumerate(self.graph.edges(data='weight')):
+                src_idx[k] = node_index[source]
+                dst_idx[k] = node_index[target]
+                edge_weights[k] = weight
+            
+            # 每条边同时计入两个端点的价格/汇率序列
+            node_idx = np.concatenate([dst_idx, src_idx])
+            weights = np.concatenate([edge_weights, edge_weights])
+            
+            # 计算价格/汇率的波动性
+            volatility = _node_volatility(node_idx, weights, len(nodes))
+            
+            # 计算节点的中心性
+            in_degree = np.bincount(dst_idx, minlength=len(nodes))
+            out_degree = np.bincount(src_idx, minlength=len(nodes))
+            
+            # 更新节点属性
+            for i, node in enumerate(nodes):
+                attrs = self.graph.nodes[node]
+                attrs['volatility'] = float(volatility[i])
+                attrs['in_degree'] = int(in_degree[i])
+                attrs['out_degree'] = int(out_degree[i])
                 
         except Exception as e:
             logger.error(f"计算节点属性失败: {str(e)}")
             raise
             
+    def _build_csr_snapshot(self) -> None:
+        """导出图的CSR快照，供最短路径和中心性等只读分析使用"""
+        self._nodes = list(self.graph.nodes)
+        self._node_index = {node: i for i, node in enumerate(self._nodes)}
+        # 先清空上一次构建的缓存，否则_get_csr会直接返回旧图的矩阵
+        self._csr_by_weight = {}
+        self._get_csr('weight')
+        
+    def _get_csr(self, weight: str) -> sp.csr_matrix:
+        """获取指定权重属性的CSR邻接矩阵
+        
+        Args:
+            weight: 权重属性
+            
+        Returns:
+            sp.csr_matrix: 邻接矩阵
+        """
+        csr = self._csr_by_weight.get(weight)
+        if csr is None:
+            csr = sp.csr_matrix(nx.to_scipy_sparse_array(
+                self.graph,
+                nodelist=self._nodes,
+                weight=weight,
+                format='csr'
+            ))
+            self._csr_by_weight[weight] = csr
+        return csr
+        
     def get_node_attributes(self, node_id: int) -> Dict:
         """获取节点属性
         
@@ -160,18 +317,29 @@ class ValueGraph:
         Returns:
             List[int]: 路径节点ID列表
         """
-        try:
-            path = nx.shortest_path(
-                self.graph,
-                source=source_id,
-                target=target_id,
-                weight=weight
-            )
-            return path
-        except nx.NetworkXNoPath:
+        for node_id in (source_id, target_id):
+            if node_id not in self._node_index:
+                raise nx.NodeNotFound(f"节点{node_id}不在图中")
+                
+        source_idx = self._node_index[source_id]
+        target_idx = self._node_index[target_id]
+        distances, predecessors = dijkstra(
+            self._get_csr(weight),
+            directed=True,
+            indices=source_idx,
+            return_predecessors=True
+        )
+        
+        if np.isinf(distances[target_idx]):
             logger.warning(f"未找到从{source_id}到{target_id}的路径")
             return []
             
+        # 沿前驱数组回溯路径
+        path = [target_idx]
+        while path[-1] != source_idx:
+            path.append(predecessors[path[-1]])
+        return [self._nodes[i] for i in reversed(path)]
+            
     def get_central_nodes(self, top_n: int = 10) -> List[Tuple[int, float]]:
         """获取中心节点
         
@@ -182,17 +350,12 @@ class ValueGraph:
             List[Tuple[int, float]]: 节点ID和中心性得分的元组列表
         """
         try:
-            # 计算PageRank中心性
-            centrality = nx.pagerank(self.graph)
-            
-            # 按中心性得分排序
-            sorted_nodes = sorted(
-                centrality.items(),
-                key=lambda x: x[1],
-                reverse=True
-            )
+            # 在CSR快照上计算PageRank中心性
+            scores = _pagerank(self._get_csr('weight'))
+            centrality = dict(zip(self._nodes, scores.tolist()))
             
-            return sorted_nodes[:top_n]
+            # 只取得分最高的top_n个节点，无需全量排序
+            return heapq.nlargest(top_n, centrality.items(), key=itemgetter(1))
             
         except Exception as e:
             logger.error(f"计算中心节点失败: {str(e)}")
@@ -211,20 +374,25 @@ class ValueGraph:
             List[Tuple[int, float]]: 节点ID和波动性得分的元组列表
         """
         try:
+            if top_n <= 0:
+                return []
+                
             # 获取所有节点的波动性
-            volatilities = [
-                (node, self.graph.nodes[node]['volatility'])
-                for node in self.graph.nodes
-            ]
-            
-            # 过滤并排序
-            volatile_nodes = [
-                (node, vol) for node, vol in volatilities
-                if vol >= threshold
-            ]
-            volatile_nodes.sort(key=lambda x: x[1], reverse=True)
-            
-            return volatile_nodes[:top_n]
+            nodes = list(self.graph.nodes)
+            volatilities = np.fromiter(
+                (self.graph.nodes[node]['volatility'] for node in nodes),
+                dtype=np.float64,
+                count=len(nodes)
+            )
+            
+            # 过滤，候选过多时先用argpartition选出top_n，再只对这部分排序
+            candidates = np.flatnonzero(volatilities >= threshold)
+            if len(candidates) > top_n:
+                top = np.argpartition(-volatilities[candidates], top_n - 1)[:top_n]
+                candidates = candidates[top]
+            order = candidates[np.argsort(-volatilities[candidates], kind='stable')]
+            
+            return [(nodes[i], float(volatilities[i])) for i in order]
             
         except Exception as e:
             logger.error(f"获取波动性节点失败: {str(e)}")
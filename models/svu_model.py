@@ -3,7 +3,7 @@ import torch.nn as nn
 import torch.nn.functional as F
 from torch_geometric.nn import GCNConv, global_mean_pool
 import numpy as np
-from typing import List, Dict, Tuple, Optional
+from typing import List, Dict, Tuple, Optional, Union
 
 class SVUGraphModel(nn.Module):
     """SVU图神经网络模型"""
@@ -83,9 +83,9 @@ class SVUPredictor:
         self.device = device
         
     def prepare_graph_data(self,
-                          features: np.ndarray,
-                          edge_index: np.ndarray) -> Tuple[torch.Tensor, torch.Tensor]:
-        """准备图数据
+                          features: Union[np.ndarray, torch.Tensor],
+                          edge_index: Union[np.ndarray, torch.Tensor]) -> Tuple[torch.Tensor, torch.Tensor]:
+        """准备图数据，已经是目标设备上对应类型的张量时直接复用，不再拷贝
         
         Args:
             features: 节点特征
@@ -94,8 +94,8 @@ class SVUPredictor:
         Returns:
             Tuple[torch.Tensor, torch.Tensor]: 处理后的特征和边索引
         """
-        x = torch.FloatTensor(features).to(self.device)
-        edge_index = torch.LongTensor(edge_index).to(self.device)
+        x = torch.as_tensor(features, dtype=torch.float32, device=self.device)
+        edge_index = torch.as_tensor(edge_index, dtype=torch.long, device=self.device)
         return x, edge_index
         
     def train(self,
@@ -0,0 +1,217 @@
+"""数据转换管道使用的Numba分组滚动计算内核
+
+所有内核的输入都是按(分组, 时间)排序后的扁平数组，offsets给出每个分组在数组中的
+起止位置（长度为分组数+1），starts给出每个位置所在滚动窗口的起始下标。
+各分组之间相互独立，通过prange并行计算。
+相关系数内核的输入是时间×物品的稠密矩阵，各物品对之间并行计算。
+"""
+import numpy as np
+from utils.jit import njit, prange
+
+def group_offsets(sorted_keys: np.ndarray) -> np.ndarray:
+    """计算已排序分组键的分组偏移
+
+    Args:
+        sorted_keys: 已排序的分组键
+
+    Returns:
+        np.ndarray: 分组偏移，长度为分组数+1
+    """
+    n = len(sorted_keys)
+    if n == 0:
+        return np.zeros(1, dtype=np.int64)
+    boundaries = np.flatnonzero(sorted_keys[1:] != sorted_keys[:-1]) + 1
+    return np.concatenate(([0], boundaries, [n])).astype(np.int64)
+
+def fixed_window_starts(offsets: np.ndarray, window: int) -> np.ndarray:
+    """计算固定长度窗口(最近window个位置)在每个分组内的起始下标
+
+    Args:
+        offsets: 分组偏移
+        window: 窗口长度(条数)
+
+    Returns:
+        np.ndarray: 每个位置的窗口起始下标
+    """
+    group_starts = np.repeat(offsets[:-1], np.diff(offsets))
+    return np.maximum(np.arange(offsets[-1], dtype=np.int64) - window + 1, group_starts)
+
+@njit(cache=True, nogil=True, parallel=True)
+def time_window_starts(timestamps: np.ndarray,
+                       offsets: np.ndarray,
+                       window: int) -> np.ndarray:
+    """计算时间窗口(t - window, t]在每个分组内的起始下标
+
+    Args:
+        timestamps: 排序后的时间戳(int64纳秒)
+        offsets: 分组偏移
+        window: 窗口长度(纳秒)
+
+    Returns:
+        np.ndarray: 每个位置的窗口起始下标
+    """
+    starts = np.empty(timestamps.shape[0], dtype=np.int64)
+    for g in prange(offsets.shape[0] - 1):
+        left = offsets[g]
+        for i in range(offsets[g], offsets[g + 1]):
+            while timestamps[left] <= timestamps[i] - window:
+                left += 1
+            starts[i] = left
+    return starts
+
+@njit(cache=True, nogil=True, parallel=True)
+def rolling_std_grouped(values: np.ndarray,
+                        starts: np.ndarray,
+                        offsets: np.ndarray,
+                        min_periods: int,
+                        out: np.ndarray) -> None:
+    """分组滚动样本标准差(ddof=1)，使用可增删的Welford算法，每步O(1)
+
+    NaN不计入观测数，与pandas的rolling().std()语义一致。
+
+    Args:
+        values: 排序后的数值
+        starts: 每个位置的窗口起始下标
+        offsets: 分组偏移
+        min_periods: 最少观测数
+        out: 输出数组
+    """
+    for g in prange(offsets.shape[0] - 1):
+        nobs = 0
+        mean = 0.0
+        m2 = 0.0
+        left = offsets[g]
+        for i in range(offsets[g], offsets[g + 1]):
+            # 移出窗口左侧的观测
+            while left < starts[i]:
+                x = values[left]
+                if not np.isnan(x):
+                    nobs -= 1
+                    if nobs == 0:
+                        mean = 0.0
+                        m2 = 0.0
+                    else:
+                        delta = x - mean
+                        mean -= delta / nobs
+                        m2 -= delta * (x - mean)
+                left += 1
+
+            # 加入当前观测
+            x = values[i]
+            if not np.isnan(x):
+                nobs += 1
+                delta = x - mean
+                mean += delta / nobs
+                m2 += delta * (x - mean)
+
+            if nobs >= min_periods and nobs > 1:
+                out[i] = np.sqrt(max(m2, 0.0) / (nobs - 1))
+            else:
+                out[i] = np.nan
+
+@njit(cache=True, nogil=True, parallel=True)
+def rolling_mean_grouped(values: np.ndarray,
+                         starts: np.ndarray,
+                         offsets: np.ndarray,
+                         min_periods: int,
+                         out: np.ndarray) -> None:
+    """分组滚动均值，维护窗口内的累加和，每步O(1)
+
+    Args:
+        values: 排序后的数值
+        starts: 每个位置的窗口起始下标
+        offsets: 分组偏移
+        min_periods: 最少观测数
+        out: 输出数组
+    """
+    for g in prange(offsets.shape[0] - 1):
+        nobs = 0
+        total = 0.0
+        left = offsets[g]
+        for i in range(offsets[g], offsets[g + 1]):
+            while left < starts[i]:
+                x = values[left]
+                if not np.isnan(x):
+                    nobs -= 1
+                    total -= x
+                left += 1
+
+            x = values[i]
+            if not np.isnan(x):
+                nobs += 1
+                total += x
+
+            if nobs >= min_periods and nobs > 0:
+                out[i] = total / nobs
+            else:
+                out[i] = np.nan
+
+@njit(cache=True, nogil=True, parallel=True)
+def rolling_corr_matrix(values: np.ndarray,
+                        starts: np.ndarray,
+                        min_periods: int,
+                        out: np.ndarray) -> None:
+    """滚动两两Pearson相关系数，每对物品维护可增删的均值与协方差矩，每步O(1)
+
+    只使用两者同时非NaN的观测，与pandas的rolling().corr()语义一致。
+
+    Args:
+        values: 时间×物品的价格矩阵，缺失为NaN
+        starts: 每个时间点的窗口起始行
+        min_periods: 最少观测数
+        out: 输出数组，形状为(时间, 物品, 物品)
+    """
+    n_rows, n_items = values.shape
+    for i in prange(n_items):
+        for j in range(i, n_items):
+            nobs = 0
+            mean_x = 0.0
+            mean_y = 0.0
+            m2_x = 0.0
+            m2_y = 0.0
+            c_xy = 0.0
+            left = 0
+            for t in range(n_rows):
+                # 移出窗口左侧的观测
+                while left < starts[t]:
+                    x = values[left, i]
+                    y = values[left, j]
+                    if not (np.isnan(x) or np.isnan(y)):
+                        nobs -= 1
+                        if nobs == 0:
+                            mean_x = 0.0
+                            mean_y = 0.0
+                            m2_x = 0.0
+                            m2_y = 0.0
+                            c_xy = 0.0
+                        else:
+                            new_mean_x = mean_x - (x - mean_x) / nobs
+                            new_mean_y = mean_y - (y - mean_y) / nobs
+                            m2_x -= (x - new_mean_x) * (x - mean_x)
+                            m2_y -= (y - new_mean_y) * (y - mean_y)
+                            c_xy -= (x - new_mean_x) * (y - mean_y)
+                            mean_x = new_mean_x
+                            mean_y = new_mean_y
+                    left += 1
+
+                # 加入当前观测
+                x = values[t, i]
+                y = values[t, j]
+                if not (np.isnan(x) or np.isnan(y)):
+                    nobs += 1
+                    dx = x - mean_x
+                    mean_x += dx / nobs
+                    dy = y - mean_y
+                    mean_y += dy / nobs
+                    m2_x += dx * (x - mean_x)
+                    m2_y += dy * (y - mean_y)
+                    c_xy += dx * (y - mean_y)
+
+                denom = m2_x * m2_y
+                if nobs >= min_periods and nobs > 1 and denom > 0.0:
+                    corr = c_xy / np.sqrt(denom)
+                    out[t, i, j] = corr
+                    out[t, j, i] = corr
+                else:
+                    out[t, i, j] = np.nan
+                    out[t, j, i] = np.nan
@@ -2,14 +2,34 @@ from typing import Dict, List, Optional, Union
 import pandas as pd
 from datetime import datetime, timedelta
 import logging
+import io
 from pathlib import Path
-import yaml
 from dataclasses import dataclass
+from sqlalchemy import insert
 from sqlalchemy.orm import Session
 from models.database import Item, Price, ExchangeRate
+from utils.config import load_config
 
 logger = logging.getLogger(__name__)
 
+def _compact_dtypes(df: pd.DataFrame) -> pd.DataFrame:
+    """压缩数据点DataFrame的列类型
+    
+    source/type为低基数字符串，转换为分类类型；confidence和item_id向下转换为
+    float32/最小整数类型，以降低内存并加快分组与isin过滤。
+    
+    Args:
+        df: 由DataPoint构建的DataFrame
+        
+    Returns:
+        pd.DataFrame: 类型压缩后的DataFrame
+    """
+    df['source'] = df['source'].astype('category')
+    df['type'] = df['type'].astype('category')
+    df['confidence'] = pd.to_numeric(df['confidence'], downcast='float')
+    df['item_id'] = pd.to_numeric(df['item_id'], downcast='integer')
+    return df
+
 @dataclass
 class DataPoint:
     """数据点类，表示统一的价格记录"""
@@ -49,6 +69,16 @@ class DataPoint:
 class DataIngestionPipeline:
     """数据摄入管道类"""
     
+    # 批量写入时每次executemany的行数
+    BULK_CHUNKSIZE = 10_000
+    
+    # 批量写入的字段
+    BULK_COLUMNS = {
+        'prices': ['item_id', 'price', 'timestamp', 'source', 'confidence'],
+        'exchange_rates': ['source_item_id', 'target_item_id', 'rate',
+                           'timestamp', 'source', 'confidence']
+    }
+    
     def __init__(self,
                  db_session: Session,
                  config_path: str = 'config/api_config.yaml'):
@@ -72,8 +102,7 @@ class DataIngestionPipeline:
             dict: 配置信息
         """
         try:
-            with open(config_path, 'r', encoding='utf-8') as f:
-                return yaml.safe_load(f)
+            return load_config(config_path)
         except Exception as e:
             logger.error(f"加载配置文件失败: {str(e)}")
             return {}
@@ -102,30 +131,34 @@ class DataIngestionPipeline:
             if not all(col in data.columns for col in required_columns):
                 raise ValueError(f"数据缺少必需的列: {required_columns}")
                 
-            # 转换为DataPoint对象
-            for _, row in data.iterrows():
-                if data_type == 'price':
-                    data_point = DataPoint(
-                        timestamp=row['timestamp'],
-                        item_id=row['item_id'],
-                        value=row['value'],
+            # 转换为DataPoint对象，itertuples不为每行构造Series，且保留各列自身的类型
+            rows = data[required_columns].itertuples(index=False)
+            if data_type == 'price':
+                self.data_points.extend(
+                    DataPoint(
+                        timestamp=row.timestamp,
+                        item_id=row.item_id,
+                        value=row.value,
                         source=source,
                         confidence=confidence,
                         type='price'
                     )
-                else:
-                    data_point = DataPoint(
-                        timestamp=row['timestamp'],
-                        item_id=row['source_item_id'],  # 使用源物品ID
-                        value=row['value'],
+                    for row in rows
+                )
+            else:
+                self.data_points.extend(
+                    DataPoint(
+                        timestamp=row.timestamp,
+                        item_id=row.source_item_id,  # 使用源物品ID
+                        value=row.value,
                         source=source,
                         confidence=confidence,
                         type='exchange_rate',
-                        source_item_id=row['source_item_id'],
-                        target_item_id=row['target_item_id']
+                        source_item_id=row.source_item_id,
+                        target_item_id=row.target_item_id
                     )
-                    
-                self.data_points.append(data_point)
+                    for row in rows
+                )
                 
             logger.info(f"成功摄入{len(data)}条{data_type}数据")
             
@@ -150,36 +183,67 @@ class DataIngestionPipeline:
                 raise ValueError("没有数据点可供合并")
                 
             # 转换为DataFrame
-            df = pd.DataFrame([dp.to_dict() for dp in self.data_points])
+            df = _compact_dtypes(pd.DataFrame([dp.to_dict() for dp in self.data_points]))
             
-            # 按时间戳和物品ID分组
-            grouped = df.groupby(['timestamp', 'item_id'])
+            # 阈值转换为与confidence列相同的精度，避免float32截断导致边界值被误过滤
+            min_confidence = df['confidence'].dtype.type(min_confidence)
             
-            # 合并数据
-            merged_data = []
-            for (timestamp, item_id), group in grouped:
-                # 过滤低置信度数据
-                group = group[group['confidence'] >= min_confidence]
-                
-                if group.empty:
-                    continue
-                    
-                # 如果有优先数据源，优先使用它们的数据
-                if priority_sources:
-                    priority_group = group[group['source'].isin(priority_sources)]
-                    if not priority_group.empty:
-                        group = priority_group
-                        
-                # 选择置信度最高的数据
-                best_data = group.loc[group['confidence'].idxmax()]
-                merged_data.append(best_data)
+            # 过滤低置信度数据
+            df = df[df['confidence'] >= min_confidence]
+            keys = [df['timestamp'], df['item_id']]
+            
+            # 如果有优先数据源，同一时间戳和物品存在优先数据源时只保留它们的数据
+            if priority_sources:
+                is_priority = df['source'].isin(priority_sources)
+                has_priority = is_priority.groupby(keys).transform('any')
+                df = df[is_priority | ~has_priority]
+                keys = [df['timestamp'], df['item_id']]
                 
-            return pd.DataFrame(merged_data)
+            # 每个时间戳和物品选择置信度最高的数据，一次取出所有行
+            best_rows = df.groupby(keys)['confidence'].idxmax()
+            return df.loc[best_rows.to_numpy()]
             
         except Exception as e:
             logger.error(f"合并数据失败: {str(e)}")
             return pd.DataFrame()
             
+    def _bulk_write(self, df: pd.DataFrame, model) -> None:
+        """批量写入数据表
+        
+        PostgreSQL(psycopg2)下通过COPY FROM STDIN一次写入，其他数据库使用Core
+        insert按块executemany，避免逐行创建ORM对象。
+        
+        Args:
+            df: 列名与数据表字段一致的数据
+            model: 目标ORM模型
+        """
+        if df.empty:
+            return
+            
+        columns = [c for c in self.BULK_COLUMNS[model.__tablename__] if c in df.columns]
+        records = df[columns].assign(created_at=datetime.utcnow())
+        
+        # 合并后的外键列可能因缺失值变为浮点，写入前还原为整数
+        id_columns = [c for c in columns if c.endswith('_id')]
+        records[id_columns] = records[id_columns].astype('int64')
+        columns.append('created_at')
+        
+        if self.db.get_bind().dialect.name == 'postgresql':
+            cursor = self.db.connection().connection.cursor()
+            if hasattr(cursor, 'copy_expert'):
+                buffer = io.StringIO()
+                records.to_csv(buffer, index=False, header=False)
+                buffer.seek(0)
+                cursor.copy_expert(
+                    f"COPY {model.__tablename__} ({', '.join(columns)}) FROM STDIN WITH CSV",
+                    buffer
+                )
+                return
+                
+        rows = records.to_dict('records')
+        for start in range(0, len(rows), self.BULK_CHUNKSIZE):
+            self.db.execute(insert(model), rows[start:start + self.BULK_CHUNKSIZE])
+            
     def save_to_database(self, data: pd.DataFrame) -> None:
         """保存数据到数据库
         
@@ -191,28 +255,11 @@ class DataIngestionPipeline:
             price_data = data[data['type'] == 'price']
             rate_data = data[data['type'] == 'exchange_rate']
             
-            # 保存价格数据
-            for _, row in price_data.iterrows():
-                price = Price(
-                    item_id=row['item_id'],
-                    price=row['value'],
-                    timestamp=row['timestamp'],
-                    source=row['source'],
-                    confidence=row['confidence']
-                )
-                self.db.add(price)
-                
-            # 保存汇率数据
-            for _, row in rate_data.iterrows():
-                rate = ExchangeRate(
-                    source_item_id=row['source_item_id'],
-                    target_item_id=row['target_item_id'],
-                    rate=row['value'],
-                    timestamp=row['timestamp'],
-                    source=row['source'],
-                    confidence=row['confidence']
-                )
-                self.db.add(rate)
+            # 批量保存价格数据
+            self._bulk_write(price_data.rename(columns={'value': 'price'}), Price)
+            
+            # 批量保存汇率数据
+            self._bulk_write(rate_data.rename(columns={'value': 'rate'}), ExchangeRate)
                 
             # 提交事务
             self.db.commit()
@@ -249,7 +296,7 @@ class DataIngestionPipeline:
                 }
                 
             # 转换为DataFrame
-            df = pd.DataFrame([dp.to_dict() for dp in self.data_points])
+            df = _compact_dtypes(pd.DataFrame([dp.to_dict() for dp in self.data_points]))
             
             # 计算统计信息
             stats = {
@@ -258,9 +305,9 @@ class DataIngestionPipeline:
                 'rate_points': len(df[df['type'] == 'exchange_rate']),
                 'sources': df['source'].value_counts().to_dict(),
                 'confidence_stats': {
-                    'mean': df['confidence'].mean(),
-                    'min': df['confidence'].min(),
-                    'max': df['confidence'].max()
+                    'mean': float(df['confidence'].mean()),
+                    'min': float(df['confidence'].min()),
+                    'max': float(df['confidence'].max())
                 }
             }
             
@@ -3,19 +3,42 @@ import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta
 import logging
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-import yaml
+from sqlalchemy import func, distinct
 from sqlalchemy.orm import Session
 from models.database import Item, Price, ExchangeRate
+from utils.config import load_config
 from pipeline.ingest import DataIngestionPipeline
-from pipeline.transform import DataTransformationPipeline
+from pipeline.transform import DataTransformationPipeline, ResampleCache, SeriesResult
 from pipeline.validate import DataValidationPipeline
 
 logger = logging.getLogger(__name__)
 
+def _sample_std(count: int, mean: Optional[float], sq_sum: Optional[float]) -> Optional[float]:
+    """由数据库聚合得到的计数、均值和平方和计算样本标准差(ddof=1)
+    
+    SQLite没有STDDEV聚合函数，因此用SUM(x*x)换算，保证各数据库结果一致。
+    
+    Args:
+        count: 记录数
+        mean: 均值
+        sq_sum: 平方和
+        
+    Returns:
+        Optional[float]: 样本标准差，记录数不足两条时为None
+    """
+    if count is None or count < 2 or mean is None or sq_sum is None:
+        return None
+    variance = (sq_sum - count * mean * mean) / (count - 1)
+    return float(np.sqrt(max(variance, 0.0)))
+
 class DataPipelineManager:
     """数据管道管理器类"""
     
+    # 并行执行转换步骤的线程数
+    TRANSFORM_WORKERS = 4
+    
     def __init__(self,
                  db_session: Session,
                  config_path: str = 'config/api_config.yaml'):
@@ -43,12 +66,108 @@ class DataPipelineManager:
             dict: 配置信息
         """
         try:
-            with open(config_path, 'r', encoding='utf-8') as f:
-                return yaml.safe_load(f)
+            return load_config(config_path)
         except Exception as e:
             logger.error(f"加载配置文件失败: {str(e)}")
             return {}
             
+    def _read_frame(self, query) -> pd.DataFrame:
+        """读取查询结果为DataFrame
+        
+        一致性验证要配对整张表中的正反向汇率，完整性验证按物品分组，都需要完整的表；
+        分块读取后仍要合并，峰值内存并不会降低，因此一次读取，只通过选择所需列控制内存
+        
+        Args:
+            query: 只选择所需列的查询
+            
+        Returns:
+            pd.DataFrame: 查询结果
+        """
+        return pd.read_sql(query.statement, self.db.bind, parse_dates=['timestamp'])
+        
+    def _fetch_row(self, query) -> tuple:
+        """在独立连接上执行只返回一行的查询
+        
+        Args:
+            query: 聚合查询
+            
+        Returns:
+            tuple: 查询结果行
+        """
+        with self.db.get_bind().connect() as connection:
+            return tuple(connection.execute(query.statement).one())
+            
+    def _gather_in_threads(self, func, *queries) -> List:
+        """在线程池中并发执行多个相互独立的数据库读取
+        
+        每个读取使用引擎上的独立连接，不共享会话，总耗时取最慢的一个。
+        
+        Args:
+            func: 读取函数
+            queries: 查询列表
+            
+        Returns:
+            List: 与查询顺序对应的结果
+        """
+        # 使用线程池而不是asyncio.run，在已有事件循环运行的环境中调用也不会出错
+        with ThreadPoolExecutor(max_workers=len(queries)) as executor:
+            return list(executor.map(func, queries))
+        
+    def _run_transforms(self,
+                        data: pd.DataFrame,
+                        base_item_id: int) -> Dict[str, SeriesResult]:
+        """并行执行相互独立的价格转换步骤
+        
+        Args:
+            data: 价格数据
+            base_item_id: 基准物品ID
+            
+        Returns:
+            Dict[str, SeriesResult]: 各转换步骤的结果
+        """
+        transform = self.transformation_pipeline
+        # 时间戳和物品ID只转换一次，各转换步骤共用转换后的副本
+        data = transform._prepare(data)
+        # 重采样结果只在本次转换内共享，返回后随之释放
+        cache = ResampleCache()
+        with ThreadPoolExecutor(max_workers=self.TRANSFORM_WORKERS) as executor:
+            normalized_future = executor.submit(transform.normalize_prices,
+                                                data,
+                                                base_item_id=base_item_id)
+            volatility_future = executor.submit(transform.calculate_volatility, data, cache=cache)
+            metrics_future = executor.submit(transform.calculate_market_metrics, data)
+            trend_future = executor.submit(transform.calculate_trend_indicators, data, cache=cache)
+            
+            return {
+                'normalized_prices': normalized_future.result(),
+                'volatility': volatility_future.result(),
+                'market_metrics': metrics_future.result(),
+                'trend_indicators': trend_future.result()
+            }
+            
+    def _ingest_and_transform(self,
+                              data: pd.DataFrame,
+                              source: str,
+                              base_item_id: int) -> Dict[str, SeriesResult]:
+        """同时摄入数据和执行转换，总耗时取两者中较长的一个
+        
+        Args:
+            data: 价格数据
+            source: 数据来源
+            base_item_id: 基准物品ID
+            
+        Returns:
+            Dict[str, SeriesResult]: 各转换步骤的结果
+        """
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            ingest_future = executor.submit(self.ingestion_pipeline.ingest_data,
+                                            data,
+                                            source=source,
+                                            data_type='price')
+            transform_future = executor.submit(self._run_transforms, data, base_item_id)
+            ingest_future.result()
+            return transform_future.result()
+        
     def process_price_data(self,
                           data: pd.DataFrame,
                           source: str,
@@ -70,6 +189,14 @@ class DataPipelineManager:
             Dict: 处理结果
         """
         try:
+            # 空数据或缺少价格列时直接返回
+            if data.empty or 'price' not in data.columns:
+                logger.error("价格数据为空或缺少price列")
+                return {
+                    'success': False,
+                    'error': '价格数据为空或缺少price列'
+                }
+                
             # 验证数据
             validation_results = self.validation_pipeline.validate_price_data(
                 data,
@@ -85,22 +212,8 @@ class DataPipelineManager:
                     'validation_results': validation_results
                 }
                 
-            # 摄入数据
-            self.ingestion_pipeline.ingest_data(
-                data,
-                source=source,
-                data_type='price'
-            )
-            
-            # 转换数据
-            normalized_prices = self.transformation_pipeline.normalize_prices(
-                data,
-                base_item_id=base_item_id
-            )
-            
-            volatility = self.transformation_pipeline.calculate_volatility(data)
-            market_metrics = self.transformation_pipeline.calculate_market_metrics(data)
-            trend_indicators = self.transformation_pipeline.calculate_trend_indicators(data)
+            # 摄入数据与转换数据同时进行
+            transformed = self._ingest_and_transform(data, source, base_item_id)
             
             # 合并数据
             merged_data = self.ingestion_pipeline.merge_data()
@@ -112,10 +225,8 @@ class DataPipelineManager:
                 'success': True,
                 'validation_results': validation_results,
                 'statistics': self.ingestion_pipeline.get_statistics(),
-                'normalized_prices': normalized_prices,
-                'volatility': volatility,
-                'market_metrics': market_metrics,
-                'trend_indicators': trend_indicators
+                # 转换结果只在返回时构造为DataFrame
+                **{name: result.to_frame() for name, result in transformed.items()}
             }
             
         except Exception as e:
@@ -144,6 +255,14 @@ class DataPipelineManager:
             Dict: 处理结果
         """
         try:
+            # 空数据或缺少汇率列时直接返回
+            if data.empty or 'rate' not in data.columns:
+                logger.error("汇率数据为空或缺少rate列")
+                return {
+                    'success': False,
+                    'error': '汇率数据为空或缺少rate列'
+                }
+                
             # 验证数据
             validation_results = self.validation_pipeline.validate_exchange_rate_data(
                 data,
@@ -200,16 +319,14 @@ class DataPipelineManager:
             Dict: 验证结果
         """
         try:
-            # 获取价格数据
-            prices = pd.read_sql(
-                self.db.query(Price).statement,
-                self.db.bind
-            )
-            
-            # 获取汇率数据
-            rates = pd.read_sql(
-                self.db.query(ExchangeRate).statement,
-                self.db.bind
+            # 同时读取价格和汇率数据，只读取验证所需的列
+            prices, rates = self._gather_in_threads(
+                self._read_frame,
+                self.db.query(Price.item_id, Price.timestamp),
+                self.db.query(ExchangeRate.source_item_id,
+                              ExchangeRate.target_item_id,
+                              ExchangeRate.rate,
+                              ExchangeRate.timestamp)
             )
             
             # 验证数据一致性
@@ -247,47 +364,73 @@ class DataPipelineManager:
             Dict: 统计信息
         """
         try:
-            # 获取价格数据
-            prices = pd.read_sql(
-                self.db.query(Price).statement,
-                self.db.bind
+            # 价格统计信息在数据库端一次聚合完成
+            price_query = self.db.query(
+                func.count(Price.id),
+                func.count(distinct(Price.item_id)),
+                func.min(Price.timestamp),
+                func.max(Price.timestamp),
+                func.avg(Price.price),
+                func.sum(Price.price * Price.price),
+                func.min(Price.price),
+                func.max(Price.price)
+            )
+            
+            # 汇率统计信息
+            rate_query = self.db.query(
+                func.count(ExchangeRate.id),
+                func.min(ExchangeRate.timestamp),
+                func.max(ExchangeRate.timestamp),
+                func.avg(ExchangeRate.rate),
+                func.sum(ExchangeRate.rate * ExchangeRate.rate),
+                func.min(ExchangeRate.rate),
+                func.max(ExchangeRate.rate)
             )
             
-            # 获取汇率数据
-            rates = pd.read_sql(
-                self.db.query(ExchangeRate).statement,
-                self.db.bind
+            # 不同汇率对的数量
+            pairs = self.db.query(ExchangeRate.source_item_id,
+                                  ExchangeRate.target_item_id).distinct().subquery()
+            pair_query = self.db.query(func.count()).select_from(pairs)
+            
+            # 三个聚合查询相互独立，并发执行
+            price_row, rate_row, pair_row = self._gather_in_threads(
+                self._fetch_row, price_query, rate_query, pair_query
             )
+            (price_records, unique_items, price_start, price_end,
+             price_mean, price_sq_sum, price_min, price_max) = price_row
+            (rate_records, rate_start, rate_end,
+             rate_mean, rate_sq_sum, rate_min, rate_max) = rate_row
+            unique_pairs = pair_row[0]
             
             # 计算价格统计信息
             price_stats = {
-                'total_records': len(prices),
-                'unique_items': len(prices['item_id'].unique()),
+                'total_records': price_records,
+                'unique_items': unique_items,
                 'date_range': {
-                    'start': prices['timestamp'].min(),
-                    'end': prices['timestamp'].max()
+                    'start': price_start,
+                    'end': price_end
                 },
                 'price_stats': {
-                    'mean': prices['price'].mean(),
-                    'std': prices['price'].std(),
-                    'min': prices['price'].min(),
-                    'max': prices['price'].max()
+                    'mean': price_mean,
+                    'std': _sample_std(price_records, price_mean, price_sq_sum),
+                    'min': price_min,
+                    'max': price_max
                 }
             }
             
             # 计算汇率统计信息
             rate_stats = {
-                'total_records': len(rates),
-                'unique_pairs': len(rates.groupby(['source_item_id', 'target_item_id'])),
+                'total_records': rate_records,
+                'unique_pairs': unique_pairs,
                 'date_range': {
-                    'start': rates['timestamp'].min(),
-                    'end': rates['timestamp'].max()
+                    'start': rate_start,
+                    'end': rate_end
                 },
                 'rate_stats': {
-                    'mean': rates['rate'].mean(),
-                    'std': rates['rate'].std(),
-                    'min': rates['rate'].min(),
-                    'max': rates['rate'].max()
+                    'mean': rate_mean,
+                    'std': _sample_std(rate_records, rate_mean, rate_sq_sum),
+                    'min': rate_min,
+                    'max': rate_max
                 }
             }
             
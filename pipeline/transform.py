@@ -3,13 +3,103 @@ import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta
 import logging
+import threading
+from dataclasses import dataclass
 from pathlib import Path
-import yaml
 from sqlalchemy.orm import Session
 from models.database import Item, Price, ExchangeRate
+from utils.config import load_config
+from pipeline._numba_kernels import (
+    group_offsets, fixed_window_starts, time_window_starts,
+    rolling_std_grouped, rolling_mean_grouped, rolling_corr_matrix
+)
 
 logger = logging.getLogger(__name__)
 
+@dataclass
+class SeriesResult:
+    """转换步骤之间传递的列式结果
+    
+    以NumPy数组分别保存时间戳、物品ID和各数值列，只在需要时才构造DataFrame。
+    """
+    
+    __slots__ = ('timestamp', 'item_id', 'values')
+    
+    timestamp: np.ndarray
+    item_id: Optional[np.ndarray]  # 按时间汇总的结果没有物品ID
+    values: Dict[str, np.ndarray]
+    
+    @classmethod
+    def empty(cls) -> 'SeriesResult':
+        """创建空结果
+        
+        Returns:
+            SeriesResult: 空结果
+        """
+        return cls(np.empty(0, dtype='datetime64[ns]'), None, {})
+        
+    def __len__(self) -> int:
+        return len(self.timestamp)
+        
+    def to_frame(self) -> pd.DataFrame:
+        """转换为DataFrame
+        
+        Returns:
+            pd.DataFrame: 包含timestamp、item_id和各数值列的数据
+        """
+        if not self.values:
+            return pd.DataFrame()
+            
+        columns = {'timestamp': self.timestamp}
+        if self.item_id is not None:
+            columns['item_id'] = self.item_id
+        columns.update(self.values)
+        return pd.DataFrame(columns, copy=False)
+
+def _window_to_bars(window: Union[str, int], freq: str) -> int:
+    """将时间窗口转换为指定频率下的条数
+    
+    Args:
+        window: 时间窗口（如'30D'）或条数
+        freq: 重采样频率
+        
+    Returns:
+        int: 窗口条数
+    """
+    if isinstance(window, int):
+        return max(window, 1)
+    return max(int(pd.Timedelta(window) / pd.Timedelta(freq)), 1)
+
+class ResampleCache:
+    """单次处理内共享的重采样结果
+    
+    由调用方为一次处理创建并传给各转换步骤，处理结束后随之释放，不在管道实例上长期持有数据。
+    键为(id(数据), 频率)，缓存项持有数据本身的引用，因此id在缓存存活期间不会被其他对象复用。
+    """
+    
+    def __init__(self):
+        self._entries: Dict[tuple, tuple] = {}
+        self._lock = threading.Lock()
+        
+    def get_or_compute(self, prices: pd.DataFrame, freq: str, compute) -> Dict[str, np.ndarray]:
+        """取出已缓存的结果，没有时计算并缓存
+        
+        Args:
+            prices: 价格数据
+            freq: 重采样频率
+            compute: 计算函数，参数为(prices, freq)
+            
+        Returns:
+            Dict[str, np.ndarray]: 重采样结果
+        """
+        key = (id(prices), freq)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] is not prices:
+                entry = (prices, compute(prices, freq))
+                self._entries[key] = entry
+        return entry[1]
+
 class DataTransformationPipeline:
     """数据转换管道类"""
     
@@ -35,16 +125,94 @@ class DataTransformationPipeline:
             dict: 配置信息
         """
         try:
-            with open(config_path, 'r', encoding='utf-8') as f:
-                return yaml.safe_load(f)
+            return load_config(config_path)
         except Exception as e:
             logger.error(f"加载配置文件失败: {str(e)}")
             return {}
             
+    def _prepare(self, prices: pd.DataFrame) -> pd.DataFrame:
+        """预处理价格数据，确保时间戳列是datetime类型，物品ID列是分类类型
+        
+        已经转换过时直接返回，同一份数据在多个转换步骤间只处理一次。
+        物品ID转为分类类型后，分组和比较都基于整数编码进行。
+        需要转换时在浅拷贝上替换列，不修改调用方的数据。
+        
+        Args:
+            prices: 价格数据
+            
+        Returns:
+            pd.DataFrame: 预处理后的价格数据
+        """
+        convert_timestamp = not pd.api.types.is_datetime64_any_dtype(prices['timestamp'])
+        convert_item_id = not isinstance(prices['item_id'].dtype, pd.CategoricalDtype)
+        if not (convert_timestamp or convert_item_id):
+            return prices
+            
+        prices = prices.copy(deep=False)
+        if convert_timestamp:
+            prices['timestamp'] = pd.to_datetime(prices['timestamp'])
+        if convert_item_id:
+            prices['item_id'] = prices['item_id'].astype('category')
+        return prices
+        
+    def _resample_by_item(self,
+                          prices: pd.DataFrame,
+                          freq: str,
+                          dtype: type = np.float64,
+                          cache: Optional[ResampleCache] = None) -> Dict[str, np.ndarray]:
+        """按物品将价格重采样到固定频率，并提取滚动内核所需的扁平数组
+        
+        每个时间段取最后一个价格，空缺时段沿用前值，使窗口可以按条数计算。
+        传入cache时，波动率和趋势指标对同一份数据只重采样一次。返回的数组不应被修改。
+        
+        Args:
+            prices: 价格数据
+            freq: 重采样频率
+            dtype: 价格数组的数值类型
+            cache: 本次处理共享的重采样结果，不传时直接计算
+            
+        Returns:
+            Dict[str, np.ndarray]: 按(item_id, timestamp)排序的时间戳、物品ID、价格和分组偏移
+        """
+        if cache is None:
+            arrays = self._resample_arrays(prices, freq)
+        else:
+            arrays = cache.get_or_compute(prices, freq, self._resample_arrays)
+            
+        if arrays['price'].dtype != dtype:
+            arrays = {**arrays, 'price': arrays['price'].astype(dtype)}
+        return arrays
+        
+    def _resample_arrays(self,
+                         prices: pd.DataFrame,
+                         freq: str) -> Dict[str, np.ndarray]:
+        """执行重采样并提取扁平数组
+        
+        Args:
+            prices: 价格数据
+            freq: 重采样频率
+            
+        Returns:
+            Dict[str, np.ndarray]: 时间戳、物品ID、价格和分组偏移
+        """
+        resampled = (prices.set_index('timestamp')
+                     .groupby('item_id', observed=True)['price']
+                     .resample(freq)
+                     .last()
+                     .groupby(level=0)
+                     .ffill())
+        item_ids = resampled.index.get_level_values(0).to_numpy()
+        return {
+            'timestamp': resampled.index.get_level_values(-1).to_numpy('datetime64[ns]'),
+            'item_id': item_ids,
+            'price': resampled.to_numpy(np.float64),
+            'offsets': group_offsets(item_ids)
+        }
+        
     def normalize_prices(self,
                         prices: pd.DataFrame,
                         base_item_id: int,
-                        window: str = '1D') -> pd.DataFrame:
+                        window: str = '1D') -> SeriesResult:
         """标准化价格数据
         
         Args:
@@ -53,78 +221,93 @@ class DataTransformationPipeline:
             window: 时间窗口
             
         Returns:
-            pd.DataFrame: 标准化后的价格数据
+            SeriesResult: 标准化后的价格数据
         """
         try:
+            # 空数据直接返回
+            if prices.empty:
+                return SeriesResult.empty()
+                
             # 确保时间戳列是datetime类型
-            prices['timestamp'] = pd.to_datetime(prices['timestamp'])
+            prices = self._prepare(prices)
             
-            # 获取基准物品的价格
-            base_prices = prices[prices['item_id'] == base_item_id].set_index('timestamp')
+            # 透视为宽表并按时间窗口重采样，所有物品一次完成；
+            # 价格转为float32计算，不修改调用方的数据
+            wide = (prices.assign(price=prices['price'].astype(np.float32))
+                    .pivot_table(index=pd.Grouper(key='timestamp', freq=window),
+                                 columns='item_id',
+                                 values='price',
+                                 aggfunc='mean',
+                                 observed=True))
             
-            # 按时间窗口重采样基准价格
-            base_prices = base_prices.resample(window).mean()
+            # 整个矩阵除以基准物品列，计算相对价格
+            normalized = wide.div(wide[base_item_id], axis=0).drop(columns=[base_item_id])
             
-            # 标准化其他物品的价格
-            normalized_prices = []
-            for item_id in prices['item_id'].unique():
-                if item_id == base_item_id:
-                    continue
-                    
-                item_prices = prices[prices['item_id'] == item_id].set_index('timestamp')
-                item_prices = item_prices.resample(window).mean()
-                
-                # 计算相对价格
-                relative_prices = item_prices['price'] / base_prices['price']
-                
-                normalized_prices.append(pd.DataFrame({
-                    'timestamp': relative_prices.index,
-                    'item_id': item_id,
-                    'normalized_price': relative_prices.values
-                }))
-                
-            return pd.concat(normalized_prices, ignore_index=True)
+            # 按物品展开为列式数组，顺序与逐列展开宽表一致
+            n_rows, n_items = normalized.shape
+            return SeriesResult(
+                timestamp=np.tile(normalized.index.to_numpy(), n_items),
+                item_id=np.repeat(np.asarray(normalized.columns), n_rows),
+                values={'normalized_price': normalized.to_numpy().ravel(order='F')}
+            )
             
         except Exception as e:
             logger.error(f"标准化价格失败: {str(e)}")
-            return pd.DataFrame()
+            return SeriesResult.empty()
             
     def calculate_volatility(self,
                            prices: pd.DataFrame,
-                           window: str = '30D') -> pd.DataFrame:
+                           window: Union[str, int] = '30D',
+                           freq: str = '1D',
+                           cache: Optional[ResampleCache] = None) -> SeriesResult:
         """计算价格波动率
         
         Args:
             prices: 价格数据
-            window: 时间窗口
+            window: 时间窗口或条数
+            freq: 重采样频率
+            cache: 本次处理共享的重采样结果
             
         Returns:
-            pd.DataFrame: 包含波动率的价格数据
+            SeriesResult: 包含波动率的价格数据
         """
         try:
+            # 空数据直接返回
+            if prices.empty:
+                return SeriesResult.empty()
+                
             # 确保时间戳列是datetime类型
-            prices['timestamp'] = pd.to_datetime(prices['timestamp'])
+            prices = self._prepare(prices)
             
-            # 按物品ID分组计算波动率
-            volatility_data = []
-            for item_id in prices['item_id'].unique():
-                item_prices = prices[prices['item_id'] == item_id].set_index('timestamp')
-                
-                # 计算滚动波动率
-                returns = item_prices['price'].pct_change()
-                volatility = returns.rolling(window=window).std() * np.sqrt(252)  # 年化波动率
-                
-                volatility_data.append(pd.DataFrame({
-                    'timestamp': volatility.index,
-                    'item_id': item_id,
-                    'volatility': volatility.values
-                }))
-                
-            return pd.concat(volatility_data, ignore_index=True)
+            # 收益率和滚动标准差使用float32，内核内部仍以双精度累加
+            arrays = self._resample_by_item(prices, freq, dtype=np.float32, cache=cache)
+            values = arrays['price']
+            offsets = arrays['offsets']
+            bars = _window_to_bars(window, freq)
+            
+            # 计算组内收益率，每组第一条记录没有前值
+            returns = np.empty_like(values)
+            returns[1:] = values[1:] / values[:-1] - 1.0
+            returns[offsets[:-1]] = np.nan
+            
+            # 计算滚动波动率
+            volatility = np.empty_like(values)
+            rolling_std_grouped(returns,
+                                fixed_window_starts(offsets, bars),
+                                offsets,
+                                bars,
+                                volatility)
+            volatility *= np.float32(np.sqrt(252))  # 年化波动率
+            
+            return SeriesResult(
+                timestamp=arrays['timestamp'],
+                item_id=arrays['item_id'],
+                values={'volatility': volatility}
+            )
             
         except Exception as e:
             logger.error(f"计算波动率失败: {str(e)}")
-            return pd.DataFrame()
+            return SeriesResult.empty()
             
     def calculate_correlation(self,
                             prices: pd.DataFrame,
@@ -139,18 +322,35 @@ class DataTransformationPipeline:
             pd.DataFrame: 相关性矩阵
         """
         try:
+            # 空数据直接返回
+            if prices.empty:
+                return pd.DataFrame()
+                
             # 确保时间戳列是datetime类型
-            prices['timestamp'] = pd.to_datetime(prices['timestamp'])
+            prices = self._prepare(prices)
+            
+            # 按时间和物品编码，直接填充时间×物品的稠密矩阵
+            ts_codes, timestamps = pd.factorize(prices['timestamp'], sort=True)
+            item_codes, item_ids = pd.factorize(np.asarray(prices['item_id']), sort=True)
+            item_ids = pd.Index(item_ids)
+            values = np.full((len(timestamps), len(item_ids)), np.nan)
+            values[ts_codes, item_codes] = prices['price'].to_numpy(np.float64)
             
-            # 将数据透视为宽格式
-            wide_prices = prices.pivot(index='timestamp',
-                                     columns='item_id',
-                                     values='price')
+            # 计算时间窗口(t - window, t]的起始行
+            starts = time_window_starts(timestamps.to_numpy('datetime64[ns]').view(np.int64),
+                                        np.array([0, len(timestamps)], dtype=np.int64),
+                                        pd.Timedelta(window).value)
             
             # 计算滚动相关性
-            correlation = wide_prices.rolling(window=window).corr()
+            correlation = np.empty((len(timestamps), len(item_ids), len(item_ids)), dtype=np.float32)
+            rolling_corr_matrix(values, starts, 1, correlation)
             
-            return correlation
+            index = pd.MultiIndex.from_product([timestamps.rename('timestamp'),
+                                                item_ids.rename('item_id')])
+            return pd.DataFrame(correlation.reshape(-1, len(item_ids)),
+                                index=index,
+                                columns=item_ids.rename('item_id'),
+                                copy=False)
             
         except Exception as e:
             logger.error(f"计算相关性失败: {str(e)}")
@@ -169,32 +369,32 @@ class DataTransformationPipeline:
             pd.DataFrame: 包含异常标记的数据
         """
         try:
+            # 空数据直接返回
+            if prices.empty:
+                return pd.DataFrame()
+                
             # 确保时间戳列是datetime类型
-            prices['timestamp'] = pd.to_datetime(prices['timestamp'])
+            prices = self._prepare(prices)
             
-            # 按物品ID分组检测异常
-            anomaly_data = []
-            for item_id in prices['item_id'].unique():
-                item_prices = prices[prices['item_id'] == item_id]
-                
-                # 计算价格变化
-                price_changes = item_prices['price'].pct_change()
-                
-                # 计算均值和标准差
-                mean_change = price_changes.mean()
-                std_change = price_changes.std()
-                
-                # 标记异常
-                anomalies = abs(price_changes - mean_change) > (threshold * std_change)
-                
-                anomaly_data.append(pd.DataFrame({
-                    'timestamp': item_prices['timestamp'],
-                    'item_id': item_id,
-                    'price': item_prices['price'],
-                    'is_anomaly': anomalies
-                }))
-                
-            return pd.concat(anomaly_data, ignore_index=True)
+            # 按物品ID分组计算价格变化
+            item_ids = prices['item_id']
+            price_changes = prices.groupby(item_ids, sort=False, observed=True)['price'].pct_change()
+            
+            # 计算组内均值和标准差
+            grouped_changes = price_changes.groupby(item_ids, sort=False, observed=True)
+            mean_change = grouped_changes.transform('mean').to_numpy()
+            std_change = grouped_changes.transform('std').to_numpy()
+            
+            # 标记异常
+            changes = price_changes.to_numpy()
+            anomalies = np.abs(changes - mean_change) > threshold * std_change
+            
+            return pd.DataFrame({
+                'timestamp': prices['timestamp'].to_numpy(),
+                'item_id': item_ids.to_numpy(),
+                'price': prices['price'].to_numpy(),
+                'is_anomaly': anomalies
+            }, copy=False)
             
         except Exception as e:
             logger.error(f"检测异常失败: {str(e)}")
@@ -202,7 +402,7 @@ class DataTransformationPipeline:
             
     def calculate_market_metrics(self,
                                prices: pd.DataFrame,
-                               window: str = '1D') -> pd.DataFrame:
+                               window: str = '1D') -> SeriesResult:
         """计算市场指标
         
         Args:
@@ -210,72 +410,101 @@ class DataTransformationPipeline:
             window: 时间窗口
             
         Returns:
-            pd.DataFrame: 市场指标数据
+            SeriesResult: 市场指标数据
         """
         try:
+            # 空数据直接返回
+            if prices.empty:
+                return SeriesResult.empty()
+                
             # 确保时间戳列是datetime类型
-            prices['timestamp'] = pd.to_datetime(prices['timestamp'])
+            prices = self._prepare(prices)
             
-            # 按时间窗口重采样
-            resampled = prices.set_index('timestamp').resample(window)
+            # 按时间窗口重采样，一次聚合计算所有统计量
+            metrics = prices['price'].astype(np.float32).set_axis(prices['timestamp']).resample(window).agg(
+                ['mean', 'std', 'min', 'max', 'median']
+            )
             
             # 计算市场指标
-            metrics = pd.DataFrame({
-                'timestamp': resampled['price'].mean().index,
-                'mean_price': resampled['price'].mean().values,
-                'price_std': resampled['price'].std().values,
-                'price_min': resampled['price'].min().values,
-                'price_max': resampled['price'].max().values,
-                'price_range': resampled['price'].max().values - resampled['price'].min().values,
-                'price_median': resampled['price'].median().values
+            metrics['range'] = metrics['max'] - metrics['min']
+            metrics = metrics.rename(columns={
+                'mean': 'mean_price',
+                'std': 'price_std',
+                'min': 'price_min',
+                'max': 'price_max',
+                'range': 'price_range',
+                'median': 'price_median'
             })
             
-            return metrics
+            return SeriesResult(
+                timestamp=metrics.index.to_numpy(),
+                item_id=None,
+                values={column: metrics[column].to_numpy()
+                        for column in ['mean_price', 'price_std', 'price_min', 'price_max',
+                                       'price_range', 'price_median']}
+            )
             
         except Exception as e:
             logger.error(f"计算市场指标失败: {str(e)}")
-            return pd.DataFrame()
+            return SeriesResult.empty()
             
     def calculate_trend_indicators(self,
                                  prices: pd.DataFrame,
-                                 short_window: str = '20D',
-                                 long_window: str = '50D') -> pd.DataFrame:
+                                 short_window: Union[str, int] = '20D',
+                                 long_window: Union[str, int] = '50D',
+                                 freq: str = '1D',
+                                 cache: Optional[ResampleCache] = None) -> SeriesResult:
         """计算趋势指标
         
         Args:
             prices: 价格数据
-            short_window: 短期窗口
-            long_window: 长期窗口
+            short_window: 短期窗口或条数
+            long_window: 长期窗口或条数
+            freq: 重采样频率
+            cache: 本次处理共享的重采样结果
             
         Returns:
-            pd.DataFrame: 趋势指标数据
+            SeriesResult: 趋势指标数据
         """
         try:
+            # 空数据直接返回
+            if prices.empty:
+                return SeriesResult.empty()
+                
             # 确保时间戳列是datetime类型
-            prices['timestamp'] = pd.to_datetime(prices['timestamp'])
+            prices = self._prepare(prices)
             
-            # 按物品ID分组计算趋势指标
-            trend_data = []
-            for item_id in prices['item_id'].unique():
-                item_prices = prices[prices['item_id'] == item_id].set_index('timestamp')
-                
-                # 计算移动平均
-                short_ma = item_prices['price'].rolling(window=short_window).mean()
-                long_ma = item_prices['price'].rolling(window=long_window).mean()
-                
-                # 计算趋势指标
-                trend = pd.DataFrame({
-                    'timestamp': item_prices.index,
-                    'item_id': item_id,
+            arrays = self._resample_by_item(prices, freq, cache=cache)
+            values = arrays['price']
+            offsets = arrays['offsets']
+            short_bars = _window_to_bars(short_window, freq)
+            long_bars = _window_to_bars(long_window, freq)
+            
+            # 计算移动平均
+            short_ma = np.empty_like(values)
+            rolling_mean_grouped(values,
+                                 fixed_window_starts(offsets, short_bars),
+                                 offsets,
+                                 short_bars,
+                                 short_ma)
+            long_ma = np.empty_like(values)
+            rolling_mean_grouped(values,
+                                 fixed_window_starts(offsets, long_bars),
+                                 offsets,
+                                 long_bars,
+                                 long_ma)
+            
+            # 计算趋势指标
+            return SeriesResult(
+                timestamp=arrays['timestamp'],
+                item_id=arrays['item_id'],
+                values={
                     'short_ma': short_ma,
                     'long_ma': long_ma,
-                    'trend': np.where(short_ma > long_ma, 1, -1)  # 1表示上升趋势，-1表示下降趋势
-                })
-                
-                trend_data.append(trend)
-                
-            return pd.concat(trend_data, ignore_index=True)
+                    'trend': (short_ma > long_ma).view(np.int8) * np.int8(2) - np.int8(1)  # 1表示上升趋势，-1表示下降趋势
+                }
+            )
             
         except Exception as e:
             logger.error(f"计算趋势指标失败: {str(e)}")
-            return pd.DataFrame() 
\ No newline at end of file
+            return SeriesResult.empty() 
\ No newline at end of file
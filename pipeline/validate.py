@@ -4,12 +4,110 @@ import numpy as np
 from datetime import datetime, timedelta
 import logging
 from pathlib import Path
-import yaml
+from dataclasses import dataclass
 from sqlalchemy.orm import Session
 from models.database import Item, Price, ExchangeRate
+from utils.config import load_config
+from utils.jit import njit, prange
 
 logger = logging.getLogger(__name__)
 
+@dataclass
+class RatesSoA:
+    """汇率数据的列式视图
+    
+    每个验证方法开始时从DataFrame中一次性取出各列的ndarray，后续检查直接读取连续的数组。
+    """
+    
+    __slots__ = ('source', 'target', 'rate', 'timestamp')
+    
+    source: np.ndarray
+    target: np.ndarray
+    rate: np.ndarray
+    timestamp: np.ndarray
+    
+    @classmethod
+    def from_frame(cls, rates: pd.DataFrame) -> 'RatesSoA':
+        """从汇率DataFrame构建列式视图
+        
+        Args:
+            rates: 汇率数据，timestamp列须已是datetime类型
+            
+        Returns:
+            RatesSoA: 列式视图
+        """
+        return cls(rates['source_item_id'].to_numpy(),
+                   rates['target_item_id'].to_numpy(),
+                   rates['rate'].to_numpy(np.float64),
+                   rates['timestamp'].to_numpy('datetime64[ns]'))
+        
+    def count_large_gaps(self, max_gap: str) -> int:
+        """统计各汇率对内相邻记录时间间隔超过max_gap的次数
+        
+        Args:
+            max_gap: 最大时间间隔
+            
+        Returns:
+            int: 超过最大间隔的次数
+        """
+        order = np.lexsort((self.timestamp, self.target, self.source))
+        source = self.source[order]
+        target = self.target[order]
+        timestamp = self.timestamp[order]
+        
+        # 只比较属于同一汇率对的相邻记录
+        same_pair = (source[1:] == source[:-1]) & (target[1:] == target[:-1])
+        gaps = timestamp[1:] - timestamp[:-1]
+        return int((same_pair & (gaps > pd.Timedelta(max_gap).to_timedelta64())).sum())
+
+@njit(parallel=True, cache=True)
+def _count_inconsistent(rates: np.ndarray, reverse_rates: np.ndarray, tol: float) -> int:
+    """统计直接汇率与反向汇率乘积偏离1超过容差的数量
+    
+    乘、减、取绝对值、比较和计数在一次循环中完成，不分配中间数组。
+    不开启fastmath，以保证NaN比较结果为False。
+    
+    Args:
+        rates: 直接汇率
+        reverse_rates: 对应的反向汇率
+        tol: 容差
+        
+    Returns:
+        int: 不一致的数量
+    """
+    count = 0
+    for i in prange(rates.shape[0]):
+        if abs(rates[i] * reverse_rates[i] - 1.0) > tol:
+            count += 1
+    return count
+
+def _ensure_datetime(df: pd.DataFrame) -> None:
+    """确保时间戳列是datetime类型，已经是datetime类型时不做任何处理
+    
+    Args:
+        df: 包含timestamp列的数据，原地转换
+    """
+    if not pd.api.types.is_datetime64_any_dtype(df['timestamp']):
+        df['timestamp'] = pd.to_datetime(df['timestamp'], cache=True)
+        
+def _count_missing(df: pd.DataFrame) -> int:
+    """统计DataFrame中的缺失值数量
+    
+    数值列直接在ndarray上用np.isnan统计，其余列再用isna统计。
+    
+    Args:
+        df: 待检查的数据
+        
+    Returns:
+        int: 缺失值数量
+    """
+    numeric = df.select_dtypes('number')
+    others = df.select_dtypes(exclude='number')
+    missing = int(np.isnan(numeric.to_numpy(dtype=np.float64, na_value=np.nan)).sum())
+    if not others.empty:
+        missing += int(others.isna().values.sum())
+    return missing
+
 class DataValidationPipeline:
     """数据验证管道类"""
     
@@ -35,8 +133,7 @@ class DataValidationPipeline:
             dict: 配置信息
         """
         try:
-            with open(config_path, 'r', encoding='utf-8') as f:
-                return yaml.safe_load(f)
+            return load_config(config_path)
         except Exception as e:
             logger.error(f"加载配置文件失败: {str(e)}")
             return {}
@@ -58,9 +155,6 @@ class DataValidationPipeline:
             Dict: 验证结果
         """
         try:
-            # 确保时间戳列是datetime类型
-            prices['timestamp'] = pd.to_datetime(prices['timestamp'])
-            
             # 初始化验证结果
             validation_results = {
                 'total_records': len(prices),
@@ -73,26 +167,30 @@ class DataValidationPipeline:
                 'validation_passed': False
             }
             
+            # 空数据无需检查，直接判定不通过
+            if prices.empty:
+                return validation_results
+                
+            # 确保时间戳列是datetime类型，已经是时跳过转换
+            _ensure_datetime(prices)
+            
             # 检查缺失值
-            missing_values = prices.isnull().sum().sum()
+            missing_values = _count_missing(prices)
             validation_results['missing_values'] = missing_values
             
             # 检查价格范围
-            out_of_range = ((prices['price'] < min_price) | 
-                          (prices['price'] > max_price)).sum()
+            values = prices['price'].values
+            out_of_range = int(((values < min_price) | (values > max_price)).sum())
             validation_results['out_of_range'] = out_of_range
             
-            # 检查重复记录
-            duplicates = prices.duplicated().sum()
+            # 检查重复记录，同一物品同一时间戳的多条记录视为重复
+            duplicates = int(prices.duplicated(subset=['item_id', 'timestamp']).values.sum())
             validation_results['duplicates'] = duplicates
             
-            # 检查时间间隔
-            large_gaps = 0
-            for item_id in prices['item_id'].unique():
-                item_prices = prices[prices['item_id'] == item_id].sort_values('timestamp')
-                gaps = item_prices['timestamp'].diff() > pd.Timedelta(max_gap)
-                large_gaps += gaps.sum()
-            validation_results['large_gaps'] = large_gaps
+            # 检查时间间隔，排序后一次计算所有物品的组内间隔
+            sorted_prices = prices.sort_values(['item_id', 'timestamp'], kind='mergesort')
+            gaps = sorted_prices.groupby('item_id', sort=False, observed=True)['timestamp'].diff()
+            validation_results['large_gaps'] = int((gaps > pd.Timedelta(max_gap)).sum())
             
             # 计算有效记录数
             validation_results['valid_records'] = (
@@ -136,9 +234,6 @@ class DataValidationPipeline:
             Dict: 验证结果
         """
         try:
-            # 确保时间戳列是datetime类型
-            rates['timestamp'] = pd.to_datetime(rates['timestamp'])
-            
             # 初始化验证结果
             validation_results = {
                 'total_records': len(rates),
@@ -151,33 +246,28 @@ class DataValidationPipeline:
                 'validation_passed': False
             }
             
+            # 空数据无需检查，直接判定不通过
+            if rates.empty:
+                return validation_results
+                
+            # 确保时间戳列是datetime类型，已经是时跳过转换
+            _ensure_datetime(rates)
+            soa = RatesSoA.from_frame(rates)
+            
             # 检查缺失值
-            missing_values = rates.isnull().sum().sum()
+            missing_values = _count_missing(rates)
             validation_results['missing_values'] = missing_values
             
             # 检查汇率范围
-            out_of_range = ((rates['rate'] < min_rate) | 
-                          (rates['rate'] > max_rate)).sum()
+            out_of_range = int(((soa.rate < min_rate) | (soa.rate > max_rate)).sum())
             validation_results['out_of_range'] = out_of_range
             
-            # 检查重复记录
-            duplicates = rates.duplicated().sum()
+            # 检查重复记录，同一汇率对同一时间戳的多条记录视为重复
+            duplicates = int(rates.duplicated(subset=['source_item_id', 'target_item_id', 'timestamp']).values.sum())
             validation_results['duplicates'] = duplicates
             
-            # 检查时间间隔
-            large_gaps = 0
-            for source_id in rates['source_item_id'].unique():
-                for target_id in rates['target_item_id'].unique():
-                    pair_rates = rates[
-                        (rates['source_item_id'] == source_id) &
-                        (rates['target_item_id'] == target_id)
-                    ].sort_values('timestamp')
-                    
-                    if not pair_rates.empty:
-                        gaps = pair_rates['timestamp'].diff() > pd.Timedelta(max_gap)
-                        large_gaps += gaps.sum()
-                        
-            validation_results['large_gaps'] = large_gaps
+            # 检查时间间隔，排序后一次计算所有汇率对的组内间隔
+            validation_results['large_gaps'] = soa.count_large_gaps(max_gap)
             
             # 计算有效记录数
             validation_results['valid_records'] = (
@@ -217,47 +307,49 @@ class DataValidationPipeline:
             Dict: 验证结果
         """
         try:
+            # 没有任何数据时不存在缺失物品和不一致汇率
+            if prices.empty and rates.empty:
+                return {
+                    'total_items': 0,
+                    'total_rate_pairs': 0,
+                    'missing_items': 0,
+                    'inconsistent_rates': 0,
+                    'validation_passed': True
+                }
+                
+            # 各ID列的唯一值只计算一次
+            pair_columns = ['source_item_id', 'target_item_id']
+            price_items = set(prices['item_id'].unique())
+            rate_source_items = set(rates['source_item_id'].unique())
+            rate_target_items = set(rates['target_item_id'].unique())
+            
             # 初始化验证结果
             validation_results = {
-                'total_items': len(prices['item_id'].unique()),
-                'total_rate_pairs': len(rates.groupby(['source_item_id', 'target_item_id'])),
+                'total_items': len(price_items),
+                'total_rate_pairs': rates[pair_columns].dropna().drop_duplicates().shape[0],
                 'missing_items': 0,
                 'inconsistent_rates': 0,
                 'validation_passed': False
             }
             
             # 检查缺失物品
-            price_items = set(prices['item_id'].unique())
-            rate_source_items = set(rates['source_item_id'].unique())
-            rate_target_items = set(rates['target_item_id'].unique())
-            
             all_items = price_items.union(rate_source_items).union(rate_target_items)
             validation_results['missing_items'] = len(all_items) - len(price_items)
             
-            # 检查汇率一致性
-            inconsistent_rates = 0
-            for source_id in rates['source_item_id'].unique():
-                for target_id in rates['target_item_id'].unique():
-                    # 获取直接汇率
-                    direct_rates = rates[
-                        (rates['source_item_id'] == source_id) &
-                        (rates['target_item_id'] == target_id)
-                    ]
-                    
-                    if not direct_rates.empty:
-                        # 获取反向汇率
-                        reverse_rates = rates[
-                            (rates['source_item_id'] == target_id) &
-                            (rates['target_item_id'] == source_id)
-                        ]
-                        
-                        if not reverse_rates.empty:
-                            # 检查汇率乘积是否接近1
-                            for _, direct in direct_rates.iterrows():
-                                for _, reverse in reverse_rates.iterrows():
-                                    if abs(direct['rate'] * reverse['rate'] - 1.0) > 0.01:
-                                        inconsistent_rates += 1
-                                        
+            # 检查汇率一致性：将每条汇率与所有反向汇率配对，检查乘积是否接近1
+            direct = rates[pair_columns + ['rate']].dropna(subset=pair_columns)
+            reverse = direct.rename(columns={
+                'source_item_id': 'target_item_id',
+                'target_item_id': 'source_item_id',
+                'rate': 'reverse_rate'
+            })
+            merged = direct.merge(reverse, on=pair_columns)
+            inconsistent_rates = int(_count_inconsistent(
+                merged['rate'].to_numpy(np.float64),
+                merged['reverse_rate'].to_numpy(np.float64),
+                0.01
+            ))
+            
             validation_results['inconsistent_rates'] = inconsistent_rates
             
             # 判断验证是否通过
@@ -291,10 +383,6 @@ class DataValidationPipeline:
             Dict: 验证结果
         """
         try:
-            # 确保时间戳列是datetime类型
-            prices['timestamp'] = pd.to_datetime(prices['timestamp'])
-            rates['timestamp'] = pd.to_datetime(rates['timestamp'])
-            
             # 生成完整的时间序列
             date_range = pd.date_range(start=start_date,
                                      end=end_date,
@@ -308,24 +396,40 @@ class DataValidationPipeline:
                 'validation_passed': False
             }
             
-            # 检查价格数据完整性
-            for item_id in prices['item_id'].unique():
-                item_prices = prices[prices['item_id'] == item_id]
-                item_dates = set(item_prices['timestamp'])
-                missing_dates = set(date_range) - item_dates
-                validation_results['missing_price_periods'] += len(missing_dates)
+            # 没有任何物品或汇率对时不存在缺失的时间点
+            if prices.empty and rates.empty:
+                validation_results['validation_passed'] = True
+                return validation_results
                 
-            # 检查汇率数据完整性
-            for source_id in rates['source_item_id'].unique():
-                for target_id in rates['target_item_id'].unique():
-                    pair_rates = rates[
-                        (rates['source_item_id'] == source_id) &
-                        (rates['target_item_id'] == target_id)
-                    ]
-                    pair_dates = set(pair_rates['timestamp'])
-                    missing_dates = set(date_range) - pair_dates
-                    validation_results['missing_rate_periods'] += len(missing_dates)
-                    
+            # 确保时间戳列是datetime类型，已经是时跳过转换
+            _ensure_datetime(prices)
+            _ensure_datetime(rates)
+            soa = RatesSoA.from_frame(rates)
+            
+            # 检查价格数据完整性：每个物品缺失的时间点数为总时间点数减去
+            # 该物品在时间序列内出现的不同时间点数
+            # 时间序列转为datetime64[ns]数组，成员检查在NumPy中以int64比较完成
+            periods = date_range.values.astype('datetime64[ns]')
+            n_periods = periods.size
+            price_in_range = np.isin(prices['timestamp'].values.astype('datetime64[ns]'), periods)
+            price_covered = (prices.loc[price_in_range]
+                             .groupby('item_id', sort=False, observed=True)['timestamp']
+                             .nunique())
+            validation_results['missing_price_periods'] = int(
+                prices['item_id'].nunique() * n_periods - price_covered.sum()
+            )
+            
+            # 检查汇率数据完整性，源物品×目标物品中没有数据的汇率对整段缺失
+            rate_in_range = np.isin(soa.timestamp, periods)
+            rate_covered = (pd.Series(soa.timestamp[rate_in_range])
+                            .groupby([soa.source[rate_in_range], soa.target[rate_in_range]],
+                                     sort=False)
+                            .nunique())
+            n_pairs = rates['source_item_id'].nunique() * rates['target_item_id'].nunique()
+            validation_results['missing_rate_periods'] = int(
+                n_pairs * n_periods - rate_covered.sum()
+            )
+            
             # 判断验证是否通过
             validation_results['validation_passed'] = (
                 validation_results['missing_price_periods'] == 0 and
@@ -2,14 +2,19 @@ import os
 import sys
 import logging
 import shutil
+import heapq
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from pathlib import Path
-import yaml
 import sqlite3
 import pandas as pd
-from sqlalchemy import create_engine
+import pyarrow as pa
+import pyarrow.parquet as pq
+from sqlalchemy import create_engine, Boolean, DateTime, Float, Integer
 from sqlalchemy.orm import sessionmaker
 from models.database import Base, Item, Price, ExchangeRate
+from utils.config import load_config as load_cached_config
+from utils.backup_index import INDEX_FILENAME, append_backup_record, compact_backup_index
 
 # 设置日志
 logging.basicConfig(
@@ -27,8 +32,7 @@ def load_config():
     """加载配置文件"""
     try:
         config_path = 'config/api_config.yaml'
-        with open(config_path, 'r', encoding='utf-8') as f:
-            config = yaml.safe_load(f)
+        config = load_cached_config(config_path)
             
         logger.info("成功加载配置文件")
         
@@ -49,8 +53,17 @@ def backup_database():
         timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
         backup_file = backup_dir / f'svu_data_{timestamp}.db'
         
-        # 复制数据库文件
-        shutil.copy2('data/database/svu_data.db', backup_file)
+        # 使用SQLite在线备份API按页复制，备份期间有写入也能得到一致的快照
+        # 以只读方式打开源数据库，文件不存在时报错，而不是新建一个空数据库再备份
+        source = sqlite3.connect('file:data/database/svu_data.db?mode=ro', uri=True)
+        target = sqlite3.connect(str(backup_file))
+        try:
+            source.backup(target, pages=1024)
+        finally:
+            target.close()
+            source.close()
+            
+        append_backup_record(backup_dir, 'database', backup_file)
         
         logger.info(f"成功备份数据库到: {backup_file}")
         
@@ -73,6 +86,7 @@ def backup_config():
         
         # 复制配置文件
         shutil.copy2('config/api_config.yaml', backup_file)
+        append_backup_record(backup_dir, 'config', backup_file)
         
         logger.info(f"成功备份配置文件到: {backup_file}")
         
@@ -82,6 +96,32 @@ def backup_config():
         logger.error(f"备份配置文件失败: {str(e)}")
         raise
 
+def parallel_copytree(src, dst, workers=8):
+    """并发复制目录树
+    
+    先用os.scandir遍历并创建所有目录，再把每个文件的复制提交到线程池，
+    shutil.copyfile在Linux上使用sendfile零拷贝。
+    """
+    src, dst = Path(src), Path(dst)
+    files = []
+    pending = [(src, dst)]
+    while pending:
+        src_dir, dst_dir = pending.pop()
+        dst_dir.mkdir(parents=True, exist_ok=True)
+        with os.scandir(src_dir) as it:
+            for entry in it:
+                if entry.is_dir():
+                    pending.append((Path(entry.path), dst_dir / entry.name))
+                elif entry.is_file():
+                    files.append((entry.path, dst_dir / entry.name))
+                    
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(shutil.copyfile, file, target) for file, target in files]
+        for future in futures:
+            future.result()
+            
+    return dst
+
 def backup_data_files():
     """备份数据文件"""
     try:
@@ -91,22 +131,24 @@ def backup_data_files():
         
         # 生成备份文件名
         timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-        backup_dir = backup_dir / f'data_files_{timestamp}'
-        backup_dir.mkdir(parents=True, exist_ok=True)
+        data_backup_dir = backup_dir / f'data_files_{timestamp}'
+        data_backup_dir.mkdir(parents=True, exist_ok=True)
         
         # 备份原始数据
         raw_dir = Path('data/raw')
         if raw_dir.exists():
-            shutil.copytree(raw_dir, backup_dir / 'raw')
+            parallel_copytree(raw_dir, data_backup_dir / 'raw')
             
         # 备份处理后的数据
         processed_dir = Path('data/processed')
         if processed_dir.exists():
-            shutil.copytree(processed_dir, backup_dir / 'processed')
+            parallel_copytree(processed_dir, data_backup_dir / 'processed')
+            
+        append_backup_record(backup_dir, 'data', data_backup_dir)
             
-        logger.info(f"成功备份数据文件到: {backup_dir}")
+        logger.info(f"成功备份数据文件到: {data_backup_dir}")
         
-        return backup_dir
+        return data_backup_dir
         
     except Exception as e:
         logger.error(f"备份数据文件失败: {str(e)}")
@@ -121,19 +163,22 @@ def cleanup_old_backups(config):
         # 获取备份目录
         backup_dir = Path('data/backup')
         
-        # 获取所有备份文件
-        backup_files = []
-        for file in backup_dir.glob('*'):
-            if file.is_file():
-                backup_files.append((file, file.stat().st_mtime))
-                
-        # 按修改时间排序
-        backup_files.sort(key=lambda x: x[1], reverse=True)
+        # 获取所有备份文件，DirEntry缓存了stat信息，备份索引本身不参与清理
+        with os.scandir(backup_dir) as it:
+            backup_files = [(entry.stat().st_mtime, entry.path) for entry in it
+                            if entry.is_file() and entry.name != INDEX_FILENAME]
+            
+        # 只保留最新的若干个文件，无需对全部文件排序
+        keep = {path for _, path in heapq.nlargest(max_backup_files, backup_files)}
         
         # 删除多余的备份文件
-        for file, _ in backup_files[max_backup_files:]:
-            file.unlink()
-            logger.info(f"删除旧备份文件: {file}")
+        for _, path in backup_files:
+            if path not in keep:
+                os.unlink(path)
+                logger.info(f"删除旧备份文件: {path}")
+                
+        # 去掉索引中已删除备份的记录
+        compact_backup_index(backup_dir)
             
         logger.info("成功清理旧备份")
         
@@ -141,11 +186,59 @@ def cleanup_old_backups(config):
         logger.error(f"清理旧备份失败: {str(e)}")
         raise
 
-def export_data_to_csv():
-    """导出数据到CSV文件"""
+def read_table(engine, model, chunksize=None):
+    """按模型定义的列和类型读取整张表
+    
+    显式列出字段，并根据字段类型指定parse_dates和dtype，避免pandas逐列推断类型。
+    指定chunksize时返回按块读取的迭代器。
+    """
+    table = model.__table__
+    parse_dates = []
+    dtype = {}
+    for column in table.columns:
+        if isinstance(column.type, DateTime):
+            parse_dates.append(column.name)
+        elif isinstance(column.type, Float):
+            dtype[column.name] = 'float64'
+        elif isinstance(column.type, Integer):
+            dtype[column.name] = 'Int64' if column.nullable else 'int64'
+            
+    query = f"SELECT {', '.join(column.name for column in table.columns)} FROM {table.name}"
+    return pd.read_sql(query, engine, parse_dates=parse_dates, dtype=dtype, chunksize=chunksize)
+
+def parquet_schema(model):
+    """根据模型字段类型生成Parquet的schema
+    
+    按块读取时各块的类型由数据推断，全为空值的列或不同精度的时间列会导致块之间类型不一致，
+    因此统一使用由模型确定的schema写入。
+    """
+    fields = []
+    for column in model.__table__.columns:
+        if isinstance(column.type, DateTime):
+            arrow_type = pa.timestamp('us')
+        elif isinstance(column.type, Float):
+            arrow_type = pa.float64()
+        elif isinstance(column.type, Integer):
+            arrow_type = pa.int64()
+        elif isinstance(column.type, Boolean):
+            arrow_type = pa.bool_()
+        else:
+            arrow_type = pa.large_string()
+        fields.append(pa.field(column.name, arrow_type, nullable=column.nullable))
+    return pa.schema(fields)
+
+def write_table_to_parquet(engine, model, path, chunksize=200_000):
+    """按块读取整张表并逐块写入Parquet文件，内存占用只与chunksize有关"""
+    schema = parquet_schema(model)
+    with pq.ParquetWriter(path, schema, compression='zstd') as writer:
+        for chunk in read_table(engine, model, chunksize=chunksize):
+            writer.write_table(pa.Table.from_pandas(chunk, schema=schema, preserve_index=False))
+
+def export_data_to_parquet():
+    """导出数据到Parquet文件(zstd压缩)"""
     try:
         # 创建导出目录
-        export_dir = Path('data/backup/csv')
+        export_dir = Path('data/backup/parquet')
         export_dir.mkdir(parents=True, exist_ok=True)
         
         # 生成导出文件名
@@ -157,23 +250,22 @@ def export_data_to_csv():
         engine = create_engine('sqlite:///data/database/svu_data.db')
         
         # 导出价格数据
-        prices = pd.read_sql('SELECT * FROM prices', engine)
-        prices.to_csv(export_dir / 'prices.csv', index=False)
+        write_table_to_parquet(engine, Price, export_dir / 'prices.parquet')
         
         # 导出汇率数据
-        rates = pd.read_sql('SELECT * FROM exchange_rates', engine)
-        rates.to_csv(export_dir / 'exchange_rates.csv', index=False)
+        write_table_to_parquet(engine, ExchangeRate, export_dir / 'exchange_rates.parquet')
         
         # 导出物品数据
-        items = pd.read_sql('SELECT * FROM items', engine)
-        items.to_csv(export_dir / 'items.csv', index=False)
+        write_table_to_parquet(engine, Item, export_dir / 'items.parquet')
+        
+        append_backup_record(Path('data/backup'), 'parquet', export_dir)
         
-        logger.info(f"成功导出数据到CSV文件: {export_dir}")
+        logger.info(f"成功导出数据到Parquet文件: {export_dir}")
         
         return export_dir
         
     except Exception as e:
-        logger.error(f"导出数据到CSV文件失败: {str(e)}")
+        logger.error(f"导出数据到Parquet文件失败: {str(e)}")
         raise
 
 def main():
@@ -182,17 +274,17 @@ def main():
         # 加载配置
         config = load_config()
         
-        # 备份数据库
-        db_backup = backup_database()
-        
-        # 备份配置文件
-        config_backup = backup_config()
-        
-        # 备份数据文件
-        data_backup = backup_data_files()
-        
-        # 导出数据到CSV
-        csv_export = export_data_to_csv()
+        # 备份数据库、配置文件、数据文件并导出Parquet，各步骤相互独立且以I/O为主，并发执行
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            db_future = executor.submit(backup_database)
+            config_future = executor.submit(backup_config)
+            data_future = executor.submit(backup_data_files)
+            parquet_future = executor.submit(export_data_to_parquet)
+            
+            db_backup = db_future.result()
+            config_backup = config_future.result()
+            data_backup = data_future.result()
+            parquet_export = parquet_future.result()
         
         # 清理旧备份
         cleanup_old_backups(config)
@@ -201,7 +293,7 @@ def main():
         logger.info(f"数据库备份: {db_backup}")
         logger.info(f"配置文件备份: {config_backup}")
         logger.info(f"数据文件备份: {data_backup}")
-        logger.info(f"CSV导出: {csv_export}")
+        logger.info(f"Parquet导出: {parquet_export}")
         
     except Exception as e:
         logger.error(f"运行备份脚本失败: {str(e)}")
@@ -4,8 +4,15 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from utils.data_collector import DataCollector
 from datetime import datetime, timedelta
+import numpy as np
 import pandas as pd
 
+def dict_to_frame(data, key_name, value_name):
+    """将{键: 值}字典转换为带采集时间的DataFrame"""
+    frame = pd.Series(data, name=value_name).rename_axis(key_name).reset_index()
+    frame['date'] = np.datetime64(datetime.now(), 'ns')
+    return frame
+
 def main():
     # 初始化数据采集器
     collector = DataCollector()
@@ -25,21 +32,13 @@ def main():
     # 获取货币汇率数据
     print("\n正在获取货币汇率数据...")
     currency_rates = collector.get_currency_rates()
-    currency_data = pd.DataFrame({
-        'currency': list(currency_rates.keys()),
-        'rate': list(currency_rates.values()),
-        'date': datetime.now()
-    })
+    currency_data = dict_to_frame(currency_rates, 'currency', 'rate')
     collector.save_data(currency_data, 'currency_rates.csv')
     
     # 获取加密货币价格
     print("\n正在获取加密货币价格...")
     crypto_prices = collector.get_crypto_prices()
-    crypto_data = pd.DataFrame({
-        'symbol': list(crypto_prices.keys()),
-        'price': list(crypto_prices.values()),
-        'date': datetime.now()
-    })
+    crypto_data = dict_to_frame(crypto_prices, 'symbol', 'price')
     collector.save_data(crypto_data, 'crypto_prices.csv')
     
     print("\n数据采集完成！")
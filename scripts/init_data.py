@@ -2,28 +2,94 @@ import sys
 import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
+from sqlalchemy import and_, func, insert, literal_column, select, text
+from sqlalchemy.schema import CreateIndex, DropIndex
 from sqlalchemy.orm import Session
 from models.database import (
     Item, Price, ExchangeRate, DataUpdateLog, SVUValue, MarketData,
-    ItemType, DataSource, MarketType, init_db
+    ItemType, DataSource, MarketType, init_db, use_explicit_begin
 )
 from datetime import datetime, timedelta
 import json
 import logging
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Iterator, Optional
+from contextlib import contextmanager
+import numpy as np
 import pandas as pd
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# 所有模拟价格数据的元数据都相同，作为SQL常量写入插入语句，不必逐行序列化和传输
+SIMULATED_PRICE_METADATA = literal_column(f"'{json.dumps({'is_simulated': True, 'volatility': 0.02})}'")
+
+# 各物品类型的模拟基础价格，未列出的类型使用100
+BASE_PRICE = {
+    ItemType.CURRENCY.value: 100,
+    ItemType.CRYPTO.value: 1000,
+    ItemType.PRECIOUS_METAL.value: 2000,
+    ItemType.COMMODITY.value: 50,
+    ItemType.STOCK.value: 150,
+    ItemType.INDEX.value: 3000
+}
+
 class DataInitializer:
     """数据初始化类"""
     
     def __init__(self, db_url: str = 'sqlite:///svu_data.db'):
-        self.engine = init_db(db_url)
+        # 一次性初始化脚本，关闭fsync以加快批量写入
+        self.engine = use_explicit_begin(init_db(db_url, bulk_load=True))
+        
+    @contextmanager
+    def _session_scope(self, session: Optional[Session] = None) -> Iterator[Session]:
+        """提供会话，传入外部会话时由调用方负责提交
+        
+        Args:
+            session: 外部会话
+            
+        Returns:
+            Iterator[Session]: 数据库会话
+        """
+        if session is not None:
+            yield session
+            return
+            
+        with Session(self.engine) as new_session:
+            yield new_session
+            new_session.commit()
+            
+    @contextmanager
+    def _indexes_deferred(self, session: Session, *models) -> Iterator[None]:
+        """批量插入期间删除表上的索引，插入完成后一次性重建并更新统计信息
         
-    def initialize_base_items(self):
-        """初始化基础物品数据"""
+        插入出错时同样重建索引；删除索引与插入在同一事务中，回滚后索引也随之恢复。
+        
+        Args:
+            session: 数据库会话
+            models: 需要批量插入的模型
+        """
+        conn = session.connection()
+        indexes = [index for model in models for index in model.__table__.indexes]
+        for index in indexes:
+            conn.execute(DropIndex(index, if_exists=True))
+            
+        try:
+            yield
+        finally:
+            for index in indexes:
+                conn.execute(CreateIndex(index, if_not_exists=True))
+        for model in models:
+            conn.execute(text(f"ANALYZE {model.__tablename__}"))
+            
+    def initialize_base_items(self, session: Optional[Session] = None) -> Dict[str, int]:
+        """初始化基础物品数据
+        
+        Args:
+            session: 外部会话
+            
+        Returns:
+            Dict[str, int]: 物品代码到物品ID的映射
+        """
         logger.info("开始初始化基础物品数据...")
         
         base_items = [
@@ -34,7 +100,7 @@ class DataInitializer:
                 'type': ItemType.CURRENCY.value,
                 'market_type': MarketType.FOREX.value,
                 'description': '美元',
-                'metadata': {
+                'item_metadata': {
                     'country': 'USA',
                     'is_major': True,
                     'currency_code': 'USD',
@@ -47,7 +113,7 @@ class DataInitializer:
                 'type': ItemType.CURRENCY.value,
                 'market_type': MarketType.FOREX.value,
                 'description': '欧元',
-                'metadata': {
+                'item_metadata': {
                     'country': 'EU',
                     'is_major': True,
                     'currency_code': 'EUR',
@@ -60,7 +126,7 @@ class DataInitializer:
                 'type': ItemType.CURRENCY.value,
                 'market_type': MarketType.FOREX.value,
                 'description': '英镑',
-                'metadata': {
+                'item_metadata': {
                     'country': 'UK',
                     'is_major': True,
                     'currency_code': 'GBP',
@@ -73,7 +139,7 @@ class DataInitializer:
                 'type': ItemType.CURRENCY.value,
                 'market_type': MarketType.FOREX.value,
                 'description': '日元',
-                'metadata': {
+                'item_metadata': {
                     'country': 'Japan',
                     'is_major': True,
                     'currency_code': 'JPY',
@@ -86,7 +152,7 @@ class DataInitializer:
                 'type': ItemType.CURRENCY.value,
                 'market_type': MarketType.FOREX.value,
                 'description': '人民币',
-                'metadata': {
+                'item_metadata': {
                     'country': 'China',
                     'is_major': True,
                     'currency_code': 'CNY',
@@ -101,7 +167,7 @@ class DataInitializer:
                 'type': ItemType.CRYPTO.value,
                 'market_type': MarketType.CRYPTO.value,
                 'description': '比特币',
-                'metadata': {
+                'item_metadata': {
                     'market_cap_rank': 1,
                     'max_supply': 21000000,
                     'algorithm': 'SHA-256',
@@ -114,7 +180,7 @@ class DataInitializer:
                 'type': ItemType.CRYPTO.value,
                 'market_type': MarketType.CRYPTO.value,
                 'description': '以太坊',
-                'metadata': {
+                'item_metadata': {
                     'market_cap_rank': 2,
                     'max_supply': None,
                     'algorithm': 'Ethash',
@@ -129,7 +195,7 @@ class DataInitializer:
                 'type': ItemType.PRECIOUS_METAL.value,
                 'market_type': MarketType.COMMODITY.value,
                 'description': '黄金',
-                'metadata': {
+                'item_metadata': {
                     'unit': 'troy ounce',
                     'purity': '99.99%',
                     'delivery_form': 'bullion'
@@ -141,7 +207,7 @@ class DataInitializer:
                 'type': ItemType.PRECIOUS_METAL.value,
                 'market_type': MarketType.COMMODITY.value,
                 'description': '白银',
-                'metadata': {
+                'item_metadata': {
                     'unit': 'troy ounce',
                     'purity': '99.99%',
                     'delivery_form': 'bullion'
@@ -155,7 +221,7 @@ class DataInitializer:
                 'type': ItemType.COMMODITY.value,
                 'market_type': MarketType.COMMODITY.value,
                 'description': '原油',
-                'metadata': {
+                'item_metadata': {
                     'unit': 'barrel',
                     'grade': 'WTI',
                     'delivery_location': 'Cushing, Oklahoma'
@@ -167,7 +233,7 @@ class DataInitializer:
                 'type': ItemType.COMMODITY.value,
                 'market_type': MarketType.COMMODITY.value,
                 'description': '天然气',
-                'metadata': {
+                'item_metadata': {
                     'unit': 'MMBtu',
                     'delivery_location': 'Henry Hub'
                 }
@@ -180,7 +246,7 @@ class DataInitializer:
                 'type': ItemType.INDEX.value,
                 'market_type': MarketType.STOCK.value,
                 'description': '标普500指数',
-                'metadata': {
+                'item_metadata': {
                     'exchange': 'NYSE',
                     'calculation_method': 'market_cap_weighted',
                     'base_value': 100
@@ -192,7 +258,7 @@ class DataInitializer:
                 'type': ItemType.INDEX.value,
                 'market_type': MarketType.STOCK.value,
                 'description': '道琼斯工业平均指数',
-                'metadata': {
+                'item_metadata': {
                     'exchange': 'NYSE',
                     'calculation_method': 'price_weighted',
                     'base_value': 100
@@ -206,7 +272,7 @@ class DataInitializer:
                 'type': ItemType.STOCK.value,
                 'market_type': MarketType.STOCK.value,
                 'description': '苹果公司',
-                'metadata': {
+                'item_metadata': {
                     'exchange': 'NASDAQ',
                     'sector': 'Technology',
                     'industry': 'Consumer Electronics'
@@ -218,7 +284,7 @@ class DataInitializer:
                 'type': ItemType.STOCK.value,
                 'market_type': MarketType.STOCK.value,
                 'description': '微软公司',
-                'metadata': {
+                'item_metadata': {
                     'exchange': 'NASDAQ',
                     'sector': 'Technology',
                     'industry': 'Software'
@@ -232,36 +298,51 @@ class DataInitializer:
                 'type': ItemType.SVU.value,
                 'market_type': None,
                 'description': '标准价值单位',
-                'metadata': {
+                'item_metadata': {
                     'base_value': 100,
                     'calculation_method': 'weighted_average'
                 }
             }
         ]
         
-        with Session(self.engine) as session:
-            for item_data in base_items:
-                # 检查是否已存在
-                existing = session.query(Item).filter_by(symbol=item_data['symbol']).first()
-                if not existing:
-                    item = Item(**item_data)
-                    session.add(item)
-                    logger.info(f"添加物品: {item_data['symbol']}")
+        with self._session_scope(session) as session:
+            # 一次查询所有已存在的物品
+            item_ids = dict(session.execute(
+                select(Item.symbol, Item.id).where(Item.symbol.in_([item['symbol'] for item in base_items]))
+            ).all())
             
-            session.commit()
+            # 一条语句插入所有新物品，并直接返回新插入物品的ID
+            new_items = [item for item in base_items if item['symbol'] not in item_ids]
+            if new_items:
+                for row in session.execute(insert(Item).returning(Item.id, Item.symbol), new_items):
+                    item_ids[row.symbol] = row.id
+                    logger.info(f"添加物品: {row.symbol}")
+                    
+            return item_ids
             
-    def initialize_historical_data(self):
+    def initialize_historical_data(self, session: Optional[Session] = None):
         """初始化历史数据"""
         logger.info("开始初始化历史数据...")
         
         # 获取所有物品
-        with Session(self.engine) as session:
+        with self._session_scope(session) as session:
             items = session.query(Item).all()
             
             # 生成过去一年的日期
             end_date = datetime.now()
             start_date = end_date - timedelta(days=365)
             dates = pd.date_range(start=start_date, end=end_date, freq='D')
+            i = np.arange(len(dates))
+            
+            # 与物品无关的日期系数只计算一次
+            price_factor = 1 + 0.1 * (i % 10) / 10
+            open_factor = 1 + 0.01 * (i % 5) / 5
+            close_factor = 1 - 0.01 * (i % 5) / 5
+            volume_factor = 1 + 0.2 * (i % 10) / 10
+            
+            # 先收集所有行，最后批量插入，避免逐个ORM对象的工作单元开销
+            price_frames: List[pd.DataFrame] = []
+            market_rows: List[Dict[str, Any]] = []
             
             # 为每个物品生成历史价格数据
             for item in items:
@@ -269,106 +350,85 @@ class DataInitializer:
                     continue
                     
                 # 根据物品类型生成不同的基础价格
-                if item.type == ItemType.CURRENCY.value:
-                    base_price = 100
-                elif item.type == ItemType.CRYPTO.value:
-                    base_price = 1000
-                elif item.type == ItemType.PRECIOUS_METAL.value:
-                    base_price = 2000
-                elif item.type == ItemType.COMMODITY.value:
-                    base_price = 50
-                elif item.type == ItemType.STOCK.value:
-                    base_price = 150
-                elif item.type == ItemType.INDEX.value:
-                    base_price = 3000
-                else:
-                    base_price = 100
+                base_price = BASE_PRICE.get(item.type, 100)
                 
                 # 生成价格数据
-                prices = [base_price * (1 + 0.1 * (i % 10) / 10) for i in range(len(dates))]
+                prices = base_price * price_factor
                 
-                # 添加价格数据
-                for date, price in zip(dates, prices):
-                    # 生成OHLC数据
-                    daily_volatility = price * 0.02  # 2%的日波动率
-                    open_price = price * (1 + 0.01 * (i % 5) / 5)
-                    high_price = price + daily_volatility
-                    low_price = price - daily_volatility
-                    close_price = price * (1 - 0.01 * (i % 5) / 5)
-                    
-                    price_obj = Price(
-                        item_id=item.id,
-                        price=price,
-                        open_price=open_price,
-                        high_price=high_price,
-                        low_price=low_price,
-                        close_price=close_price,
-                        volume=base_price * 1000 * (1 + 0.2 * (i % 10) / 10),
-                        timestamp=date,
-                        source=DataSource.CUSTOM.value,
-                        confidence=0.9,
-                        metadata={
-                            'is_simulated': True,
-                            'volatility': 0.02
-                        }
-                    )
-                    session.add(price_obj)
+                # 生成OHLC数据
+                daily_volatility = prices * 0.02  # 2%的日波动率
+                price_frames.append(pd.DataFrame({
+                    'item_id': item.id,
+                    'price': prices,
+                    'open_price': prices * open_factor,
+                    'high_price': prices + daily_volatility,
+                    'low_price': prices - daily_volatility,
+                    'close_price': prices * close_factor,
+                    'volume': base_price * 1000 * volume_factor,
+                    'timestamp': dates
+                }))
                     
                 # 添加市场数据
                 if item.type in [ItemType.CRYPTO.value, ItemType.STOCK.value]:
-                    market_data = MarketData(
-                        item_id=item.id,
-                        market_type=item.market_type,
-                        timestamp=end_date,
-                        volume_24h=base_price * 1000000,
-                        market_cap=base_price * 1000000000,
-                        circulating_supply=1000000000 if item.type == ItemType.CRYPTO.value else None,
-                        total_supply=1000000000 if item.type == ItemType.CRYPTO.value else None,
-                        max_supply=21000000 if item.symbol == 'BTC' else None,
-                        source=DataSource.CUSTOM.value,
-                        confidence=0.9,
-                        metadata={
+                    market_rows.append({
+                        'item_id': item.id,
+                        'market_type': item.market_type,
+                        'timestamp': end_date,
+                        'volume_24h': base_price * 1000000,
+                        'market_cap': base_price * 1000000000,
+                        'circulating_supply': 1000000000 if item.type == ItemType.CRYPTO.value else None,
+                        'total_supply': 1000000000 if item.type == ItemType.CRYPTO.value else None,
+                        'max_supply': 21000000 if item.symbol == 'BTC' else None,
+                        'source': DataSource.CUSTOM.value,
+                        'confidence': 0.9,
+                        'market_metadata': {
                             'is_simulated': True,
                             'data_type': 'market_data'
                         }
-                    )
-                    session.add(market_data)
+                    })
                     
                 logger.info(f"添加{item.symbol}的历史数据")
             
             # 生成汇率数据
             currencies = [item for item in items if item.type == ItemType.CURRENCY.value]
-            for source in currencies:
-                for target in currencies:
-                    if source.id != target.id:
-                        # 生成模拟汇率数据
-                        base_rate = 1.0 if source.symbol == 'USD' else 0.8
-                        rates = [base_rate * (1 + 0.05 * (i % 10) / 10) for i in range(len(dates))]
-                        
-                        for date, rate in zip(dates, rates):
-                            rate_obj = ExchangeRate(
-                                source_item_id=source.id,
-                                target_item_id=target.id,
-                                rate=rate,
-                                timestamp=date,
-                                source=DataSource.CUSTOM.value,
-                                confidence=0.9,
-                                metadata={
-                                    'is_simulated': True,
-                                    'pair': f"{source.symbol}/{target.symbol}"
-                                }
-                            )
-                            session.add(rate_obj)
-                            
-                        logger.info(f"添加{source.symbol}/{target.symbol}的汇率数据")
+            pairs = [(source, target) for source in currencies for target in currencies
+                     if source.id != target.id]
+            
+            # 所有货币对×日期的笛卡尔积一次性生成，货币对在外层、日期在内层
+            n_dates = len(dates)
+            base_rates = np.array([1.0 if source.symbol == 'USD' else 0.8 for source, _ in pairs])
+            rates = pd.DataFrame({
+                'source_item_id': np.repeat([source.id for source, _ in pairs], n_dates),
+                'target_item_id': np.repeat([target.id for _, target in pairs], n_dates),
+                'rate': (base_rates[:, None] * (1 + 0.05 * (i % 10) / 10)).ravel(),
+                'timestamp': np.tile(dates.values, len(pairs)),
+                'source': DataSource.CUSTOM.value,
+                'confidence': 0.9,
+                'rate_metadata': np.repeat([{
+                    'is_simulated': True,
+                    'pair': f"{source.symbol}/{target.symbol}"
+                } for source, target in pairs], n_dates)
+            })
+            logger.info(f"添加{len(pairs)}个货币对的汇率数据")
             
-            session.commit()
+            # 批量插入，插入完成后再统一建索引
+            with self._indexes_deferred(session, Price, ExchangeRate):
+                if price_frames:
+                    prices = pd.concat(price_frames, ignore_index=True)
+                    prices['source'] = DataSource.CUSTOM.value
+                    prices['confidence'] = 0.9
+                    session.execute(insert(Price).values(price_metadata=SIMULATED_PRICE_METADATA),
+                                    prices.to_dict('records'))
+                if not rates.empty:
+                    session.execute(insert(ExchangeRate), rates.to_dict('records'))
+            if market_rows:
+                session.execute(insert(MarketData), market_rows)
             
-    def initialize_svu_values(self):
+    def initialize_svu_values(self, session: Optional[Session] = None):
         """初始化SVU价值数据"""
         logger.info("开始初始化SVU价值数据...")
         
-        with Session(self.engine) as session:
+        with self._session_scope(session) as session:
             # 获取SVU物品
             svu_item = session.query(Item).filter_by(symbol='SVU').first()
             if not svu_item:
@@ -383,44 +443,58 @@ class DataInitializer:
             start_date = end_date - timedelta(days=365)
             dates = pd.date_range(start=start_date, end=end_date, freq='D')
             
+            svu_frames: List[pd.DataFrame] = []
+            
+            # 模拟SVU价值只与日期有关，所有物品共用
+            base_value = 100  # SVU基准值
+            values = base_value * (1 + 0.05 * (np.arange(len(dates)) % 10) / 10)
+            
+            # 一次查询所有物品最新价格数据的ID
+            latest = select(Price.item_id, func.max(Price.timestamp).label('timestamp'))\
+                .group_by(Price.item_id)\
+                .subquery()
+            latest_price_ids = dict(session.execute(
+                select(Price.item_id, func.max(Price.id))
+                .join(latest, and_(Price.item_id == latest.c.item_id,
+                                   Price.timestamp == latest.c.timestamp))
+                .group_by(Price.item_id)
+            ).all())
+            
             # 为每个物品生成SVU价值数据
             for item in items:
-                # 获取最新的价格数据
-                latest_price = session.query(Price)\
-                    .filter_by(item_id=item.id)\
-                    .order_by(Price.timestamp.desc())\
-                    .first()
-                    
-                if latest_price:
+                latest_price_id = latest_price_ids.get(item.id)
+                if latest_price_id is not None:
                     # 生成模拟SVU价值数据
-                    base_value = 100  # SVU基准值
-                    values = [base_value * (1 + 0.05 * (i % 10) / 10) for i in range(len(dates))]
-                    
-                    for date, value in zip(dates, values):
-                        svu_value = SVUValue(
-                            item_id=item.id,
-                            svu_value=value,
-                            timestamp=date,
-                            confidence=0.9,
-                            calculation_method='weighted_average',
-                            metadata={
-                                'is_simulated': True,
-                                'price_id': latest_price.id,
-                                'base_value': base_value
-                            }
-                        )
-                        session.add(svu_value)
+                    svu_frames.append(pd.DataFrame({
+                        'item_id': item.id,
+                        'svu_value': values,
+                        'timestamp': dates,
+                        'svu_metadata': [{
+                            'is_simulated': True,
+                            'price_id': latest_price_id,
+                            'base_value': base_value
+                        }] * len(dates)
+                    }))
                         
                     logger.info(f"添加{item.symbol}的SVU价值数据")
             
-            session.commit()
+            # 批量插入，插入完成后再统一建索引
+            if svu_frames:
+                svu_values = pd.concat(svu_frames, ignore_index=True)
+                svu_values['confidence'] = 0.9
+                svu_values['calculation_method'] = 'weighted_average'
+                with self._indexes_deferred(session, SVUValue):
+                    session.execute(insert(SVUValue), svu_values.to_dict('records'))
             
     def run(self):
         """运行初始化流程"""
         try:
-            self.initialize_base_items()
-            self.initialize_historical_data()
-            self.initialize_svu_values()
+            # 所有步骤在同一个事务中完成，最后统一提交一次
+            with Session(self.engine) as session:
+                self.initialize_base_items(session)
+                self.initialize_historical_data(session)
+                self.initialize_svu_values(session)
+                session.commit()
             logger.info("数据初始化完成")
         except Exception as e:
             logger.error(f"数据初始化失败: {str(e)}")
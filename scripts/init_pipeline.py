@@ -2,10 +2,10 @@ import os
 import sys
 import logging
 from pathlib import Path
-import yaml
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
-from models.database import Base, Item, Price, ExchangeRate
+from models.database import Base, Item, Price, ExchangeRate, configure_sqlite
+from utils.config import load_config as load_cached_config
 from pipeline.manager import DataPipelineManager
 
 # 设置日志
@@ -41,7 +41,7 @@ def init_database():
     """初始化数据库"""
     try:
         # 创建数据库引擎
-        engine = create_engine('sqlite:///data/database/svu_data.db')
+        engine = configure_sqlite(create_engine('sqlite:///data/database/svu_data.db'))
         
         # 创建所有表
         Base.metadata.create_all(engine)
@@ -62,8 +62,7 @@ def load_config():
     """加载配置文件"""
     try:
         config_path = 'config/api_config.yaml'
-        with open(config_path, 'r', encoding='utf-8') as f:
-            config = yaml.safe_load(f)
+        config = load_cached_config(config_path)
             
         logger.info("成功加载配置文件")
         
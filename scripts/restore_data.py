@@ -2,14 +2,20 @@ import os
 import sys
 import logging
 import shutil
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from pathlib import Path
-import yaml
 import sqlite3
-import pandas as pd
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, delete
 from sqlalchemy.orm import sessionmaker
 from models.database import Base, Item, Price, ExchangeRate
+from utils.config import load_config as load_cached_config
+from utils.backup_index import read_backup_records
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
 
 # 设置日志
 logging.basicConfig(
@@ -23,12 +29,18 @@ logging.basicConfig(
 
 logger = logging.getLogger(__name__)
 
+# CSV按块读取的行数
+CSV_CHUNKSIZE = 50_000
+# SQLite单条语句允许绑定的最大参数数
+SQLITE_MAX_VARIABLES = 32766
+# Linux的FICLONE ioctl，在btrfs、XFS等支持写时复制的文件系统上克隆文件
+FICLONE = 0x40049409
+
 def load_config():
     """加载配置文件"""
     try:
         config_path = 'config/api_config.yaml'
-        with open(config_path, 'r', encoding='utf-8') as f:
-            config = yaml.safe_load(f)
+        config = load_cached_config(config_path)
             
         logger.info("成功加载配置文件")
         
@@ -38,55 +50,67 @@ def load_config():
         logger.error(f"加载配置文件失败: {str(e)}")
         raise
 
+def scan_export_dirs(export_dir, backup_type):
+    """列出导出目录下的各次导出子目录"""
+    backups = []
+    if not export_dir.is_dir():
+        return backups
+        
+    with os.scandir(export_dir) as entries:
+        for entry in entries:
+            if entry.is_dir():
+                backups.append({
+                    'type': backup_type,
+                    'dir': Path(entry.path),
+                    'timestamp': datetime.fromtimestamp(entry.stat().st_mtime)
+                })
+    return backups
+
 def list_backups():
     """列出可用的备份"""
     try:
         # 获取备份目录
         backup_dir = Path('data/backup')
         
-        # 获取数据库备份
-        db_backups = []
-        for file in backup_dir.glob('svu_data_*.db'):
-            db_backups.append({
-                'type': 'database',
-                'file': file,
-                'timestamp': datetime.fromtimestamp(file.stat().st_mtime)
-            })
-            
-        # 获取配置文件备份
-        config_backups = []
-        for file in backup_dir.glob('api_config_*.yaml'):
-            config_backups.append({
-                'type': 'config',
-                'file': file,
-                'timestamp': datetime.fromtimestamp(file.stat().st_mtime)
-            })
-            
-        # 获取数据文件备份
-        data_backups = []
-        for dir in backup_dir.glob('data_files_*'):
-            if dir.is_dir():
-                data_backups.append({
-                    'type': 'data',
-                    'dir': dir,
-                    'timestamp': datetime.fromtimestamp(dir.stat().st_mtime)
+        backups = {'database': [], 'config': [], 'data': [], 'parquet': []}
+        
+        # 优先读取备份索引中最近的记录，只检查这些备份是否仍然存在
+        records = read_backup_records(backup_dir)
+        if records is not None:
+            for record in records:
+                if record['type'] not in backups or not record['path'].exists():
+                    continue
+                key = 'file' if record['type'] in ('database', 'config') else 'dir'
+                backups[record['type']].append({
+                    'type': record['type'],
+                    key: record['path'],
+                    'timestamp': record['timestamp']
                 })
                 
-        # 获取CSV导出备份
-        csv_backups = []
-        for dir in backup_dir.glob('csv/*'):
-            if dir.is_dir():
-                csv_backups.append({
-                    'type': 'csv',
-                    'dir': dir,
-                    'timestamp': datetime.fromtimestamp(dir.stat().st_mtime)
-                })
+        # 没有索引的旧备份目录，一次遍历备份目录，按文件名分类数据库、配置文件和数据文件备份
+        elif backup_dir.is_dir():
+            with os.scandir(backup_dir) as entries:
+                for entry in entries:
+                    name = entry.name
+                    if name.startswith('svu_data_') and name.endswith('.db'):
+                        backup = {'type': 'database', 'file': Path(entry.path)}
+                    elif name.startswith('api_config_') and name.endswith('.yaml'):
+                        backup = {'type': 'config', 'file': Path(entry.path)}
+                    elif name.startswith('data_files_') and entry.is_dir():
+                        backup = {'type': 'data', 'dir': Path(entry.path)}
+                    else:
+                        continue
+                    backup['timestamp'] = datetime.fromtimestamp(entry.stat().st_mtime)
+                    backups[backup['type']].append(backup)
+                    
+            backups['parquet'] = scan_export_dirs(backup_dir / 'parquet', 'parquet')
+            
+        # CSV导出只存在于旧备份中，不在索引里
+        backups['csv'] = scan_export_dirs(backup_dir / 'csv', 'csv')
                 
         return {
-            'database': sorted(db_backups, key=lambda x: x['timestamp'], reverse=True),
-            'config': sorted(config_backups, key=lambda x: x['timestamp'], reverse=True),
-            'data': sorted(data_backups, key=lambda x: x['timestamp'], reverse=True),
-            'csv': sorted(csv_backups, key=lambda x: x['timestamp'], reverse=True)
+            backup_type: sorted(backups[backup_type], key=lambda x: x['timestamp'], reverse=True)
+            for backup_type in ['database', 'config', 'data', 'csv', 'parquet']
         }
         
     except Exception as e:
@@ -100,8 +124,15 @@ def restore_database(backup_file):
         db_dir = Path('data/database')
         db_dir.mkdir(parents=True, exist_ok=True)
         
-        # 复制备份文件
-        shutil.copy2(backup_file, 'data/database/svu_data.db')
+        # 使用SQLite在线备份API按页写入，目标数据库正被打开时也不会得到损坏的文件
+        # 以只读方式打开备份，恢复过程不会修改备份文件
+        source = sqlite3.connect(f'file:{backup_file}?mode=ro', uri=True)
+        target = sqlite3.connect('data/database/svu_data.db')
+        try:
+            source.backup(target, pages=1024)
+        finally:
+            target.close()
+            source.close()
         
         logger.info(f"成功从{backup_file}恢复数据库")
         
@@ -125,6 +156,21 @@ def restore_config(backup_file):
         logger.error(f"恢复配置文件失败: {str(e)}")
         raise
 
+def clone_or_copy(src, dst):
+    """优先以写时复制方式克隆文件，只复制元数据而不复制数据块，不支持时退回普通复制
+    
+    不使用硬链接，避免之后就地修改恢复出的文件时连带修改备份。
+    """
+    if fcntl is not None:
+        try:
+            with open(src, 'rb') as fsrc, open(dst, 'wb') as fdst:
+                fcntl.ioctl(fdst.fileno(), FICLONE, fsrc.fileno())
+            shutil.copystat(src, dst)
+            return dst
+        except OSError:
+            pass
+    return shutil.copy2(src, dst)
+
 def restore_data_files(backup_dir):
     """恢复数据文件"""
     try:
@@ -133,14 +179,14 @@ def restore_data_files(backup_dir):
         if (backup_dir / 'raw').exists():
             if raw_dir.exists():
                 shutil.rmtree(raw_dir)
-            shutil.copytree(backup_dir / 'raw', raw_dir)
+            shutil.copytree(backup_dir / 'raw', raw_dir, copy_function=clone_or_copy)
             
         # 恢复处理后的数据
         processed_dir = Path('data/processed')
         if (backup_dir / 'processed').exists():
             if processed_dir.exists():
                 shutil.rmtree(processed_dir)
-            shutil.copytree(backup_dir / 'processed', processed_dir)
+            shutil.copytree(backup_dir / 'processed', processed_dir, copy_function=clone_or_copy)
             
         logger.info(f"成功从{backup_dir}恢复数据文件")
         
@@ -150,24 +196,28 @@ def restore_data_files(backup_dir):
 
 def restore_from_csv(backup_dir):
     """从CSV文件恢复数据"""
+    # pandas导入开销较大，只在需要恢复表数据时导入
+    import pandas as pd
+    
     try:
         # 创建数据库连接
         engine = create_engine('sqlite:///data/database/svu_data.db')
         
-        # 恢复价格数据
-        if (backup_dir / 'prices.csv').exists():
-            prices = pd.read_csv(backup_dir / 'prices.csv')
-            prices.to_sql('prices', engine, if_exists='replace', index=False)
-            
-        # 恢复汇率数据
-        if (backup_dir / 'exchange_rates.csv').exists():
-            rates = pd.read_csv(backup_dir / 'exchange_rates.csv')
-            rates.to_sql('exchange_rates', engine, if_exists='replace', index=False)
-            
-        # 恢复物品数据
-        if (backup_dir / 'items.csv').exists():
-            items = pd.read_csv(backup_dir / 'items.csv')
-            items.to_sql('items', engine, if_exists='replace', index=False)
+        # 保留模型定义的表结构和索引，只清空数据后追加
+        Base.metadata.create_all(engine)
+        
+        with engine.begin() as conn:
+            # 依次恢复价格、汇率和物品数据
+            for model in [Price, ExchangeRate, Item]:
+                csv_file = backup_dir / f'{model.__tablename__}.csv'
+                if not csv_file.exists():
+                    continue
+                    
+                conn.execute(delete(model))
+                for chunk in pd.read_csv(csv_file, chunksize=CSV_CHUNKSIZE):
+                    # 多行VALUES插入，每条语句的参数数不超过SQLite的限制
+                    chunk.to_sql(model.__tablename__, conn, if_exists='append', index=False,
+                                 method='multi', chunksize=SQLITE_MAX_VARIABLES // len(chunk.columns))
             
         logger.info(f"成功从{backup_dir}恢复CSV数据")
         
@@ -175,6 +225,49 @@ def restore_from_csv(backup_dir):
         logger.error(f"从CSV文件恢复数据失败: {str(e)}")
         raise
 
+def restore_from_parquet(backup_dir):
+    """从Parquet文件恢复数据"""
+    import pandas as pd
+    
+    try:
+        # 创建数据库连接
+        engine = create_engine('sqlite:///data/database/svu_data.db')
+        
+        # 保留模型定义的表结构和索引，只清空数据后追加
+        Base.metadata.create_all(engine)
+        
+        with engine.begin() as conn:
+            # 依次恢复价格、汇率和物品数据
+            for model in [Price, ExchangeRate, Item]:
+                parquet_file = backup_dir / f'{model.__tablename__}.parquet'
+                if not parquet_file.exists():
+                    continue
+                    
+                conn.execute(delete(model))
+                data = pd.read_parquet(parquet_file)
+                if data.empty:
+                    continue
+                # 多行VALUES插入，每条语句的参数数不超过SQLite的限制
+                data.to_sql(model.__tablename__, conn, if_exists='append', index=False,
+                            method='multi', chunksize=SQLITE_MAX_VARIABLES // len(data.columns))
+                
+        logger.info(f"成功从{backup_dir}恢复Parquet数据")
+        
+    except Exception as e:
+        logger.error(f"从Parquet文件恢复数据失败: {str(e)}")
+        raise
+
+def restore_database_and_tables(backups):
+    """恢复数据库文件后再恢复表数据，两者写同一个SQLite文件，必须依次执行"""
+    if backups['database']:
+        restore_database(backups['database'][0]['file'])
+        
+    # 优先使用Parquet导出，兼容旧的CSV导出
+    if backups['parquet']:
+        restore_from_parquet(backups['parquet'][0]['dir'])
+    elif backups['csv']:
+        restore_from_csv(backups['csv'][0]['dir'])
+
 def main():
     """主函数"""
     try:
@@ -194,17 +287,16 @@ def main():
         # 选择要恢复的备份
         # 这里可以根据需要实现交互式选择或使用命令行参数
         # 为了示例，我们使用最新的备份
-        if backups['database']:
-            restore_database(backups['database'][0]['file'])
-            
-        if backups['config']:
-            restore_config(backups['config'][0]['file'])
-            
-        if backups['data']:
-            restore_data_files(backups['data'][0]['dir'])
-            
-        if backups['csv']:
-            restore_from_csv(backups['csv'][0]['dir'])
+        # 配置文件、数据文件和数据库分别位于不同路径，并发恢复
+        with ThreadPoolExecutor(max_workers=3) as executor:
+            futures = [executor.submit(restore_database_and_tables, backups)]
+            if backups['config']:
+                futures.append(executor.submit(restore_config, backups['config'][0]['file']))
+            if backups['data']:
+                futures.append(executor.submit(restore_data_files, backups['data'][0]['dir']))
+                
+            for future in futures:
+                future.result()
             
         logger.info("恢复完成")
         
@@ -1,19 +1,24 @@
 import sys
 import os
+import hashlib
+import json
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from models.svu_model import SVUGraphModel, SVUPredictor
 from utils.data_collector import DataCollector
 from utils.data_processor import DataProcessor
 import numpy as np
+import torch
+from numpy.lib.stride_tricks import sliding_window_view
 import pandas as pd
 from datetime import datetime, timedelta
-from sklearn.preprocessing import StandardScaler
-from sklearn.model_selection import train_test_split
+from pathlib import Path
 import networkx as nx
 from typing import Dict, Tuple, List
+from sqlalchemy import func, select
 from sqlalchemy.orm import Session
 from models.database import Item, Price, ExchangeRate
+from utils.jit import njit, prange, NUMBA_AVAILABLE
 import logging
 
 # 配置日志
@@ -23,6 +28,44 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# 对齐后的特征矩阵缓存目录
+FEATURE_CACHE_DIR = Path('models/cache')
+
+# 特征矩阵首地址按缓存行对齐，AVX-512可以使用对齐加载
+ARRAY_ALIGNMENT = 64
+
+def aligned_empty(shape: Tuple[int, ...], dtype=np.float32, align: int = ARRAY_ALIGNMENT) -> np.ndarray:
+    """分配首地址按align字节对齐的C连续未初始化数组
+    
+    Args:
+        shape: 数组形状
+        dtype: 数据类型
+        align: 对齐字节数
+        
+    Returns:
+        np.ndarray: 对齐的数组
+    """
+    nbytes = int(np.prod(shape)) * np.dtype(dtype).itemsize
+    buf = np.empty(nbytes + align, dtype=np.uint8)
+    offset = (-buf.ctypes.data) % align
+    return np.ndarray(shape, dtype=dtype, buffer=buf, offset=offset)
+
+@njit(cache=True, parallel=True)
+def _build_windows_kernel(features: np.ndarray, window_size: int, out: np.ndarray) -> None:
+    """把每个时间窗口内各时间点的特征按行展开拼接成一行，写入out
+    
+    Args:
+        features: 特征矩阵(时间点, 特征)
+        window_size: 时间窗口大小
+        out: 节点特征输出(样本, window_size * 特征数)
+    """
+    n_samples = features.shape[0] - window_size + 1
+    n_features = features.shape[1]
+    for i in prange(n_samples):
+        for w in range(window_size):
+            for j in range(n_features):
+                out[i, w * n_features + j] = features[i + w, j]
+
 def create_graph_data(features: np.ndarray,
                      edge_index: np.ndarray,
                      window_size: int = 5) -> Tuple[np.ndarray, np.ndarray]:
@@ -46,32 +89,190 @@ def create_graph_data(features: np.ndarray,
     n_features = features.shape[1]
     logger.info(f"创建图数据: {n_samples}个样本, {n_features}个特征")
     
-    # 创建节点特征
-    node_features = []
-    for i in range(n_samples):
-        window = features[i:i+window_size]
-        node_features.append(window.flatten())
-    node_features = np.array(node_features)
+    # 创建节点特征，每个样本是窗口内各时间点特征按行展开，写入对齐的缓冲区
+    node_features = aligned_empty((n_samples, window_size * n_features), features.dtype)
+    if NUMBA_AVAILABLE:
+        _build_windows_kernel(np.ascontiguousarray(features), window_size, node_features)
+    else:
+        windows = sliding_window_view(features, window_size, axis=0)  # (n_samples, n_features, window_size)
+        node_features.reshape(n_samples, window_size, n_features)[...] = windows.transpose(0, 2, 1)
     
     # 使用提供的边索引
-    if len(edge_index) > 0:
-        edge_index = edge_index[:, edge_index[0] < n_samples]
-        edge_index = edge_index[:, edge_index[1] < n_samples]
+    edge_index = np.asarray(edge_index, dtype=np.int32).reshape(2, -1)
+    if edge_index.shape[1] > 0:
+        edge_index = edge_index[:, (edge_index[0] < n_samples) & (edge_index[1] < n_samples)]
     else:
         # 如果没有边索引，创建时间序列连接
-        edge_index = np.array([[i, i+1] for i in range(n_samples-1)]).T
+        src = np.arange(n_samples - 1, dtype=np.int32)
+        edge_index = np.stack([src, src + 1])
     
     # 添加自环
-    self_loops = np.array([[i, i] for i in range(n_samples)]).T
-    edge_index = np.concatenate([edge_index, self_loops], axis=1)
+    self_loops = np.repeat(np.arange(n_samples, dtype=np.int32)[None, :], 2, axis=0)
+    edge_index = np.ascontiguousarray(np.concatenate([edge_index, self_loops], axis=1))
     
     logger.info(f"创建了{len(edge_index[0])}条边")
     return node_features, edge_index
 
+def price_data_fingerprint(collector: DataCollector,
+                           symbols: List[str],
+                           start_date: str,
+                           end_date: str) -> List:
+    """计算日期范围内价格数据的指纹，新增、删除或修正价格记录后指纹随之改变
+    
+    Args:
+        collector: 数据采集器
+        symbols: 所有物品代码
+        start_date: 开始日期
+        end_date: 结束日期
+        
+    Returns:
+        List: 记录数、最大ID和价格总和
+    """
+    query = select(
+        func.count(Price.id),
+        func.max(Price.id),
+        func.sum(Price.price)
+    ).join(Item, Item.id == Price.item_id).where(
+        Item.symbol.in_(symbols),
+        Price.timestamp.between(start_date, end_date)
+    )
+    with collector.engine.connect() as conn:
+        return list(conn.execute(query).one())
+        
+def feature_cache_paths(start_date: str, end_date: str, symbols: List[str],
+                        fingerprint: List) -> Tuple[Path, Path]:
+    """根据日期范围、物品列表和数据指纹计算特征缓存的数据文件和元数据文件路径
+    
+    Args:
+        start_date: 开始日期
+        end_date: 结束日期
+        symbols: 所有物品代码
+        fingerprint: price_data_fingerprint计算的数据指纹
+        
+    Returns:
+        Tuple[Path, Path]: 数据文件路径和元数据文件路径
+    """
+    key = hashlib.sha1(json.dumps([start_date, end_date, symbols, fingerprint]).encode('utf-8')).hexdigest()[:16]
+    return FEATURE_CACHE_DIR / f'features_{key}.dat', FEATURE_CACHE_DIR / f'features_{key}.json'
+
+def feature_cache_range_key(start_date: str, end_date: str, symbols: List[str]) -> str:
+    """计算不含数据指纹的缓存键，同一日期范围和物品列表的各版本缓存共用此键
+    
+    Args:
+        start_date: 开始日期
+        end_date: 结束日期
+        symbols: 所有物品代码
+        
+    Returns:
+        str: 缓存键
+    """
+    return hashlib.sha1(json.dumps([start_date, end_date, symbols]).encode('utf-8')).hexdigest()[:16]
+
+def evict_stale_feature_cache(range_key: str, keep: Path) -> None:
+    """删除同一日期范围和物品列表下除最新一份之外的特征缓存
+    
+    Args:
+        range_key: feature_cache_range_key计算的缓存键
+        keep: 需要保留的元数据文件路径
+    """
+    for meta_path in FEATURE_CACHE_DIR.glob('features_*.json'):
+        if meta_path == keep:
+            continue
+        try:
+            with open(meta_path, 'r', encoding='utf-8') as f:
+                if json.load(f).get('range_key') != range_key:
+                    continue
+            # 先删除元数据，中途失败时剩下的数据文件会被视为不完整
+            meta_path.unlink(missing_ok=True)
+            meta_path.with_suffix('.dat').unlink(missing_ok=True)
+            logger.info(f"删除过期的特征缓存: {meta_path.with_suffix('.dat')}")
+        except (OSError, ValueError) as e:
+            logger.warning(f"删除过期的特征缓存失败: {str(e)}")
+
+def load_aligned_features(collector: DataCollector,
+                          items: List[Item],
+                          start_date: str,
+                          end_date: str) -> Tuple[np.ndarray, List[Item]]:
+    """获取按时间点对齐的float32特征矩阵，存放在np.memmap中并在多次训练之间复用
+    
+    缓存命中时直接映射缓存文件，不再从数据库读取历史价格。缓存键包含范围内价格数据的指纹，
+    价格记录变化后会重新生成。元数据文件在数据写完后才生成，没有元数据的数据文件视为不完整并重新生成。
+    生成新缓存后删除同一日期范围和物品列表下的旧缓存。
+    
+    Args:
+        collector: 数据采集器
+        items: 所有物品
+        start_date: 开始日期
+        end_date: 结束日期
+        
+    Returns:
+        Tuple[np.ndarray, List[Item]]: 特征矩阵(时间点, 物品)和有历史数据的物品
+    """
+    symbols = [item.symbol for item in items]
+    fingerprint = price_data_fingerprint(collector, symbols, start_date, end_date)
+    data_path, meta_path = feature_cache_paths(start_date, end_date, symbols, fingerprint)
+    range_key = feature_cache_range_key(start_date, end_date, symbols)
+    
+    if data_path.exists() and meta_path.exists():
+        with open(meta_path, 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+        items_by_symbol = {item.symbol: item for item in items}
+        valid_items = [items_by_symbol[symbol] for symbol in meta['symbols']]
+        features = np.memmap(data_path, dtype=np.float32, mode='r', shape=tuple(meta['shape']))
+        logger.info(f"使用缓存的特征矩阵: {data_path}, {features.shape[0]}个时间点")
+        return features, valid_items
+        
+    # 一次查询获取所有物品的历史价格数据
+    try:
+        hist_data = collector.get_historical_data_bulk(symbols, start_date, end_date)
+        prices_by_symbol = {symbol: group['price'].values
+                            for symbol, group in hist_data.groupby('symbol', sort=False)}
+    except Exception as e:
+        logger.error(f"获取历史数据时出错: {str(e)}")
+        prices_by_symbol = {}
+        
+    series = []
+    valid_items = []
+    for item in items:
+        prices = prices_by_symbol.get(item.symbol)
+        if prices is not None:
+            series.append(prices)
+            valid_items.append(item)
+            logger.info(f"获取到{item.symbol}的历史数据: {len(prices)}条记录")
+        else:
+            logger.warning(f"{item.symbol}没有历史数据")
+    
+    if not series:
+        raise ValueError("没有找到任何有效的历史数据")
+        
+    # 将所有特征对齐到相同的时间点
+    min_length = min(len(f) for f in series)
+    logger.info(f"所有特征对齐到{min_length}个时间点")
+    if min_length == 0:
+        raise ValueError("特征矩阵为空")
+    
+    # 直接按(时间点, 物品)行优先布局填充float32矩阵，只拷贝一次
+    FEATURE_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    features = np.memmap(data_path, dtype=np.float32, mode='w+', shape=(min_length, len(series)))
+    for i, f in enumerate(series):
+        features[:, i] = f[:min_length]
+    features.flush()
+    
+    with open(meta_path, 'w', encoding='utf-8') as f:
+        json.dump({
+            'shape': list(features.shape),
+            'symbols': [item.symbol for item in valid_items],
+            'range_key': range_key
+        }, f, ensure_ascii=False)
+    evict_stale_feature_cache(range_key, meta_path)
+        
+    return features, valid_items
+
 def prepare_training_data(collector: DataCollector,
                          processor: DataProcessor,
                          start_date: str,
-                         end_date: str) -> Dict[str, np.ndarray]:
+                         end_date: str,
+                         device: str = 'cuda' if torch.cuda.is_available() else 'cpu') -> Dict[str, np.ndarray]:
     """准备训练数据
     
     Args:
@@ -79,9 +280,10 @@ def prepare_training_data(collector: DataCollector,
         processor: 数据处理器
         start_date: 开始日期
         end_date: 结束日期
+        device: 节点特征和边索引张量所在的设备
         
     Returns:
-        Dict[str, np.ndarray]: 训练数据
+        Dict[str, np.ndarray]: 训练数据，其中features和edge_index已转换为device上的张量
     """
     logger.info(f"准备训练数据: {start_date} 到 {end_date}")
     
@@ -93,48 +295,34 @@ def prepare_training_data(collector: DataCollector,
             
         logger.info(f"找到{len(items)}个物品")
         
-        # 获取每个物品的历史价格数据
-        features = []
-        valid_items = []
-        for item in items:
-            try:
-                hist_data = collector.get_historical_data(item.symbol, start_date, end_date)
-                if not hist_data.empty:
-                    features.append(hist_data['price'].values)
-                    valid_items.append(item)
-                    logger.info(f"获取到{item.symbol}的历史数据: {len(hist_data)}条记录")
-                else:
-                    logger.warning(f"{item.symbol}没有历史数据")
-            except Exception as e:
-                logger.error(f"获取{item.symbol}历史数据时出错: {str(e)}")
-        
-        if not features:
-            raise ValueError("没有找到任何有效的历史数据")
-            
-        # 将所有特征对齐到相同的时间点
-        min_length = min(len(f) for f in features)
-        logger.info(f"所有特征对齐到{min_length}个时间点")
-        
-        features = np.array([f[:min_length] for f in features]).T
+        features, valid_items = load_aligned_features(collector, items, start_date, end_date)
+        min_length = len(features)
         
         # 获取物品之间的关系数据
-        edge_index = []
+        symbol_index = {it.symbol: i for i, it in enumerate(valid_items)}
+        edges = []
         for item in valid_items:
             try:
                 relationships = collector.get_relationship_data(item.symbol)
                 for source, target, rate in relationships:
-                    source_idx = next(i for i, it in enumerate(valid_items) if it.symbol == source)
-                    target_idx = next(i for i, it in enumerate(valid_items) if it.symbol == target)
-                    edge_index.append([source_idx, target_idx])
+                    source_idx = symbol_index.get(source)
+                    target_idx = symbol_index.get(target)
+                    if source_idx is None or target_idx is None:
+                        continue
+                    edges.append((source_idx, target_idx))
                 logger.info(f"获取到{item.symbol}的{len(relationships)}个关系")
             except Exception as e:
                 logger.error(f"获取{item.symbol}关系数据时出错: {str(e)}")
         
-        edge_index = np.array(edge_index).T if edge_index else np.array([[], []])
+        edge_index = np.asarray(edges, dtype=np.int32).T if edges else np.empty((2, 0), dtype=np.int32)
     
-    # 标准化特征
-    scaler = StandardScaler()
-    features_scaled = scaler.fit_transform(features)
+    # 标准化特征，在float32上按列计算均值和标准差，常数列的标准差按1处理
+    feature_mean = features.mean(axis=0, dtype=np.float32)
+    feature_std = features.std(axis=0, dtype=np.float32)
+    feature_std[feature_std == 0] = 1
+    features_scaled = aligned_empty(features.shape, np.float32)
+    np.subtract(features, feature_mean, out=features_scaled)
+    features_scaled /= feature_std
     
     # 创建图数据
     node_features, edge_index = create_graph_data(features_scaled, edge_index)
@@ -159,10 +347,13 @@ def prepare_training_data(collector: DataCollector,
         labels = features[1:, 0]
         logger.info("使用第一个物品的价格作为标签")
     
+    # 图结构和节点特征只在这里转换一次张量，训练和预测时直接复用
     return {
-        'features': node_features,
-        'edge_index': edge_index,
-        'labels': labels
+        'features': torch.as_tensor(node_features, dtype=torch.float32, device=device),
+        'edge_index': torch.as_tensor(edge_index, dtype=torch.long, device=device),
+        'labels': labels,
+        'feature_mean': feature_mean,
+        'feature_std': feature_std
     }
 
 def split_data(data: Dict[str, np.ndarray],
@@ -176,30 +367,28 @@ def split_data(data: Dict[str, np.ndarray],
     Returns:
         Tuple[Dict[str, np.ndarray], Dict[str, np.ndarray]]: 训练集和测试集
     """
-    # 获取数据长度
+    # 获取数据长度，测试集取末尾ceil(n * test_size)个样本，与不打乱的train_test_split一致
     n_samples = len(data['features'])
-    indices = np.arange(n_samples)
-    
-    # 划分索引
-    train_indices, test_indices = train_test_split(
-        indices,
-        test_size=test_size,
-        shuffle=False
-    )
+    n_test = int(np.ceil(n_samples * test_size))
+    n_train = n_samples - n_test
+    if n_train <= 0 or n_test <= 0:
+        raise ValueError(f"样本数({n_samples})不足以按test_size={test_size}划分")
     
-    logger.info(f"划分数据集: {len(train_indices)}个训练样本, {len(test_indices)}个测试样本")
+    logger.info(f"划分数据集: {n_train}个训练样本, {n_test}个测试样本")
     
-    # 划分数据
+    # 两部分都是连续区间，用切片得到视图而不是拷贝，边索引共用同一个张量
+    train_slice = slice(None, n_train)
+    test_slice = slice(n_train, None)
     train_data = {
-        'features': data['features'][train_indices],
+        'features': data['features'][train_slice],
         'edge_index': data['edge_index'],
-        'labels': data['labels'][train_indices]
+        'labels': data['labels'][train_slice]
     }
     
     test_data = {
-        'features': data['features'][test_indices],
+        'features': data['features'][test_slice],
         'edge_index': data['edge_index'],
-        'labels': data['labels'][test_indices]
+        'labels': data['labels'][test_slice]
     }
     
     return train_data, test_data
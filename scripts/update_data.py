@@ -2,16 +2,19 @@ import sys
 import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
+from sqlalchemy import func, insert, select
 from sqlalchemy.orm import Session
 from models.database import (
     Item, Price, ExchangeRate, DataUpdateLog, SVUValue, MarketData,
     ItemType, DataSource, MarketType, init_db
 )
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 import logging
 import schedule
+import threading
 import time
-from typing import List, Dict, Any
+from typing import Any, Callable, Dict, List, Optional
 import pandas as pd
 import numpy as np
 from api.worldbank import WorldBankAPI
@@ -22,6 +25,13 @@ from api.imf import IMFAPI
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# 并发请求外部API的最大线程数，同时也限制了对单个数据源的并发请求数
+API_MAX_WORKERS = 8
+
+# API响应缓存的有效期(秒)和触发清理过期条目的条目数
+API_CACHE_TTL = 240
+API_CACHE_MAXSIZE = 1024
+
 class DataUpdater:
     """数据更新类"""
     
@@ -32,6 +42,138 @@ class DataUpdater:
         self.coingecko_api = CoinGeckoAPI()
         self.imf_api = IMFAPI()
         
+        # (API方法, 参数) -> (获取时间, 响应)
+        self._api_cache: Dict[tuple, tuple] = {}
+        self._api_cache_lock = threading.Lock()
+        
+    def _cached_call(self, fetch: Callable, *args) -> Any:
+        """调用API方法，API_CACHE_TTL秒内相同的调用直接返回缓存的响应
+        
+        Args:
+            fetch: API方法
+            *args: 调用参数
+            
+        Returns:
+            Any: API响应，空响应不缓存
+        """
+        key = (fetch.__qualname__, args)
+        now = time.monotonic()
+        with self._api_cache_lock:
+            entry = self._api_cache.get(key)
+        if entry is not None and now - entry[0] < API_CACHE_TTL:
+            return entry[1]
+            
+        result = fetch(*args)
+        if result:
+            with self._api_cache_lock:
+                if len(self._api_cache) >= API_CACHE_MAXSIZE:
+                    self._api_cache = {k: v for k, v in self._api_cache.items()
+                                       if now - v[0] < API_CACHE_TTL}
+                self._api_cache[key] = (now, result)
+        return result
+        
+    def _fetch_all(self, fetch: Callable[[str], Optional[Dict]], symbols: List[str]) -> List[Optional[Dict]]:
+        """用线程池并发请求每个物品的数据，重叠网络等待时间
+        
+        Args:
+            fetch: 按代码请求单个物品数据的API方法
+            symbols: 物品代码列表
+            
+        Returns:
+            List[Optional[Dict]]: 与symbols顺序一致的请求结果
+        """
+        with ThreadPoolExecutor(max_workers=API_MAX_WORKERS) as executor:
+            return list(executor.map(lambda symbol: self._cached_call(fetch, symbol), symbols))
+            
+    @staticmethod
+    def _bulk_insert(session: Session, model, rows: List[Dict[str, Any]], **shared: Any) -> None:
+        """用一条executemany语句批量插入多行数据
+        
+        Args:
+            session: 数据库会话
+            model: 数据模型
+            rows: 行数据
+            **shared: 所有行取值相同的列，如本批次的更新时间，只绑定一次
+        """
+        if rows:
+            session.execute(insert(model).values(**shared), rows)
+            
+    @staticmethod
+    def _recent_by_item(session: Session, model, item_ids: List[int], limit: int) -> Dict[int, List[Any]]:
+        """用一条窗口函数查询取出每个物品最新的若干行记录
+        
+        Args:
+            session: 数据库会话
+            model: 带item_id和timestamp列的数据模型
+            item_ids: 物品ID列表
+            limit: 每个物品最多取出的行数
+            
+        Returns:
+            Dict[int, List[Any]]: 物品ID到记录列表的映射，按时间从新到旧排列
+        """
+        recent = {}
+        if not item_ids:
+            return recent
+            
+        row_number = func.row_number().over(
+            partition_by=model.item_id,
+            order_by=(model.timestamp.desc(), model.id.desc())
+        ).label('row_number')
+        ranked = select(model.id, row_number).where(model.item_id.in_(item_ids)).subquery()
+        rows = session.scalars(
+            select(model)
+            .join(ranked, model.id == ranked.c.id)
+            .where(ranked.c.row_number <= limit)
+            .order_by(model.item_id, ranked.c.row_number)
+        )
+        for row in rows:
+            recent.setdefault(row.item_id, []).append(row)
+        return recent
+        
+    @classmethod
+    def _latest_by_item(cls, session: Session, model, item_ids: List[int]) -> Dict[int, Any]:
+        """取出每个物品最新的一行记录
+        
+        Args:
+            session: 数据库会话
+            model: 带item_id和timestamp列的数据模型
+            item_ids: 物品ID列表
+            
+        Returns:
+            Dict[int, Any]: 物品ID到最新记录的映射
+        """
+        recent = cls._recent_by_item(session, model, item_ids, limit=1)
+        return {item_id: rows[0] for item_id, rows in recent.items()}
+        
+    @staticmethod
+    def _recent_average_prices(session: Session, item_ids: List[int], limit: int = 30) -> Dict[int, float]:
+        """在数据库中计算每个物品最近若干条价格的均值
+        
+        Args:
+            session: 数据库会话
+            item_ids: 物品ID列表
+            limit: 参与平均的最近价格条数
+            
+        Returns:
+            Dict[int, float]: 物品ID到均价的映射
+        """
+        if not item_ids:
+            return {}
+            
+        row_number = func.row_number().over(
+            partition_by=Price.item_id,
+            order_by=(Price.timestamp.desc(), Price.id.desc())
+        ).label('row_number')
+        ranked = select(Price.item_id, Price.price, row_number)\
+            .where(Price.item_id.in_(item_ids))\
+            .subquery()
+        rows = session.execute(
+            select(ranked.c.item_id, func.avg(ranked.c.price))
+            .where(ranked.c.row_number <= limit)
+            .group_by(ranked.c.item_id)
+        )
+        return {item_id: avg_price for item_id, avg_price in rows}
+        
     def update_currency_data(self):
         """更新货币数据"""
         logger.info("开始更新货币数据...")
@@ -42,42 +184,44 @@ class DataUpdater:
                 currencies = session.query(Item).filter_by(type=ItemType.CURRENCY.value).all()
                 
                 # 从IMF获取汇率数据
-                rates_data = self.imf_api.get_exchange_rates()
+                rates_data = self._cached_call(self.imf_api.get_exchange_rates)
                 
+                # 先收集所有行，最后批量插入
+                now = datetime.now()
+                price_rows = []
+                log_rows = []
                 for currency in currencies:
                     if currency.symbol in rates_data:
                         rate = rates_data[currency.symbol]
                         
                         # 添加价格数据
-                        price = Price(
-                            item_id=currency.id,
-                            price=rate,
-                            timestamp=datetime.now(),
-                            source=DataSource.IMF.value,
-                            confidence=0.95,
-                            metadata={
+                        price_rows.append({
+                            'item_id': currency.id,
+                            'price': rate,
+                            'source': DataSource.IMF.value,
+                            'confidence': 0.95,
+                            'price_metadata': {
                                 'base_currency': 'USD',
                                 'rate_type': 'spot'
                             }
-                        )
-                        session.add(price)
+                        })
                         
                         # 记录更新日志
-                        log = DataUpdateLog(
-                            item_id=currency.id,
-                            update_type='price',
-                            status='success',
-                            timestamp=datetime.now(),
-                            source=DataSource.IMF.value,
-                            metadata={
+                        log_rows.append({
+                            'data_type': 'price',
+                            'source': DataSource.IMF.value,
+                            'status': 'success',
+                            'log_metadata': {
+                                'item_id': currency.id,
                                 'rate': rate,
                                 'base_currency': 'USD'
                             }
-                        )
-                        session.add(log)
+                        })
                         
                         logger.info(f"更新{currency.symbol}汇率: {rate}")
                 
+                self._bulk_insert(session, Price, price_rows, timestamp=now)
+                self._bulk_insert(session, DataUpdateLog, log_rows, start_time=now)
                 session.commit()
                 logger.info("货币数据更新完成")
                 
@@ -94,66 +238,69 @@ class DataUpdater:
                 # 获取所有加密货币
                 cryptos = session.query(Item).filter_by(type=ItemType.CRYPTO.value).all()
                 
-                # 从CoinGecko获取数据
-                for crypto in cryptos:
-                    data = self.coingecko_api.get_crypto_data(crypto.symbol.lower())
-                    
+                # 从CoinGecko获取数据，先收集所有行，最后批量插入
+                now = datetime.now()
+                price_rows = []
+                market_rows = []
+                log_rows = []
+                results = self._fetch_all(
+                    self.coingecko_api.get_crypto_data,
+                    [crypto.symbol.lower() for crypto in cryptos]
+                )
+                for crypto, data in zip(cryptos, results):
                     if data:
                         # 添加价格数据
-                        price = Price(
-                            item_id=crypto.id,
-                            price=data['price'],
-                            open_price=data['open'],
-                            high_price=data['high'],
-                            low_price=data['low'],
-                            close_price=data['close'],
-                            volume=data['volume'],
-                            timestamp=datetime.now(),
-                            source=DataSource.COINGECKO.value,
-                            confidence=0.95,
-                            metadata={
+                        price_rows.append({
+                            'item_id': crypto.id,
+                            'price': data['price'],
+                            'open_price': data['open'],
+                            'high_price': data['high'],
+                            'low_price': data['low'],
+                            'close_price': data['close'],
+                            'volume': data['volume'],
+                            'source': DataSource.COINGECKO.value,
+                            'confidence': 0.95,
+                            'price_metadata': {
                                 'market_cap': data['market_cap'],
                                 'price_change_24h': data['price_change_24h']
                             }
-                        )
-                        session.add(price)
+                        })
                         
                         # 添加市场数据
-                        market_data = MarketData(
-                            item_id=crypto.id,
-                            market_type=MarketType.CRYPTO.value,
-                            timestamp=datetime.now(),
-                            volume_24h=data['volume'],
-                            market_cap=data['market_cap'],
-                            circulating_supply=data['circulating_supply'],
-                            total_supply=data['total_supply'],
-                            max_supply=data['max_supply'],
-                            source=DataSource.COINGECKO.value,
-                            confidence=0.95,
-                            metadata={
+                        market_rows.append({
+                            'item_id': crypto.id,
+                            'market_type': MarketType.CRYPTO.value,
+                            'volume_24h': data['volume'],
+                            'market_cap': data['market_cap'],
+                            'circulating_supply': data['circulating_supply'],
+                            'total_supply': data['total_supply'],
+                            'max_supply': data['max_supply'],
+                            'source': DataSource.COINGECKO.value,
+                            'confidence': 0.95,
+                            'market_metadata': {
                                 'price_change_24h': data['price_change_24h'],
                                 'market_cap_rank': data['market_cap_rank']
                             }
-                        )
-                        session.add(market_data)
+                        })
                         
                         # 记录更新日志
-                        log = DataUpdateLog(
-                            item_id=crypto.id,
-                            update_type='price_and_market',
-                            status='success',
-                            timestamp=datetime.now(),
-                            source=DataSource.COINGECKO.value,
-                            metadata={
+                        log_rows.append({
+                            'data_type': 'price_and_market',
+                            'source': DataSource.COINGECKO.value,
+                            'status': 'success',
+                            'log_metadata': {
+                                'item_id': crypto.id,
                                 'price': data['price'],
                                 'volume': data['volume'],
                                 'market_cap': data['market_cap']
                             }
-                        )
-                        session.add(log)
+                        })
                         
                         logger.info(f"更新{crypto.symbol}数据: 价格={data['price']}, 市值={data['market_cap']}")
                 
+                self._bulk_insert(session, Price, price_rows, timestamp=now)
+                self._bulk_insert(session, MarketData, market_rows, timestamp=now)
+                self._bulk_insert(session, DataUpdateLog, log_rows, start_time=now)
                 session.commit()
                 logger.info("加密货币数据更新完成")
                 
@@ -170,46 +317,49 @@ class DataUpdater:
                 # 获取所有大宗商品
                 commodities = session.query(Item).filter_by(type=ItemType.COMMODITY.value).all()
                 
-                # 从Alpha Vantage获取数据
-                for commodity in commodities:
-                    data = self.alphavantage_api.get_commodity_data(commodity.symbol)
-                    
+                # 从Alpha Vantage获取数据，先收集所有行，最后批量插入
+                now = datetime.now()
+                price_rows = []
+                log_rows = []
+                results = self._fetch_all(
+                    self.alphavantage_api.get_commodity_data,
+                    [commodity.symbol for commodity in commodities]
+                )
+                for commodity, data in zip(commodities, results):
                     if data:
                         # 添加价格数据
-                        price = Price(
-                            item_id=commodity.id,
-                            price=data['price'],
-                            open_price=data['open'],
-                            high_price=data['high'],
-                            low_price=data['low'],
-                            close_price=data['close'],
-                            volume=data['volume'],
-                            timestamp=datetime.now(),
-                            source=DataSource.ALPHA_VANTAGE.value,
-                            confidence=0.95,
-                            metadata={
+                        price_rows.append({
+                            'item_id': commodity.id,
+                            'price': data['price'],
+                            'open_price': data['open'],
+                            'high_price': data['high'],
+                            'low_price': data['low'],
+                            'close_price': data['close'],
+                            'volume': data['volume'],
+                            'source': DataSource.ALPHA_VANTAGE.value,
+                            'confidence': 0.95,
+                            'price_metadata': {
                                 'unit': data['unit'],
                                 'exchange': data['exchange']
                             }
-                        )
-                        session.add(price)
+                        })
                         
                         # 记录更新日志
-                        log = DataUpdateLog(
-                            item_id=commodity.id,
-                            update_type='price',
-                            status='success',
-                            timestamp=datetime.now(),
-                            source=DataSource.ALPHA_VANTAGE.value,
-                            metadata={
+                        log_rows.append({
+                            'data_type': 'price',
+                            'source': DataSource.ALPHA_VANTAGE.value,
+                            'status': 'success',
+                            'log_metadata': {
+                                'item_id': commodity.id,
                                 'price': data['price'],
                                 'unit': data['unit']
                             }
-                        )
-                        session.add(log)
+                        })
                         
                         logger.info(f"更新{commodity.symbol}数据: 价格={data['price']} {data['unit']}")
                 
+                self._bulk_insert(session, Price, price_rows, timestamp=now)
+                self._bulk_insert(session, DataUpdateLog, log_rows, start_time=now)
                 session.commit()
                 logger.info("大宗商品数据更新完成")
                 
@@ -226,64 +376,67 @@ class DataUpdater:
                 # 获取所有股票
                 stocks = session.query(Item).filter_by(type=ItemType.STOCK.value).all()
                 
-                # 从Alpha Vantage获取数据
-                for stock in stocks:
-                    data = self.alphavantage_api.get_stock_data(stock.symbol)
-                    
+                # 从Alpha Vantage获取数据，先收集所有行，最后批量插入
+                now = datetime.now()
+                price_rows = []
+                market_rows = []
+                log_rows = []
+                results = self._fetch_all(
+                    self.alphavantage_api.get_stock_data,
+                    [stock.symbol for stock in stocks]
+                )
+                for stock, data in zip(stocks, results):
                     if data:
                         # 添加价格数据
-                        price = Price(
-                            item_id=stock.id,
-                            price=data['price'],
-                            open_price=data['open'],
-                            high_price=data['high'],
-                            low_price=data['low'],
-                            close_price=data['close'],
-                            volume=data['volume'],
-                            timestamp=datetime.now(),
-                            source=DataSource.ALPHA_VANTAGE.value,
-                            confidence=0.95,
-                            metadata={
+                        price_rows.append({
+                            'item_id': stock.id,
+                            'price': data['price'],
+                            'open_price': data['open'],
+                            'high_price': data['high'],
+                            'low_price': data['low'],
+                            'close_price': data['close'],
+                            'volume': data['volume'],
+                            'source': DataSource.ALPHA_VANTAGE.value,
+                            'confidence': 0.95,
+                            'price_metadata': {
                                 'pe_ratio': data['pe_ratio'],
                                 'dividend_yield': data['dividend_yield']
                             }
-                        )
-                        session.add(price)
+                        })
                         
                         # 添加市场数据
-                        market_data = MarketData(
-                            item_id=stock.id,
-                            market_type=MarketType.STOCK.value,
-                            timestamp=datetime.now(),
-                            volume_24h=data['volume'],
-                            market_cap=data['market_cap'],
-                            source=DataSource.ALPHA_VANTAGE.value,
-                            confidence=0.95,
-                            metadata={
+                        market_rows.append({
+                            'item_id': stock.id,
+                            'market_type': MarketType.STOCK.value,
+                            'volume_24h': data['volume'],
+                            'market_cap': data['market_cap'],
+                            'source': DataSource.ALPHA_VANTAGE.value,
+                            'confidence': 0.95,
+                            'market_metadata': {
                                 'pe_ratio': data['pe_ratio'],
                                 'dividend_yield': data['dividend_yield'],
                                 'sector': data['sector']
                             }
-                        )
-                        session.add(market_data)
+                        })
                         
                         # 记录更新日志
-                        log = DataUpdateLog(
-                            item_id=stock.id,
-                            update_type='price_and_market',
-                            status='success',
-                            timestamp=datetime.now(),
-                            source=DataSource.ALPHA_VANTAGE.value,
-                            metadata={
+                        log_rows.append({
+                            'data_type': 'price_and_market',
+                            'source': DataSource.ALPHA_VANTAGE.value,
+                            'status': 'success',
+                            'log_metadata': {
+                                'item_id': stock.id,
                                 'price': data['price'],
                                 'volume': data['volume'],
                                 'market_cap': data['market_cap']
                             }
-                        )
-                        session.add(log)
+                        })
                         
                         logger.info(f"更新{stock.symbol}数据: 价格={data['price']}, 市值={data['market_cap']}")
                 
+                self._bulk_insert(session, Price, price_rows, timestamp=now)
+                self._bulk_insert(session, MarketData, market_rows, timestamp=now)
+                self._bulk_insert(session, DataUpdateLog, log_rows, start_time=now)
                 session.commit()
                 logger.info("股票数据更新完成")
                 
@@ -300,47 +453,58 @@ class DataUpdater:
                 # 获取所有非SVU物品
                 items = session.query(Item).filter(Item.type != ItemType.SVU.value).all()
                 
-                for item in items:
-                    # 获取最新的价格数据
-                    latest_price = session.query(Price)\
-                        .filter_by(item_id=item.id)\
-                        .order_by(Price.timestamp.desc())\
-                        .first()
-                        
-                    if latest_price:
-                        # 计算SVU价值
-                        svu_value = self.calculate_svu_value(item, latest_price)
-                        
-                        # 添加SVU价值数据
-                        value = SVUValue(
-                            item_id=item.id,
-                            svu_value=svu_value,
-                            timestamp=datetime.now(),
-                            confidence=0.9,
-                            calculation_method='weighted_average',
-                            metadata={
-                                'price_id': latest_price.id,
-                                'base_value': 100
-                            }
-                        )
-                        session.add(value)
-                        
-                        # 记录更新日志
-                        log = DataUpdateLog(
-                            item_id=item.id,
-                            update_type='svu_value',
-                            status='success',
-                            timestamp=datetime.now(),
-                            source=DataSource.CUSTOM.value,
-                            metadata={
-                                'svu_value': svu_value,
-                                'price_id': latest_price.id
-                            }
-                        )
-                        session.add(log)
-                        
-                        logger.info(f"更新{item.symbol}的SVU价值: {svu_value}")
+                # 一次查出所有物品的最新价格，加密货币的最新市场数据和大宗商品的30条均价也预先取出
+                latest_prices = self._latest_by_item(session, Price, [item.id for item in items])
+                latest_market_data = self._latest_by_item(
+                    session, MarketData,
+                    [item.id for item in items if item.type == ItemType.CRYPTO.value]
+                )
+                avg_prices = self._recent_average_prices(
+                    session,
+                    [item.id for item in items if item.type == ItemType.COMMODITY.value]
+                )
+                
+                # 只处理有价格数据的物品，一次计算所有物品的SVU价值
+                priced_items = [item for item in items if item.id in latest_prices]
+                svu_values = self.calculate_svu_values(
+                    priced_items, latest_prices, latest_market_data, avg_prices
+                ).tolist()
                 
+                # 先收集所有行，最后批量插入
+                now = datetime.now()
+                svu_rows = []
+                log_rows = []
+                for item, svu_value in zip(priced_items, svu_values):
+                    latest_price = latest_prices[item.id]
+                    
+                    # 添加SVU价值数据
+                    svu_rows.append({
+                        'item_id': item.id,
+                        'svu_value': svu_value,
+                        'confidence': 0.9,
+                        'calculation_method': 'weighted_average',
+                        'svu_metadata': {
+                            'price_id': latest_price.id,
+                            'base_value': 100
+                        }
+                    })
+                    
+                    # 记录更新日志
+                    log_rows.append({
+                        'data_type': 'svu_value',
+                        'source': DataSource.CUSTOM.value,
+                        'status': 'success',
+                        'log_metadata': {
+                            'item_id': item.id,
+                            'svu_value': svu_value,
+                            'price_id': latest_price.id
+                        }
+                    })
+                    
+                    logger.info(f"更新{item.symbol}的SVU价值: {svu_value}")
+                
+                self._bulk_insert(session, SVUValue, svu_rows, timestamp=now)
+                self._bulk_insert(session, DataUpdateLog, log_rows, start_time=now)
                 session.commit()
                 logger.info("SVU价值数据更新完成")
                 
@@ -348,40 +512,49 @@ class DataUpdater:
             logger.error(f"更新SVU价值数据失败: {str(e)}")
             raise
             
-    def calculate_svu_value(self, item: Item, price: Price) -> float:
-        """计算SVU价值"""
+    def calculate_svu_values(self, items: List[Item],
+                             latest_prices: Dict[int, Price],
+                             market_data_by_item: Dict[int, MarketData],
+                             avg_price_by_item: Dict[int, float]) -> np.ndarray:
+        """按物品类型用布尔掩码批量计算SVU价值
+        
+        Args:
+            items: 有最新价格的物品
+            latest_prices: 物品ID到最新价格的映射
+            market_data_by_item: 物品ID到最新市场数据的映射
+            avg_price_by_item: 物品ID到最近30条价格均值的映射
+            
+        Returns:
+            np.ndarray: 与items顺序一致的SVU价值
+        """
         # 这里实现SVU价值计算逻辑
         # 目前使用简单的加权平均方法
         base_value = 100  # SVU基准值
         
-        if item.type == ItemType.CURRENCY.value:
-            # 货币的SVU价值基于汇率
-            return base_value * price.price
-        elif item.type == ItemType.CRYPTO.value:
-            # 加密货币的SVU价值基于市值
-            market_data = session.query(MarketData)\
-                .filter_by(item_id=item.id)\
-                .order_by(MarketData.timestamp.desc())\
-                .first()
-            if market_data and market_data.market_cap:
-                return base_value * (price.price / market_data.market_cap)
-        elif item.type == ItemType.STOCK.value:
-            # 股票的SVU价值基于市盈率
-            if price.metadata and 'pe_ratio' in price.metadata:
-                return base_value * (price.price / price.metadata['pe_ratio'])
-        elif item.type == ItemType.COMMODITY.value:
-            # 大宗商品的SVU价值基于历史价格
-            historical_prices = session.query(Price)\
-                .filter_by(item_id=item.id)\
-                .order_by(Price.timestamp.desc())\
-                .limit(30)\
-                .all()
-            if historical_prices:
-                avg_price = sum(p.price for p in historical_prices) / len(historical_prices)
-                return base_value * (price.price / avg_price)
-                
-        # 默认返回基准值
-        return base_value
+        types = np.array([item.type for item in items], dtype=object)
+        prices = np.array([latest_prices[item.id].price for item in items], dtype=np.float64)
+        # 各类型计算所需的分母，缺失时为NaN
+        market_caps = np.array([getattr(market_data_by_item.get(item.id), 'market_cap', None)
+                                for item in items], dtype=np.float64)
+        pe_ratios = np.array([(latest_prices[item.id].price_metadata or {}).get('pe_ratio')
+                              for item in items], dtype=np.float64)
+        avg_prices = np.array([avg_price_by_item.get(item.id) for item in items], dtype=np.float64)
+        
+        # 默认取基准值
+        svu_values = np.full(len(items), float(base_value))
+        
+        # 货币的SVU价值基于汇率
+        is_currency = types == ItemType.CURRENCY.value
+        svu_values[is_currency] = base_value * prices[is_currency]
+        
+        # 加密货币基于市值，股票基于市盈率，大宗商品基于历史均价，分母缺失或为0时保持基准值
+        for item_type, denominators in ((ItemType.CRYPTO.value, market_caps),
+                                        (ItemType.STOCK.value, pe_ratios),
+                                        (ItemType.COMMODITY.value, avg_prices)):
+            mask = (types == item_type) & np.isfinite(denominators) & (denominators != 0)
+            svu_values[mask] = base_value * (prices[mask] / denominators[mask])
+            
+        return svu_values
         
     def schedule_updates(self):
         """设置定时更新"""
@@ -5,6 +5,7 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from utils.visualizer import DataVisualizer
 from utils.data_collector import DataCollector
 from utils.data_processor import DataProcessor
+import numpy as np
 import pandas as pd
 from datetime import datetime, timedelta
 
@@ -29,19 +30,15 @@ def main():
     
     # 货币汇率数据
     currency_rates = collector.get_currency_rates()
-    currency_data = pd.DataFrame({
-        'currency': list(currency_rates.keys()),
-        'rate': list(currency_rates.values()),
-        'date': datetime.now()
-    })
+    currency_data = pd.DataFrame.from_dict(currency_rates, orient='index', columns=['rate'], dtype=np.float32)\
+        .rename_axis('currency').reset_index().astype({'currency': 'category'})
+    currency_data['date'] = pd.Timestamp.now()
     
     # 加密货币价格数据
     crypto_prices = collector.get_crypto_prices()
-    crypto_data = pd.DataFrame({
-        'symbol': list(crypto_prices.keys()),
-        'price': list(crypto_prices.values()),
-        'date': datetime.now()
-    })
+    crypto_data = pd.DataFrame.from_dict(crypto_prices, orient='index', columns=['price'], dtype=np.float32)\
+        .rename_axis('symbol').reset_index().astype({'symbol': 'category'})
+    crypto_data['date'] = pd.Timestamp.now()
     
     # 生成可视化图表
     print("\n正在生成图表...")
@@ -0,0 +1,48 @@
+from datetime import datetime
+
+import networkx as nx
+import pytest
+from sqlalchemy import create_engine, update
+from sqlalchemy.orm import Session
+
+from models.database import Base, Item, ExchangeRate
+from models.graph_structure import ValueGraph
+
+START = datetime(2024, 1, 1)
+END = datetime(2024, 12, 31)
+
+@pytest.fixture
+def session():
+    engine = create_engine('sqlite://')
+    Base.metadata.create_all(engine)
+    with Session(engine) as session:
+        session.add_all([Item(id=i, name=f'item{i}', symbol=f'S{i}', type='currency') for i in range(1, 5)])
+        session.add_all([
+            ExchangeRate(source_item_id=source, target_item_id=target, rate=rate,
+                         timestamp=datetime(2024, 6, 1), confidence=1.0)
+            for source, target, rate in [(1, 2, 5.0), (3, 2, 4.0), (4, 2, 3.0), (1, 3, 1.0), (2, 4, 1.0)]
+        ])
+        session.commit()
+        yield session
+
+def expected_central_nodes(graph: nx.DiGraph, top_n: int):
+    scores = nx.pagerank(graph, weight='weight')
+    return sorted(scores.items(), key=lambda item: item[1], reverse=True)[:top_n]
+
+def test_rebuild_uses_new_weights(session):
+    graph = ValueGraph(session)
+    graph.build_graph(START, END)
+    first = graph.get_central_nodes(top_n=3)
+    assert [node for node, _ in first] == [node for node, _ in expected_central_nodes(graph.graph, 3)]
+
+    # 改变权重后重建，中心节点必须按新图计算
+    session.execute(update(ExchangeRate).where(ExchangeRate.target_item_id == 2).values(rate=0.1))
+    session.execute(update(ExchangeRate).where(ExchangeRate.target_item_id == 3).values(rate=10.0))
+    session.commit()
+    graph.build_graph(START, END)
+
+    rebuilt = graph.get_central_nodes(top_n=3)
+    expected = expected_central_nodes(graph.graph, 3)
+    assert [node for node, _ in rebuilt] == [node for node, _ in expected]
+    for (_, score), (_, expected_score) in zip(rebuilt, expected):
+        assert score == pytest.approx(expected_score, abs=1e-4)
@@ -0,0 +1,75 @@
+"""备份索引
+
+每次创建备份时在备份目录下的index.jsonl末尾追加一行{type, path, timestamp}记录，
+列出备份时只读取最近的若干条记录，不再逐个扫描和stat备份目录中的文件。
+"""
+import json
+import threading
+from collections import deque
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+
+INDEX_FILENAME = 'index.jsonl'
+
+# 备份脚本会在多个线程中同时追加记录
+_index_lock = threading.Lock()
+
+def append_backup_record(backup_dir: Path, backup_type: str, path: Path) -> None:
+    """在备份索引末尾追加一条记录
+
+    Args:
+        backup_dir: 备份目录
+        backup_type: 备份类型，如database、config、data、parquet
+        path: 备份文件或目录路径
+    """
+    record = {
+        'type': backup_type,
+        'path': str(path),
+        'timestamp': datetime.now().isoformat()
+    }
+    with _index_lock, open(Path(backup_dir) / INDEX_FILENAME, 'a', encoding='utf-8') as f:
+        f.write(json.dumps(record, ensure_ascii=False) + '\n')
+
+def read_backup_records(backup_dir: Path, limit: int = 1000) -> Optional[List[Dict]]:
+    """读取备份索引中最近的记录，按追加顺序返回
+
+    Args:
+        backup_dir: 备份目录
+        limit: 最多读取的记录数
+
+    Returns:
+        Optional[List[Dict]]: 备份记录，timestamp已转换为datetime；索引不存在时返回None
+    """
+    index_file = Path(backup_dir) / INDEX_FILENAME
+    if not index_file.exists():
+        return None
+
+    with open(index_file, 'r', encoding='utf-8') as f:
+        lines = deque(f, maxlen=limit)
+
+    records = []
+    for line in lines:
+        line = line.strip()
+        if not line:
+            continue
+        record = json.loads(line)
+        record['path'] = Path(record['path'])
+        record['timestamp'] = datetime.fromisoformat(record['timestamp'])
+        records.append(record)
+    return records
+
+def compact_backup_index(backup_dir: Path) -> None:
+    """重写备份索引，去掉对应备份已被删除的记录
+
+    Args:
+        backup_dir: 备份目录
+    """
+    index_file = Path(backup_dir) / INDEX_FILENAME
+    with _index_lock:
+        if not index_file.exists():
+            return
+        with open(index_file, 'r', encoding='utf-8') as f:
+            lines = [line for line in f if line.strip() and Path(json.loads(line)['path']).exists()]
+        with open(index_file, 'w', encoding='utf-8') as f:
+            f.writelines(lines)
@@ -0,0 +1,45 @@
+"""配置文件加载
+
+同一个配置文件会被管理器和各个管道重复加载，这里按(绝对路径, 修改时间)缓存解析结果，
+文件未修改时只解析一次，修改后自动重新解析。返回的字典在各调用方之间共享，调用方不应修改。
+"""
+import os
+import logging
+from functools import lru_cache
+import yaml
+
+try:
+    # libyaml的C实现比纯Python的SafeLoader快一个数量级
+    from yaml import CSafeLoader as SafeLoader
+except ImportError:
+    from yaml import SafeLoader
+
+logger = logging.getLogger(__name__)
+
+@lru_cache(maxsize=16)
+def _load_config_cached(abs_path: str, mtime: float) -> dict:
+    """解析配置文件
+
+    Args:
+        abs_path: 配置文件绝对路径
+        mtime: 配置文件修改时间，作为缓存键的一部分
+
+    Returns:
+        dict: 配置信息
+    """
+    # 只有缓存未命中时才会执行到这里
+    logger.info(f"解析配置文件: {abs_path}")
+    with open(abs_path, 'rb') as f:
+        return yaml.load(f, Loader=SafeLoader) or {}
+
+def load_config(config_path: str) -> dict:
+    """加载配置文件，文件未修改时直接返回缓存的结果
+
+    Args:
+        config_path: 配置文件路径
+
+    Returns:
+        dict: 配置信息
+    """
+    abs_path = os.path.abspath(config_path)
+    return _load_config_cached(abs_path, os.path.getmtime(abs_path))
@@ -1,96 +1,208 @@
 import requests
+import numpy as np
 import pandas as pd
-from typing import Dict, List, Optional, Tuple
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple, Union
 from datetime import datetime, timedelta
+import csv
 import os
 from dotenv import load_dotenv
+from sqlalchemy import event, insert, select
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from sqlalchemy.orm import Session
-from models.database import Item, Price, ExchangeRate, init_db
+from models.database import Item, Price, ExchangeRate, init_db, use_explicit_begin
 import logging
 
 logger = logging.getLogger(__name__)
 
+@dataclass(frozen=True)
+class ApiKeys:
+    """各数据源的API密钥，只读，可在多个采集器之间共享"""
+    
+    fred: Optional[str] = None
+    coingecko: Optional[str] = None
+    alpha_vantage: Optional[str] = None
+    yahoo_finance: Optional[str] = None
+
+@lru_cache(maxsize=1)
+def _api_keys() -> ApiKeys:
+    """读取API密钥，.env和环境变量在进程内只解析一次
+    
+    Returns:
+        ApiKeys: API密钥
+    """
+    load_dotenv()
+    return ApiKeys(
+        fred=os.getenv('FRED_API_KEY'),
+        coingecko=os.getenv('COINGECKO_API_KEY'),
+        alpha_vantage=os.getenv('ALPHA_VANTAGE_API_KEY'),
+        yahoo_finance=os.getenv('YAHOO_FINANCE_API_KEY')
+    )
+
+# 历史价格的输出列
+HISTORICAL_COLUMNS = ['date', 'price', 'source', 'confidence']
+
+# 流式读取历史价格时每批从游标取出的行数
+HISTORICAL_YIELD_PER = 1000
+
+# 返回给调用方的DataFrame中按float32存储的列
+FLOAT32_COLUMNS = ('price', 'confidence')
+
+def _downcast_float32(df: pd.DataFrame) -> pd.DataFrame:
+    """将价格和置信度列转换为float32
+    
+    float32约有7位有效数字，足够分析使用，但不足以无损往返数据库中的float64值。
+    返回的DataFrame仅用于计算和展示，不应再写回数据库；需要原始精度时直接查询数据库。
+    pd.to_numeric(downcast='float')在会损失精度时保留float64，因此这里显式转换。
+    
+    Args:
+        df: 历史价格DataFrame
+        
+    Returns:
+        pd.DataFrame: 转换后的DataFrame
+    """
+    return df.astype({col: np.float32 for col in FLOAT32_COLUMNS if col in df.columns})
+
 class DataCollector:
     """数据采集类，用于从多个数据源获取数据"""
     
     def __init__(self, db_url: str = 'sqlite:///svu_data.db'):
-        load_dotenv()  # 加载环境变量
-        self.api_keys = {
-            'fred': os.getenv('FRED_API_KEY'),
-            'coingecko': os.getenv('COINGECKO_API_KEY'),
-            'alpha_vantage': os.getenv('ALPHA_VANTAGE_API_KEY'),
-            'yahoo_finance': os.getenv('YAHOO_FINANCE_API_KEY')
-        }
-        self.engine = init_db(db_url)
+        self.api_keys = _api_keys()
+        # 保存点依赖显式BEGIN，否则pysqlite下第一个保存点释放时就已提交
+        self.engine = use_explicit_begin(init_db(db_url))
+        # 物品代码到ID的映射，首次使用时一次性从数据库加载
+        self._item_ids: Optional[Dict[str, int]] = None
+        # 绑定方法每次取值都是新对象，保存一份以便判断是否已注册到外部会话
+        self._reset_item_ids_on_rollback = self._reset_item_ids
+        
+    def _reset_item_ids(self, session: Session, *args) -> None:
+        """会话回滚后映射中可能有未落库的ID，下次使用时重新加载"""
+        self._item_ids = None
+        
+    @contextmanager
+    def _session_scope(self, session: Optional[Session] = None) -> Iterator[Session]:
+        """提供会话，传入外部会话时由调用方负责提交
+        
+        新建的会话在提交后不使对象过期，返回给调用方的对象在会话关闭后仍可访问
+        
+        Args:
+            session: 外部会话
+            
+        Returns:
+            Iterator[Session]: 数据库会话
+        """
+        if session is not None:
+            # 外部会话由调用方回滚，回滚时同样需要丢弃映射
+            if not event.contains(session, 'after_rollback', self._reset_item_ids_on_rollback):
+                event.listen(session, 'after_rollback', self._reset_item_ids_on_rollback)
+            yield session
+            return
+            
+        with Session(self.engine, expire_on_commit=False) as new_session:
+            try:
+                yield new_session
+                new_session.commit()
+            except Exception:
+                # 回滚后映射中可能有未落库的ID，下次使用时重新加载
+                self._item_ids = None
+                raise
+        
+    def initialize_data(self, session: Optional[Session] = None):
+        """初始化基础数据，所有步骤共用一个会话并只提交一次，每个步骤使用一个保存点，出错时只回滚该步骤
         
-    def initialize_data(self):
-        """初始化基础数据"""
+        Args:
+            session: 外部会话，不传时使用新会话并在结束时提交
+        """
         logger.info("开始初始化基础数据...")
         
-        # 添加基础货币
-        currencies = [
-            ('US Dollar', 'USD', 'currency', '美元'),
-            ('Euro', 'EUR', 'currency', '欧元'),
-            ('British Pound', 'GBP', 'currency', '英镑'),
-            ('Japanese Yen', 'JPY', 'currency', '日元'),
-            ('Chinese Yuan', 'CNY', 'currency', '人民币')
-        ]
-        
-        # 添加加密货币
-        cryptos = [
-            ('Bitcoin', 'BTC', 'crypto', '比特币'),
-            ('Ethereum', 'ETH', 'crypto', '以太坊')
-        ]
-        
-        # 添加商品
-        commodities = [
-            ('Gold', 'XAU', 'commodity', '黄金'),
-            ('Silver', 'XAG', 'commodity', '白银')
-        ]
-        
-        # 添加SVU
-        svu = [('SVU', 'SVU', 'svu', 'SVU价值单位')]
-        
-        # 添加所有物品
-        all_items = currencies + cryptos + commodities + svu
-        for name, symbol, type_, desc in all_items:
+        with self._session_scope(session) as session:
+            # 添加基础货币
+            currencies = [
+                ('US Dollar', 'USD', 'currency', '美元'),
+                ('Euro', 'EUR', 'currency', '欧元'),
+                ('British Pound', 'GBP', 'currency', '英镑'),
+                ('Japanese Yen', 'JPY', 'currency', '日元'),
+                ('Chinese Yuan', 'CNY', 'currency', '人民币')
+            ]
+        
+            # 添加加密货币
+            cryptos = [
+                ('Bitcoin', 'BTC', 'crypto', '比特币'),
+                ('Ethereum', 'ETH', 'crypto', '以太坊')
+            ]
+        
+            # 添加商品
+            commodities = [
+                ('Gold', 'XAU', 'commodity', '黄金'),
+                ('Silver', 'XAG', 'commodity', '白银')
+            ]
+        
+            # 添加SVU
+            svu = [('SVU', 'SVU', 'svu', 'SVU价值单位')]
+        
+            # 一条语句插入所有物品，已存在的代码由symbol唯一索引跳过
+            all_items = currencies + cryptos + commodities + svu
             try:
-                self.add_item(name, symbol, type_, desc)
-                logger.info(f"添加物品: {symbol}")
+                with session.begin_nested():
+                    self._add_items(session, [
+                        {'name': name, 'symbol': symbol, 'type': type_, 'description': desc}
+                        for name, symbol, type_, desc in all_items
+                    ])
             except Exception as e:
-                logger.error(f"添加物品{symbol}时出错: {str(e)}")
+                self._item_ids = None
+                logger.error(f"添加物品时出错: {str(e)}")
         
-        # 添加一些示例价格数据
-        end_date = datetime.now()
-        start_date = end_date - timedelta(days=365)
+            # 添加一些示例价格数据
+            end_date = datetime.now()
+            start_date = end_date - timedelta(days=365)
+            
+            # 三个数据源的请求互不依赖，并发发出后再依次写入数据库
+            with ThreadPoolExecutor(max_workers=3) as executor:
+                gold_future = executor.submit(
+                    self._fetch_gold_price,
+                    start_date.strftime('%Y-%m-%d'),
+                    end_date.strftime('%Y-%m-%d')
+                )
+                rates_future = executor.submit(self._fetch_currency_rates)
+                crypto_future = executor.submit(self._fetch_crypto_prices)
         
-        # 获取并保存黄金价格
-        try:
-            gold_data = self.get_gold_price(
-                start_date.strftime('%Y-%m-%d'),
-                end_date.strftime('%Y-%m-%d')
-            )
-            logger.info(f"添加了{len(gold_data)}条黄金价格数据")
-        except Exception as e:
-            logger.error(f"获取黄金价格时出错: {str(e)}")
-        
-        # 获取并保存货币汇率
-        try:
-            rates = self.get_currency_rates()
-            logger.info(f"添加了{len(rates)}个货币汇率")
-        except Exception as e:
-            logger.error(f"获取货币汇率时出错: {str(e)}")
-        
-        # 获取并保存加密货币价格
-        try:
-            crypto_prices = self.get_crypto_prices()
-            logger.info(f"添加了{len(crypto_prices)}个加密货币价格")
-        except Exception as e:
-            logger.error(f"获取加密货币价格时出错: {str(e)}")
+            # 保存黄金价格
+            try:
+                gold_data = gold_future.result()
+                with session.begin_nested():
+                    self._save_gold_price(gold_data, session=session)
+                logger.info(f"添加了{len(gold_data)}条黄金价格数据")
+            except Exception as e:
+                self._item_ids = None
+                logger.error(f"获取黄金价格时出错: {str(e)}")
+        
+            # 保存货币汇率
+            try:
+                rates = rates_future.result()
+                with session.begin_nested():
+                    self._save_currency_rates(rates, session=session)
+                logger.info(f"添加了{len(rates)}个货币汇率")
+            except Exception as e:
+                self._item_ids = None
+                logger.error(f"获取货币汇率时出错: {str(e)}")
         
+            # 保存加密货币价格
+            try:
+                crypto_prices = crypto_future.result()
+                with session.begin_nested():
+                    self._save_crypto_prices(crypto_prices, session=session)
+                logger.info(f"添加了{len(crypto_prices)}个加密货币价格")
+            except Exception as e:
+                self._item_ids = None
+                logger.error(f"获取加密货币价格时出错: {str(e)}")
+            
         logger.info("基础数据初始化完成")
         
-    def add_item(self, name: str, symbol: str, type: str, description: str = "") -> Item:
+    def add_item(self, name: str, symbol: str, type: str, description: str = "",
+                 session: Optional[Session] = None) -> Item:
         """添加新的可计价物品
         
         Args:
@@ -98,27 +210,70 @@ class DataCollector:
             symbol: 物品代码
             type: 物品类型
             description: 物品描述
+            session: 外部会话，不传时使用新会话并立即提交
             
         Returns:
             Item: 新创建的物品对象
         """
-        with Session(self.engine) as session:
-            # 检查是否已存在
-            existing = session.query(Item).filter_by(symbol=symbol).first()
-            if existing:
-                return existing
-                
-            item = Item(
+        with self._session_scope(session) as session:
+            item_id = self._get_or_create_item_id(session, symbol, name, type, description)
+            return session.get(Item, item_id)
+            
+    def _add_items(self, session: Session, items: List[Dict]) -> None:
+        """批量插入物品，代码已存在的物品不插入，新物品的ID写入内存映射
+        
+        Args:
+            session: 数据库会话
+            items: 物品字典列表，包含name、symbol、type、description
+        """
+        if not items:
+            return
+            
+        stmt = sqlite_insert(Item).values(items)\
+            .on_conflict_do_nothing(index_elements=['symbol'])\
+            .returning(Item.id, Item.symbol)
+        for item_id, symbol in session.execute(stmt):
+            if self._item_ids is not None:
+                self._item_ids[symbol] = item_id
+            logger.info(f"添加物品: {symbol}")
+            
+    def _get_or_create_item_id(self, session: Session, symbol: str, name: str,
+                               type: str, description: str = "") -> int:
+        """按代码获取物品ID，先查内存映射，未命中时插入物品，代码已存在则不插入
+        
+        Args:
+            session: 数据库会话
+            symbol: 物品代码
+            name: 物品名称
+            type: 物品类型
+            description: 物品描述
+            
+        Returns:
+            int: 物品ID
+        """
+        if self._item_ids is None:
+            self._item_ids = dict(session.execute(select(Item.symbol, Item.id)).all())
+            
+        item_id = self._item_ids.get(symbol)
+        if item_id is None:
+            # INSERT ... ON CONFLICT DO NOTHING RETURNING需要SQLite 3.35+
+            stmt = sqlite_insert(Item).values(
                 name=name,
                 symbol=symbol,
                 type=type,
                 description=description
-            )
-            session.add(item)
-            session.commit()
-            return item
+            ).on_conflict_do_nothing(index_elements=['symbol']).returning(Item.id)
+            item_id = session.execute(stmt).scalar()
+            if item_id is None:
+                # 其他连接已插入同一代码时不返回行，回查ID
+                item_id = session.execute(select(Item.id).where(Item.symbol == symbol)).scalar_one()
+            self._item_ids[symbol] = item_id
+            
+        return item_id
             
-    def add_price(self, item_id: int, price: float, source: str, confidence: float = 1.0) -> Price:
+    def add_price(self, item_id: int, price: float, source: str, confidence: float = 1.0,
+                  timestamp: Optional[datetime] = None,
+                  session: Optional[Session] = None) -> Price:
         """添加价格数据
         
         Args:
@@ -126,24 +281,27 @@ class DataCollector:
             price: 价格
             source: 数据来源
             confidence: 数据置信度
+            timestamp: 价格时间，批量写入时由调用方统一传入，不传时使用当前UTC时间
+            session: 外部会话，不传时使用新会话并立即提交
             
         Returns:
             Price: 新创建的价格对象
         """
-        with Session(self.engine) as session:
+        with self._session_scope(session) as session:
             price_obj = Price(
                 item_id=item_id,
                 price=price,
-                timestamp=datetime.utcnow(),
+                timestamp=timestamp or datetime.utcnow(),
                 source=source,
                 confidence=confidence
             )
             session.add(price_obj)
-            session.commit()
             return price_obj
             
     def add_exchange_rate(self, source_id: int, target_id: int, rate: float, 
-                         source: str, confidence: float = 1.0) -> ExchangeRate:
+                         source: str, confidence: float = 1.0,
+                         timestamp: Optional[datetime] = None,
+                         session: Optional[Session] = None) -> ExchangeRate:
         """添加汇率数据
         
         Args:
@@ -152,26 +310,44 @@ class DataCollector:
             rate: 汇率
             source: 数据来源
             confidence: 数据置信度
+            timestamp: 汇率时间，批量写入时由调用方统一传入，不传时使用当前UTC时间
+            session: 外部会话，不传时使用新会话并立即提交
             
         Returns:
             ExchangeRate: 新创建的汇率对象
         """
-        with Session(self.engine) as session:
+        with self._session_scope(session) as session:
             rate_obj = ExchangeRate(
                 source_item_id=source_id,
                 target_item_id=target_id,
                 rate=rate,
-                timestamp=datetime.utcnow(),
+                timestamp=timestamp or datetime.utcnow(),
                 source=source,
                 confidence=confidence
             )
             session.add(rate_obj)
-            session.commit()
             return rate_obj
             
-    def get_gold_price(self, start_date: str, end_date: str) -> pd.DataFrame:
+    def get_gold_price(self, start_date: str, end_date: str,
+                       session: Optional[Session] = None) -> pd.DataFrame:
         """从LBMA获取黄金价格数据
         
+        Args:
+            start_date: 开始日期 (YYYY-MM-DD)
+            end_date: 结束日期 (YYYY-MM-DD)
+            session: 外部会话，不传时使用新会话并立即提交
+            
+        Returns:
+            pd.DataFrame: 包含日期和价格的DataFrame，价格为float32
+        """
+        df = self._fetch_gold_price(start_date, end_date)
+        # 以float64原值写入数据库，只有返回给调用方的副本转换为float32
+        self._save_gold_price(df, session=session)
+        return _downcast_float32(df)
+        
+    def _fetch_gold_price(self, start_date: str, end_date: str) -> pd.DataFrame:
+        """请求黄金价格数据，不访问数据库
+        
         Args:
             start_date: 开始日期 (YYYY-MM-DD)
             end_date: 结束日期 (YYYY-MM-DD)
@@ -181,29 +357,53 @@ class DataCollector:
         """
         # TODO: 实现真实的API调用
         dates = pd.date_range(start=start_date, end=end_date)
-        prices = [1800.0 + i * 0.1 for i in range(len(dates))]
+        prices = 1800.0 + 0.1 * np.arange(len(dates), dtype=np.float64)
         
-        df = pd.DataFrame({
+        return pd.DataFrame({
             'date': dates,
             'price': prices
         })
         
-        # 保存到数据库
-        with Session(self.engine) as session:
-            gold_item = session.query(Item).filter_by(symbol='XAU').first()
-            if not gold_item:
-                gold_item = self.add_item('Gold', 'XAU', 'commodity', '黄金')
-            
-            for _, row in df.iterrows():
-                self.add_price(gold_item.id, row['price'], 'LBMA')
+    def _save_gold_price(self, df: pd.DataFrame, session: Optional[Session] = None) -> None:
+        """保存黄金价格数据，所有价格用一条executemany语句插入
         
-        return df
+        Args:
+            df: 包含日期和价格的DataFrame
+            session: 外部会话，不传时使用新会话并立即提交
+        """
+        with self._session_scope(session) as session:
+            gold_id = self._get_or_create_item_id(session, 'XAU', 'Gold', 'commodity', '黄金')
+            
+            price_rows = [
+                {'item_id': gold_id, 'price': price, 'timestamp': date}
+                for date, price in zip(df['date'].dt.to_pydatetime(), df['price'].tolist())
+            ]
+            if price_rows:
+                session.execute(insert(Price).values(source='LBMA', confidence=1.0), price_rows)
     
     def get_currency_rates(self, 
                           base_currency: str = 'USD',
-                          currencies: List[str] = None) -> Dict[str, float]:
+                          currencies: List[str] = None,
+                          session: Optional[Session] = None) -> Dict[str, float]:
         """获取货币汇率数据
         
+        Args:
+            base_currency: 基准货币代码
+            currencies: 目标货币代码列表
+            session: 外部会话，不传时使用新会话并立即提交
+            
+        Returns:
+            Dict[str, float]: 货币汇率字典
+        """
+        rates = self._fetch_currency_rates(base_currency, currencies)
+        self._save_currency_rates(rates, base_currency, session=session)
+        return rates
+        
+    def _fetch_currency_rates(self,
+                              base_currency: str = 'USD',
+                              currencies: List[str] = None) -> Dict[str, float]:
+        """请求货币汇率数据，不访问数据库
+        
         Args:
             base_currency: 基准货币代码
             currencies: 目标货币代码列表
@@ -222,26 +422,55 @@ class DataCollector:
             'CNY': 6.5
         }
         
-        # 保存到数据库
-        with Session(self.engine) as session:
-            base_item = session.query(Item).filter_by(symbol=base_currency).first()
-            if not base_item:
-                base_item = self.add_item(base_currency, base_currency, 'currency')
-            
-            for curr in currencies:
-                target_item = session.query(Item).filter_by(symbol=curr).first()
-                if not target_item:
-                    target_item = self.add_item(curr, curr, 'currency')
-                
-                self.add_exchange_rate(base_item.id, target_item.id, 
-                                     rates.get(curr, 1.0), 'Alpha Vantage')
-        
         return {curr: rates.get(curr, 1.0) for curr in currencies}
+        
+    def _save_currency_rates(self, rates: Dict[str, float], base_currency: str = 'USD',
+                             session: Optional[Session] = None) -> None:
+        """保存货币汇率数据，所有汇率用一条executemany语句插入
+        
+        Args:
+            rates: 货币汇率字典
+            base_currency: 基准货币代码
+            session: 外部会话，不传时使用新会话并立即提交
+        """
+        with self._session_scope(session) as session:
+            base_id = self._get_or_create_item_id(session, base_currency, base_currency, 'currency')
+            
+            rate_rows = [
+                {'target_item_id': self._get_or_create_item_id(session, curr, curr, 'currency'), 'rate': rate}
+                for curr, rate in rates.items()
+            ]
+            
+            if rate_rows:
+                session.execute(
+                    insert(ExchangeRate).values(
+                        source_item_id=base_id,
+                        timestamp=datetime.utcnow(),
+                        source='Alpha Vantage',
+                        confidence=1.0
+                    ),
+                    rate_rows
+                )
     
     def get_crypto_prices(self, 
-                         symbols: List[str] = None) -> Dict[str, float]:
+                         symbols: List[str] = None,
+                         session: Optional[Session] = None) -> Dict[str, float]:
         """获取加密货币价格
         
+        Args:
+            symbols: 加密货币代码列表
+            session: 外部会话，不传时使用新会话并立即提交
+            
+        Returns:
+            Dict[str, float]: 加密货币价格字典
+        """
+        prices = self._fetch_crypto_prices(symbols)
+        self._save_crypto_prices(prices, session=session)
+        return prices
+        
+    def _fetch_crypto_prices(self, symbols: List[str] = None) -> Dict[str, float]:
+        """请求加密货币价格，不访问数据库
+        
         Args:
             symbols: 加密货币代码列表
             
@@ -257,52 +486,139 @@ class DataCollector:
             'ETH': 3000.0
         }
         
-        # 保存到数据库
-        with Session(self.engine) as session:
-            for symbol in symbols:
-                crypto_item = session.query(Item).filter_by(symbol=symbol).first()
-                if not crypto_item:
-                    crypto_item = self.add_item(symbol, symbol, 'crypto')
-                
-                self.add_price(crypto_item.id, prices.get(symbol, 0.0), 'CoinGecko')
-        
         return {symbol: prices.get(symbol, 0.0) for symbol in symbols}
+        
+    def _save_crypto_prices(self, prices: Dict[str, float],
+                            session: Optional[Session] = None) -> None:
+        """保存加密货币价格，所有价格用一条executemany语句插入
+        
+        Args:
+            prices: 加密货币价格字典
+            session: 外部会话，不传时使用新会话并立即提交
+        """
+        with self._session_scope(session) as session:
+            price_rows = [
+                {'item_id': self._get_or_create_item_id(session, symbol, symbol, 'crypto'), 'price': price}
+                for symbol, price in prices.items()
+            ]
+            
+            if price_rows:
+                session.execute(
+                    insert(Price).values(timestamp=datetime.utcnow(), source='CoinGecko', confidence=1.0),
+                    price_rows
+                )
     
+    def _historical_query(self, session: Session, item_symbol: str, start_date: str, end_date: str):
+        """构建单个物品历史价格的查询，只查询需要的列
+        
+        Args:
+            session: 数据库会话
+            item_symbol: 物品代码
+            start_date: 开始日期
+            end_date: 结束日期
+            
+        Returns:
+            Select: 按HISTORICAL_COLUMNS顺序返回列的查询
+        """
+        # 只取ID，不构造Item对象
+        item_id = session.scalar(select(Item.id).where(Item.symbol == item_symbol))
+        if item_id is None:
+            raise ValueError(f"未找到物品: {item_symbol}")
+            
+        return select(
+            Price.timestamp.label('date'),
+            Price.price,
+            Price.source,
+            Price.confidence
+        ).where(
+            Price.item_id == item_id,
+            # 与(item_id, timestamp)索引配合为一次范围查找
+            Price.timestamp.between(start_date, end_date)
+        )
+        
     def get_historical_data(self, 
                            item_symbol: str,
                            start_date: str,
-                           end_date: str) -> pd.DataFrame:
+                           end_date: str,
+                           to_arrow: bool = False) -> Union[pd.DataFrame, Any]:
         """获取历史数据
         
         Args:
             item_symbol: 物品代码
             start_date: 开始日期
             end_date: 结束日期
+            to_arrow: 是否直接由游标行构建pyarrow.Table返回，可用pq.write_table写入Parquet
             
         Returns:
-            pd.DataFrame: 历史数据DataFrame
+            Union[pd.DataFrame, pa.Table]: 历史数据，DataFrame的price和confidence为float32
         """
         with Session(self.engine) as session:
-            item = session.query(Item).filter_by(symbol=item_symbol).first()
-            if not item:
-                raise ValueError(f"未找到物品: {item_symbol}")
+            query = self._historical_query(session, item_symbol, start_date, end_date)
             
-            prices = session.query(Price).filter(
-                Price.item_id == item.id,
-                Price.timestamp >= start_date,
-                Price.timestamp <= end_date
-            ).all()
+            if to_arrow:
+                import pyarrow as pa
+                
+                rows = session.execute(query).mappings().all()
+                if not rows:
+                    logger.warning(f"未找到{item_symbol}在{start_date}到{end_date}之间的价格数据")
+                return pa.Table.from_pylist(rows)
+                
+            # 由pandas直接从游标构建列式DataFrame
+            prices = pd.read_sql(query, session.connection())
             
-            if not prices:
+            if prices.empty:
                 logger.warning(f"未找到{item_symbol}在{start_date}到{end_date}之间的价格数据")
                 return pd.DataFrame()
             
-            return pd.DataFrame([{
-                'date': p.timestamp,
-                'price': p.price,
-                'source': p.source,
-                'confidence': p.confidence
-            } for p in prices])
+            return _downcast_float32(prices)
+            
+    def iter_historical_data(self,
+                             item_symbol: str,
+                             start_date: str,
+                             end_date: str) -> Iterator[Tuple]:
+        """逐行获取历史数据，按批从游标读取，不在内存中构建完整结果
+        
+        Args:
+            item_symbol: 物品代码
+            start_date: 开始日期
+            end_date: 结束日期
+            
+        Returns:
+            Iterator[Tuple]: 按HISTORICAL_COLUMNS顺序的(date, price, source, confidence)元组
+        """
+        with Session(self.engine) as session:
+            query = self._historical_query(session, item_symbol, start_date, end_date)
+            result = session.execute(query.execution_options(yield_per=HISTORICAL_YIELD_PER))
+            for row in result:
+                yield tuple(row)
+    
+    def get_historical_data_bulk(self,
+                                item_symbols: List[str],
+                                start_date: str,
+                                end_date: str) -> pd.DataFrame:
+        """一次查询获取多个物品的历史数据
+        
+        Args:
+            item_symbols: 物品代码列表
+            start_date: 开始日期
+            end_date: 结束日期
+            
+        Returns:
+            pd.DataFrame: 历史数据DataFrame，包含symbol列，按物品和时间排序，price和confidence为float32
+        """
+        query = select(
+            Item.symbol,
+            Price.timestamp.label('date'),
+            Price.price,
+            Price.source,
+            Price.confidence
+        ).join(Item, Item.id == Price.item_id).where(
+            Item.symbol.in_(item_symbols),
+            Price.timestamp.between(start_date, end_date)
+        ).order_by(Price.item_id, Price.timestamp, Price.id)
+        
+        with self.engine.connect() as conn:
+            return _downcast_float32(pd.read_sql(query, conn))
     
     def get_relationship_data(self, 
                             item_symbol: str,
@@ -317,34 +633,44 @@ class DataCollector:
             List[Tuple[str, str, float]]: 关系数据列表
         """
         with Session(self.engine) as session:
-            item = session.query(Item).filter_by(symbol=item_symbol).first()
-            if not item:
+            item_id = session.scalar(select(Item.id).where(Item.symbol == item_symbol))
+            if item_id is None:
                 raise ValueError(f"未找到物品: {item_symbol}")
             
-            rates = session.query(ExchangeRate).filter(
-                ExchangeRate.source_item_id == item.id
-            ).all()
+            # 一次JOIN同时取出目标物品代码和汇率，走(source_item_id, target_item_id)索引
+            rates = session.query(Item.symbol, ExchangeRate.rate)\
+                .join(ExchangeRate, ExchangeRate.target_item_id == Item.id)\
+                .filter(ExchangeRate.source_item_id == item_id)\
+                .order_by(ExchangeRate.id)\
+                .all()
             
             if not rates:
                 logger.warning(f"未找到{item_symbol}的关系数据")
                 return []
             
-            return [(item.symbol, 
-                    session.query(Item).get(r.target_item_id).symbol,
-                    r.rate) for r in rates]
+            return [(item_symbol, target_symbol, rate) for target_symbol, rate in rates]
     
     def save_data(self, 
-                 data: pd.DataFrame,
+                 data: Union[pd.DataFrame, Iterable[Tuple]],
                  filename: str,
-                 directory: str = 'data') -> None:
+                 directory: str = 'data',
+                 columns: List[str] = HISTORICAL_COLUMNS) -> None:
         """保存数据到CSV文件
         
         Args:
-            data: 要保存的数据
+            data: 要保存的数据，DataFrame或iter_historical_data等返回的行迭代器
             filename: 文件名
             directory: 保存目录
+            columns: 行迭代器的列名，DataFrame时忽略
         """
         os.makedirs(directory, exist_ok=True)
         filepath = os.path.join(directory, filename)
-        data.to_csv(filepath, index=False)
+        if isinstance(data, pd.DataFrame):
+            data.to_csv(filepath, index=False)
+        else:
+            # 逐行写入，内存占用与数据量无关
+            with open(filepath, 'w', newline='') as f:
+                writer = csv.writer(f)
+                writer.writerow(columns)
+                writer.writerows(data)
         logger.info(f"数据已保存到: {filepath}") 
\ No newline at end of file
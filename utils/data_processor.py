@@ -1,8 +1,13 @@
+import csv
+import os
 import pandas as pd
 import numpy as np
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Union
 from datetime import datetime
 
+# 读取CSV最后一行时从文件末尾读取的字节数
+TAIL_READ_BYTES = 4096
+
 class DataProcessor:
     """数据处理工具类"""
     
@@ -17,11 +22,42 @@ class DataProcessor:
             file_path: 黄金价格数据文件路径
         """
         try:
-            df = pd.read_csv(file_path)
-            self.gold_price_usd = df['price'].iloc[-1]  # 获取最新价格
+            try:
+                # 只读取表头和文件末尾，不解析整个文件
+                self.gold_price_usd = self._read_last_value(file_path, 'price')
+            except ValueError:
+                df = pd.read_csv(file_path, usecols=['price'])
+                self.gold_price_usd = float(df['price'].iat[-1])  # 获取最新价格
         except Exception as e:
             print(f"加载黄金价格数据失败: {str(e)}")
             
+    @staticmethod
+    def _read_last_value(file_path: str, column: str) -> float:
+        """读取CSV文件最后一行中指定列的数值
+        
+        Args:
+            file_path: CSV文件路径
+            column: 列名
+            
+        Returns:
+            float: 最后一行的数值，无法从文件末尾解析出完整数据行时抛出ValueError
+        """
+        with open(file_path, 'rb') as f:
+            header = next(csv.reader([f.readline().decode('utf-8-sig')]))
+            column_index = header.index(column)
+            
+            f.seek(0, os.SEEK_END)
+            size = f.tell()
+            start = max(size - TAIL_READ_BYTES, 0)
+            f.seek(start)
+            lines = [line for line in f.read().splitlines() if line.strip()]
+            
+        # 片段的第一行是表头或可能不完整，之后至少还要有一个完整的数据行
+        if len(lines) < 2:
+            raise ValueError(f"无法从文件末尾读取{column}列")
+        row = next(csv.reader([lines[-1].decode('utf-8')]))
+        return float(row[column_index])
+            
     def calculate_svu_ratio(self, currency_price: float) -> float:
         """计算货币相对于SVU的比率
         
@@ -49,23 +85,25 @@ class DataProcessor:
         if self.gold_price_usd is None:
             raise ValueError("请先加载黄金价格数据")
             
-        return {
-            currency: self.calculate_svu_ratio(price)
-            for currency, price in currency_prices.items()
-        }
+        # 一次数组运算完成所有货币的换算，运算顺序与calculate_svu_ratio一致
+        prices = np.fromiter(currency_prices.values(), dtype=np.float64, count=len(currency_prices))
+        svu_values = prices / self.gold_price_usd * self.svu_base
+        return dict(zip(currency_prices.keys(), svu_values.tolist()))
     
     def calculate_confidence_score(self, 
-                                 data_points: int,
-                                 time_span: int) -> float:
-        """计算数据置信度分数
+                                 data_points: Union[int, np.ndarray],
+                                 time_span: Union[int, np.ndarray]) -> Union[float, np.ndarray]:
+        """计算数据置信度分数，可传入数组一次计算多个物品
         
         Args:
-            data_points: 数据点数量
-            time_span: 时间跨度（天）
+            data_points: 数据点数量，标量或数组
+            time_span: 时间跨度（天），标量或数组
             
         Returns:
-            float: 置信度分数 (0-1)
+            Union[float, np.ndarray]: 置信度分数 (0-1)，标量输入返回float
         """
         # 简单的置信度计算示例
-        coverage_score = min(data_points / (time_span * 2), 1.0)
-        return round(coverage_score, 2) 
\ No newline at end of file
+        data_points = np.asarray(data_points, dtype=np.float64)
+        time_span = np.asarray(time_span, dtype=np.float64)
+        coverage_score = np.round(np.minimum(data_points / (time_span * 2), 1.0), 2)
+        return coverage_score.item() if coverage_score.ndim == 0 else coverage_score
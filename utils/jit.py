@@ -0,0 +1,27 @@
+"""Numba可选依赖兼容层
+
+安装了numba时直接导出njit/prange；未安装时njit退化为原样返回函数的装饰器，
+prange退化为range，被装饰的内核以纯Python方式运行，结果保持一致。
+"""
+import logging
+
+logger = logging.getLogger(__name__)
+
+try:
+    from numba import njit, prange
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
+    prange = range
+
+    def njit(*args, **kwargs):
+        """numba.njit的占位实现，直接返回原函数"""
+        if len(args) == 1 and callable(args[0]) and not kwargs:
+            return args[0]
+
+        def decorator(func):
+            return func
+
+        return decorator
+
+    logger.debug("未安装numba，JIT内核将以纯Python方式运行")